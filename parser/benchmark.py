@@ -0,0 +1,206 @@
+"""Benchmark the parsers on synthetic tables and check for regressions.
+
+Each parser run happens in a fresh interpreter so its peak RSS is its own.
+Results are written as JSON and can be compared against a stored baseline:
+
+    python benchmark.py --sizes 100 1000 10000 --save-baseline baseline.json
+    python benchmark.py --sizes 100 1000 10000 --baseline baseline.json
+
+The parallel cases run once per --workers count, which gives their scaling:
+
+    python benchmark.py --sizes 10000 --cases recipes_parallel --workers 1 2 4 8
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import synthetic_tables
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+DEFAULT_THRESHOLD = 0.25
+
+def run_recipes(data_dir: str) -> int:
+    from script_loader import recipe_parser
+    with open(os.path.join(data_dir, synthetic_tables.RECIPE_TABLE), 'r', encoding='utf-8') as f:
+        html_content = f.read()
+    return len(recipe_parser().parse_table(html_content))
+
+def run_recipes_fast(data_dir: str) -> int:
+    from fast_extract import FastPathStats
+    from script_loader import recipe_parser
+    with open(os.path.join(data_dir, synthetic_tables.RECIPE_TABLE), 'r', encoding='utf-8') as f:
+        html_content = f.read()
+    return len(recipe_parser().parse_table(html_content, fast=FastPathStats()))
+
+def run_recipes_stream(data_dir: str) -> int:
+    from script_loader import recipe_parser
+    return sum(1 for _ in recipe_parser().iter_parsed_rows(os.path.join(data_dir, synthetic_tables.RECIPE_TABLE)))
+
+def run_recipes_parallel(data_dir: str, workers: int) -> int:
+    from script_loader import recipe_parser
+    return len(recipe_parser().parse_rows_parallel(os.path.join(data_dir, synthetic_tables.RECIPE_TABLE), workers))
+
+def run_ingredients(data_dir: str) -> int:
+    from script_loader import ingredients_parser
+    with open(os.path.join(data_dir, synthetic_tables.INGREDIENTS_TABLE), 'r', encoding='utf-8') as f:
+        html_content = f.read()
+    return sum(len(names) for names in ingredients_parser().parse_ingredients_table(html_content).values())
+
+def run_ingredients_fast(data_dir: str) -> int:
+    from fast_extract import FastPathStats
+    from script_loader import ingredients_parser
+    with open(os.path.join(data_dir, synthetic_tables.INGREDIENTS_TABLE), 'r', encoding='utf-8') as f:
+        html_content = f.read()
+    categories = ingredients_parser().parse_ingredients_table(html_content, FastPathStats())
+    return sum(len(names) for names in categories.values())
+
+def run_critters(data_dir: str) -> int:
+    import parse_critter_data
+    parse_critter_data.main(data_dir)
+    rows = 0
+    for file_name in ('critter-types.json', 'critters.json'):
+        with open(os.path.join(data_dir, file_name), 'r', encoding='utf-8') as f:
+            rows += len(json.load(f))
+    return rows
+
+def run_critters_parallel(data_dir: str, workers: int) -> int:
+    import parse_critter_data
+    parse_critter_data.main(data_dir, workers=workers)
+    rows = 0
+    for file_name in ('critter-types.json', 'critters.json'):
+        with open(os.path.join(data_dir, file_name), 'r', encoding='utf-8') as f:
+            rows += len(json.load(f))
+    return rows
+
+CASES = {
+    'recipes': run_recipes,
+    'recipes_fast': run_recipes_fast,
+    'recipes_stream': run_recipes_stream,
+    'recipes_parallel': run_recipes_parallel,
+    'ingredients': run_ingredients,
+    'ingredients_fast': run_ingredients_fast,
+    'critters': run_critters,
+    'critters_parallel': run_critters_parallel,
+}
+# Cases that take a worker count and are run once for each --workers value
+PARALLEL_CASES = {'recipes_parallel', 'critters_parallel'}
+
+def peak_rss_mib() -> float:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak /= 1024
+    return peak / 1024
+
+def run_case(case: str, data_dir: str, workers: int = 1) -> dict:
+    """Run one case in this process; the parent runs this in a child interpreter."""
+    # The parsers print progress; keep stdout for the JSON result
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        rows = CASES[case](data_dir, workers) if case in PARALLEL_CASES else CASES[case](data_dir)
+        seconds = time.perf_counter() - started
+    # Worker processes have their own peak RSS; the parent's is what is reported
+    return {'seconds': seconds, 'rows': rows, 'peak_rss_mib': peak_rss_mib()}
+
+def measure(case: str, data_dir: str, repeat: int, workers: int = 1) -> dict:
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--run-case', case, data_dir, str(workers)],
+            check=True, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout
+        runs.append(json.loads(output))
+    best = min(runs, key=lambda run: run['seconds'])
+    return {
+        'seconds': best['seconds'],
+        'rows': best['rows'],
+        'rows_per_sec': best['rows'] / best['seconds'] if best['seconds'] else None,
+        'peak_rss_mib': max(run['peak_rss_mib'] for run in runs),
+    }
+
+def run_suite(sizes, cases, repeat: int = 1, worker_counts=(1,)) -> dict:
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in sizes:
+            data_dir = os.path.join(tmp_dir, str(size))
+            synthetic_tables.write_tables(data_dir, size)
+            for case in cases:
+                for workers in (worker_counts if case in PARALLEL_CASES else [1]):
+                    result = {'case': case, 'size': size, 'workers': workers, **measure(case, data_dir, repeat, workers)}
+                    print(f"{case:>18} {size:>8} rows {workers:>3} workers  {result['seconds']:8.3f}s  "
+                          f"{result['rows_per_sec']:10.0f} rows/s  {result['peak_rss_mib']:7.1f} MiB", file=sys.stderr)
+                    results.append(result)
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+
+def find_regressions(report: dict, baseline: dict, threshold: float) -> list:
+    """Results that are slower or use more memory than the baseline by more than threshold."""
+    previous = {(result['case'], result['size'], result.get('workers', 1)): result for result in baseline['results']}
+    regressions = []
+    for result in report['results']:
+        base = previous.get((result['case'], result['size'], result.get('workers', 1)))
+        if not base:
+            continue
+        for metric in ('seconds', 'peak_rss_mib'):
+            if result[metric] > base[metric] * (1 + threshold):
+                regressions.append({
+                    'case': result['case'],
+                    'size': result['size'],
+                    'workers': result.get('workers', 1),
+                    'metric': metric,
+                    'baseline': base[metric],
+                    'current': result[metric],
+                })
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the parsers on synthetic wiki tables.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='rows per table')
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), default=list(CASES))
+    parser.add_argument('--repeat', type=int, default=1, help='runs per case; the fastest is kept')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1],
+                        help='worker counts to run the parallel cases with')
+    parser.add_argument('--output', metavar='PATH', help='write the JSON report here instead of stdout')
+    parser.add_argument('--baseline', metavar='PATH', help='fail if a result regresses against this report')
+    parser.add_argument('--save-baseline', metavar='PATH', help='also store the report as a baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='allowed slowdown or memory growth against the baseline, as a fraction')
+    parser.add_argument('--run-case', nargs=3, metavar=('CASE', 'DATA_DIR', 'WORKERS'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        case, data_dir, workers = args.run_case
+        print(json.dumps(run_case(case, data_dir, int(workers))))
+        sys.exit(0)
+
+    report = run_suite(args.sizes, args.cases, args.repeat, args.workers)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            report['regressions'] = find_regressions(report, json.load(f), args.threshold)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            f.write(output)
+
+    for regression in report.get('regressions', []):
+        print(f"Regression: {regression['case']} at {regression['size']} rows with {regression['workers']} workers, {regression['metric']} "
+              f"{regression['baseline']:.3f} -> {regression['current']:.3f}", file=sys.stderr)
+    sys.exit(1 if report.get('regressions') else 0)
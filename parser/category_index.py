@@ -0,0 +1,191 @@
+"""Ingredient categories as id sets, for expanding the generic "Any ..." slots of recipes.
+
+The index is built once from the ingredients table (ingredients.json, see
+normalize.load_ingredient_categories). Every ingredient gets an id in table
+order and every category is the set of its members, held as an int with one
+bit per ingredient id; each ingredient has the set of categories it is
+listed under the same way. A recipe's requirement is then one set per
+ingredient slot: a single ingredient, the options of an option list, or every
+member of the category an "Any ..." slot names (recipe-table-parser.py keeps
+those slots with --generic). Building a requirement is an OR per slot, so
+expanding a whole catalog stays linear in its size:
+
+    python category_index.py ingredients.json --category Fruit
+    python category_index.py ingredients.json --recipes recipes.csv --expanded expanded.json
+"""
+import argparse
+import json
+import time
+from typing import Dict, Iterable, List, Optional
+
+from entity_resolution import AliasIndex, fold, ingredient_index, is_generic, plural_forms, print_unresolved
+from normalize import load_ingredient_categories
+from recipe_query import load_recipes_csv
+
+# Generic slot names whose category is spelled differently in the ingredients table
+KNOWN_CATEGORY_VARIANTS = {
+    'Dairy or Oil': 'Dairy and Oil',
+}
+
+def _bits(mask: int) -> Iterable[int]:
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+class CategoryIndex:
+    """Category -> member ids and ingredient -> category ids, both as bitsets.
+
+    Recipe ingredient names are matched to the table's spelling like
+    RecipeNormalizer does; names the table doesn't list get ids after the
+    table's own, with no categories. Generic slots naming no known category
+    are counted in category_names.unresolved.
+    """
+
+    def __init__(self, categories: Dict[str, dict]):
+        self.ingredients: List[str] = []
+        self.categories: List[str] = []
+        self.members: List[int] = []
+        self.categories_of: List[int] = []
+        self.ingredient_names = ingredient_index(categories)
+        self.category_names = AliasIndex('category')
+        self._ids: Dict[str, int] = {}
+        self._category_ids: Dict[str, int] = {}
+
+        for category, data in categories.items():
+            category_id = len(self.categories)
+            self.categories.append(category)
+            self._category_ids[category] = category_id
+            self.category_names.add(category)
+            mask = 0
+            for name in data['ingredients']:
+                id = self.ingredient_id(name)
+                mask |= 1 << id
+                self.categories_of[id] |= 1 << category_id
+            self.members.append(mask)
+        for variant, canonical in KNOWN_CATEGORY_VARIANTS.items():
+            if canonical in self._category_ids:
+                self.category_names.add(canonical, [variant])
+
+    def ingredient_id(self, name: str) -> int:
+        """Id of an ingredient, numbering it after the known ones the first time it is seen."""
+        name = self.ingredient_names.lookup(name) or name
+        id = self._ids.get(name)
+        if id is None:
+            id = self._ids[name] = len(self.ingredients)
+            self.ingredients.append(name)
+            self.categories_of.append(0)
+        return id
+
+    def category_id(self, generic_name: str) -> Optional[int]:
+        """Id of the category a generic slot like "Any Fruit" or "Any Vegetables" names, or None."""
+        name = generic_name[len('Any '):] if is_generic(generic_name) else generic_name
+        category = self.category_names.lookup(name)
+        if category is None:
+            # Slots name one member ("Any Spice") where the table names the category in the plural
+            category = next(filter(None, map(self.category_names.lookup, plural_forms(fold(name)))), None)
+        if category is None:
+            self.category_names.unresolved[generic_name] += 1
+            return None
+        return self._category_ids[category]
+
+    def slot_mask(self, entry) -> int:
+        """The ingredients that can fill one recipe slot."""
+        if isinstance(entry, list):
+            mask = 0
+            for option in entry:
+                mask |= self.slot_mask(option)
+            return mask
+        name = entry['name']
+        if is_generic(name):
+            category_id = self.category_id(name)
+            return 0 if category_id is None else self.members[category_id]
+        return 1 << self.ingredient_id(name)
+
+    def requirements(self, ingredients: list) -> List[int]:
+        """One set of interchangeable ingredients per slot of a recipe's ingredient list."""
+        return [self.slot_mask(entry) for entry in ingredients]
+
+    def expand_slots(self, ingredients: list) -> list:
+        """A recipe's ingredient list with each generic slot, or option list holding one, as the options filling it."""
+        expanded = []
+        for entry in ingredients:
+            options = entry if isinstance(entry, list) else [entry]
+            if any(is_generic(option['name']) for option in options):
+                entry = [{'name': name} for name in self.names(self.slot_mask(entry))]
+            expanded.append(entry)
+        return expanded
+
+    def names(self, mask: int) -> List[str]:
+        """Ingredient names of a set, in id order."""
+        return [self.ingredients[id] for id in _bits(mask)]
+
+    def members_of(self, category: str) -> List[str]:
+        category_id = self.category_id(category)
+        return [] if category_id is None else self.names(self.members[category_id])
+
+    def categories_for(self, ingredient: str) -> List[str]:
+        """Categories an ingredient is listed under."""
+        id = self._ids.get(self.ingredient_names.lookup(ingredient) or ingredient)
+        if id is None:
+            return []
+        return [self.categories[category_id] for category_id in _bits(self.categories_of[id])]
+
+class ExpandedRecipes:
+    """Requirement sets of recipes, collected as they are parsed."""
+
+    def __init__(self, index: CategoryIndex):
+        self.index = index
+        self.recipes: List[tuple] = []
+
+    def add_recipe(self, row) -> List[int]:
+        requirements = self.index.requirements(row['ingredients'])
+        self.recipes.append((row['name'], requirements))
+        return requirements
+
+    def to_list(self) -> List[dict]:
+        # Category slots come back to the same few sets, so each set is listed out once
+        names: Dict[int, List[str]] = {}
+        for _, requirements in self.recipes:
+            for mask in requirements:
+                if mask not in names:
+                    names[mask] = self.index.names(mask)
+        return [
+            {'name': name, 'requirements': [names[mask] for mask in requirements]}
+            for name, requirements in self.recipes
+        ]
+
+    def save(self, path: str):
+        # Written compactly like --normalized; every category slot lists all of its members
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_list(), f, ensure_ascii=False, separators=(',', ':'))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Look up ingredient categories, or expand the slots of recipes.')
+    parser.add_argument('ingredients', help='ingredients.json written by ingredients-table-parser.py')
+    parser.add_argument('--category', action='append', default=[], help='list the members of a category')
+    parser.add_argument('--ingredient', action='append', default=[], help='list the categories of an ingredient')
+    parser.add_argument('--recipes', metavar='CSV', help='recipes CSV written by recipe-table-parser.py --generic')
+    parser.add_argument('--expanded', metavar='PATH', help='write the expanded requirements of --recipes as JSON')
+    args = parser.parse_args()
+    if args.expanded and not args.recipes:
+        parser.error('--expanded requires --recipes')
+
+    started = time.perf_counter()
+    index = CategoryIndex(load_ingredient_categories(args.ingredients))
+    print(f"Indexed {len(index.ingredients)} ingredients in {len(index.categories)} categories "
+          f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+    for category in args.category:
+        print(f"{category}: {', '.join(index.members_of(category)) or 'no such category'}")
+    for ingredient in args.ingredient:
+        print(f"{ingredient}: {', '.join(index.categories_for(ingredient)) or 'no category'}")
+    if args.recipes:
+        expanded = ExpandedRecipes(index)
+        rows = load_recipes_csv(args.recipes)
+        started = time.perf_counter()
+        for row in rows:
+            expanded.add_recipe(row)
+        print(f"Expanded {len(rows)} recipes in {(time.perf_counter() - started) * 1000:.1f} ms")
+        if args.expanded:
+            expanded.save(args.expanded)
+        print_unresolved(index.category_names)
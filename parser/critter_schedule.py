@@ -0,0 +1,235 @@
+"""Minute-of-week intervals for critter schedules and an index over them."""
+import argparse
+from bisect import bisect_right
+import json
+import random
+import re
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DAYS = ['sunday', 'monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday']
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+_TIME = r'(?:(\d{1,2})(?::(\d{2}))?\s*([AaPp])\.?\s*[Mm]\.?|([Nn]oon|[Mm]idnight))'
+_WINDOW_RE = re.compile(_TIME + r'\s*(?:-|–|—|to)\s*' + _TIME)
+
+Interval = Tuple[int, int]
+
+def _minute_of_day(hour: Optional[str], minute: Optional[str], meridiem: Optional[str], word: Optional[str]) -> int:
+    if word:
+        return 12 * 60 if word.lower() == 'noon' else 0
+    hour = int(hour) % 12
+    if meridiem.lower() == 'p':
+        hour += 12
+    return hour * 60 + int(minute or 0)
+
+def parse_time_windows(text: str) -> List[Interval]:
+    """Parse windows like "6 AM - 10 AM" into (start, end) minutes of the day.
+
+    A window that ends at or before its start runs past midnight, so its end is
+    reported on the following day (greater than MINUTES_PER_DAY).
+    """
+    windows = []
+    for m in _WINDOW_RE.finditer(text):
+        start = _minute_of_day(*m.groups()[:4])
+        end = _minute_of_day(*m.groups()[4:])
+        if end <= start:
+            end += MINUTES_PER_DAY
+        windows.append((start, end))
+    return windows
+
+def merge_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    merged: List[Interval] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def schedule_intervals(schedule: Dict, unparsed: Optional[List[Tuple[str, str]]] = None) -> List[Interval]:
+    """Turn a parsed schedule into sorted, merged minute-of-week intervals.
+
+    Windows that run past Saturday midnight wrap around to Sunday. Day strings
+    that contain no recognisable window are appended to unparsed if given.
+    """
+    intervals = []
+    for day_index, day in enumerate(DAYS):
+        value = schedule.get(day, False)
+        offset = day_index * MINUTES_PER_DAY
+        if value is True:
+            intervals.append((offset, offset + MINUTES_PER_DAY))
+            continue
+        if not value:
+            continue
+        windows = parse_time_windows(value)
+        if not windows and unparsed is not None:
+            unparsed.append((day, value))
+        for start, end in windows:
+            start += offset
+            end += offset
+            if end > MINUTES_PER_WEEK:
+                intervals.append((start, MINUTES_PER_WEEK))
+                intervals.append((0, end - MINUTES_PER_WEEK))
+            else:
+                intervals.append((start, end))
+    return merge_intervals(intervals)
+
+def minute_of_week(day: str, hour: int, minute: int = 0) -> int:
+    return DAYS.index(day.lower()) * MINUTES_PER_DAY + hour * 60 + minute
+
+class ScheduleIndex:
+    """Sorted interval index over the weekly schedules of many critters.
+
+    The week is cut at every interval boundary into segments, and each segment
+    stores a bitset of the critters out during it. "Who is out at T" is a
+    binary search, a time window ORs the few segments it covers, and the next
+    appearance of one critter is a binary search over its own intervals.
+    """
+
+    def __init__(self, critters: List[dict]):
+        self.names = [critter['name'] for critter in critters]
+        self.positions = {name: position for position, name in enumerate(self.names)}
+        self.unparsed: List[Tuple[str, str, str]] = []
+        self.intervals: List[List[Interval]] = []
+        for critter in critters:
+            unparsed = []
+            self.intervals.append(schedule_intervals(critter['schedule'], unparsed))
+            self.unparsed.extend((critter['name'], day, text) for day, text in unparsed)
+
+        # Merged intervals of one critter never overlap or touch, so each
+        # boundary either adds or removes that critter's bit
+        events: Dict[int, List[int]] = {0: [0, 0]}
+        for position, intervals in enumerate(self.intervals):
+            bit = 1 << position
+            for start, end in intervals:
+                events.setdefault(start, [0, 0])[0] |= bit
+                events.setdefault(end, [0, 0])[1] |= bit
+
+        self._boundaries: List[int] = []
+        self._active: List[int] = []
+        mask = 0
+        for point in sorted(events):
+            if point >= MINUTES_PER_WEEK:
+                break
+            added, removed = events[point]
+            mask = (mask & ~removed) | added
+            self._boundaries.append(point)
+            self._active.append(mask)
+
+    def _names(self, mask: int) -> List[str]:
+        return [name for position, name in enumerate(self.names) if mask >> position & 1]
+
+    def active_at(self, minute: int) -> List[str]:
+        """Names of the critters out at a minute of the week."""
+        return self._names(self._active[bisect_right(self._boundaries, minute % MINUTES_PER_WEEK) - 1])
+
+    def active_between(self, start: int, end: int) -> List[str]:
+        """Names of the critters out at any point in [start, end).
+
+        end may run past the end of the week, in which case the window wraps
+        around to Sunday. An empty window has no critters; a reversed one is a
+        ValueError.
+        """
+        length = end - start
+        if length < 0:
+            raise ValueError(f'window ends at {end}, before it starts at {start}')
+        if length == 0:
+            return []
+        if length >= MINUTES_PER_WEEK:
+            return [name for name, intervals in zip(self.names, self.intervals) if intervals]
+        start %= MINUTES_PER_WEEK
+        end = start + length
+        mask = self._mask_between(start, min(end, MINUTES_PER_WEEK))
+        if end > MINUTES_PER_WEEK:
+            mask |= self._mask_between(0, end - MINUTES_PER_WEEK)
+        return self._names(mask)
+
+    def _mask_between(self, start: int, end: int) -> int:
+        mask = 0
+        i = bisect_right(self._boundaries, start) - 1
+        while i < len(self._boundaries) and self._boundaries[i] < end:
+            mask |= self._active[i]
+            i += 1
+        return mask
+
+    def next_available(self, name: str, minute: int) -> Optional[int]:
+        """First minute at or after minute when the critter is out.
+
+        The result counts on past the end of the week, so a critter next seen
+        on the following Sunday at 6 AM gives MINUTES_PER_WEEK + 360. Critters
+        that are never out give None.
+        """
+        intervals = self.intervals[self.positions[name]]
+        if not intervals:
+            return None
+        week_start = minute - minute % MINUTES_PER_WEEK
+        minute %= MINUTES_PER_WEEK
+        i = bisect_right(intervals, (minute, MINUTES_PER_WEEK + 1)) - 1
+        if i >= 0 and intervals[i][1] > minute:
+            return week_start + minute
+        if i + 1 < len(intervals):
+            return week_start + intervals[i + 1][0]
+        return week_start + MINUTES_PER_WEEK + intervals[0][0]
+
+def _naive_active_at(critters: List[dict], minute: int) -> List[str]:
+    # What consumers did before the index: re-parse every schedule string per lookup
+    names = []
+    for critter in critters:
+        for start, end in schedule_intervals(critter['schedule']):
+            if start <= minute < end:
+                names.append(critter['name'])
+                break
+    return names
+
+def benchmark(critters: List[dict], queries: int = 1000, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    minutes = [rng.randrange(MINUTES_PER_WEEK) for _ in range(queries)]
+
+    started = time.perf_counter()
+    index = ScheduleIndex(critters)
+    build = time.perf_counter() - started
+
+    started = time.perf_counter()
+    indexed = [index.active_at(minute) for minute in minutes]
+    indexed_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    naive = [_naive_active_at(critters, minute) for minute in minutes]
+    naive_time = time.perf_counter() - started
+
+    assert indexed == naive, 'index and naive scan disagree'
+    return {
+        'critters': len(critters),
+        'queries': queries,
+        'build_seconds': build,
+        'index_us_per_query': indexed_time / queries * 1e6,
+        'naive_us_per_query': naive_time / queries * 1e6,
+        'speedup': naive_time / indexed_time if indexed_time else None,
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Query or benchmark the critter schedule index.')
+    parser.add_argument('critters_json', help='critters.json written by parse_critter_data.py')
+    parser.add_argument('--at', nargs=2, metavar=('DAY', 'HH:MM'), help='list the critters out at a time')
+    parser.add_argument('--benchmark', action='store_true', help='compare the index against a naive scan')
+    parser.add_argument('--scale', type=int, default=1, help='repeat the critters this many times for --benchmark')
+    parser.add_argument('--queries', type=int, default=1000)
+    args = parser.parse_args()
+
+    with open(args.critters_json, 'r', encoding='utf-8') as f:
+        critters = json.load(f)
+
+    if args.benchmark:
+        scaled = [
+            dict(critter, name=f"{critter['name']} #{copy}")
+            for copy in range(args.scale) for critter in critters
+        ]
+        print(json.dumps(benchmark(scaled, args.queries), indent=2))
+    elif args.at:
+        day, clock = args.at
+        hour, minute = clock.split(':')
+        for name in ScheduleIndex(critters).active_at(minute_of_week(day, int(hour), int(minute))):
+            print(name)
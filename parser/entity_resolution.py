@@ -0,0 +1,108 @@
+"""Alias tables that resolve critter type, location and ingredient names in one probe."""
+from collections import Counter
+import json
+from typing import Dict, Iterable, Optional
+
+# Spellings that differ between wiki tables and aren't a case or plural change
+KNOWN_INGREDIENT_VARIANTS = {
+    'Any Vegetables': 'Any Vegetable',
+}
+
+def is_generic(name: str) -> bool:
+    """Whether an ingredient name is a generic category slot like "Any Fruit"."""
+    return name.startswith('Any ')
+
+def fold(name: str) -> str:
+    """Case- and whitespace-insensitive form of a name."""
+    return ' '.join(name.casefold().split())
+
+def plural_forms(folded: str) -> Iterable[str]:
+    yield folded + 's'
+    yield folded + 'es'
+    if folded.endswith('y'):
+        yield folded[:-1] + 'ies'
+
+class AliasIndex:
+    """Maps every known spelling of an entity to its canonical name.
+
+    Names are looked up exactly first and then case-folded, so either way a
+    lookup is a dict probe no matter how many entities are registered. Names
+    that resolve to nothing are counted for a report instead of being printed
+    as they are met.
+    """
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.unresolved: Counter = Counter()
+        self._exact: Dict[str, str] = {}
+        self._folded: Dict[str, str] = {}
+
+    def add(self, canonical: str, aliases: Iterable[str] = (), plurals: bool = True):
+        """Register a canonical name with its aliases; earlier registrations win."""
+        names = [canonical, *aliases]
+        for name in names:
+            self._exact.setdefault(name, canonical)
+            folded = fold(name)
+            self._folded.setdefault(folded, canonical)
+            if plurals:
+                for form in plural_forms(folded):
+                    self._folded.setdefault(form, canonical)
+
+    def lookup(self, name: str) -> Optional[str]:
+        """Canonical name for name, or None, without counting misses."""
+        canonical = self._exact.get(name)
+        if canonical is None:
+            canonical = self._folded.get(fold(name))
+        return canonical
+
+    def resolve(self, name: str) -> Optional[str]:
+        """Canonical name for name, or None after counting it as unresolved."""
+        canonical = self.lookup(name)
+        if canonical is None:
+            self.unresolved[name] += 1
+        return canonical
+
+    def resolve_or_add(self, name: str) -> str:
+        """Canonical name for name, registering it as a new entity if unknown."""
+        canonical = self.lookup(name)
+        if canonical is None:
+            self.add(name)
+            canonical = name
+        return canonical
+
+def critter_type_index(critter_type_map: dict) -> AliasIndex:
+    """Index of critter types by name, plural and the names of their variants."""
+    index = AliasIndex('critter_type')
+    for critter_type, details in critter_type_map.items():
+        index.add(critter_type, [details['plural'], *details['types']])
+    return index
+
+def critter_variants(critter_type_map: dict) -> Dict[str, str]:
+    """Critter type of each variant name, for names that must match a variant exactly."""
+    variants: Dict[str, str] = {}
+    for critter_type, details in critter_type_map.items():
+        for variant in details['types']:
+            variants.setdefault(variant, critter_type)
+    return variants
+
+def ingredient_index(categories: Dict[str, dict]) -> AliasIndex:
+    """Index of the ingredient names listed in ingredients.json, plus known variants."""
+    index = AliasIndex('ingredient')
+    for data in categories.values():
+        for name in data['ingredients']:
+            index.add(name)
+    for variant, canonical in KNOWN_INGREDIENT_VARIANTS.items():
+        index.add(canonical, [variant])
+    return index
+
+def unresolved_report(*indexes: AliasIndex) -> dict:
+    return {index.kind: dict(index.unresolved.most_common()) for index in indexes}
+
+def print_unresolved(*indexes: AliasIndex):
+    for index in indexes:
+        if index.unresolved:
+            print(f"Unresolved {index.kind} names: {', '.join(sorted(index.unresolved))}")
+
+def write_unresolved_report(path: str, *indexes: AliasIndex):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(unresolved_report(*indexes), f, indent=2, ensure_ascii=False)
@@ -0,0 +1,191 @@
+"""Build light trees straight from regular table markup, skipping BeautifulSoup.
+
+The wiki tables are written by a template: balanced tags, quoted attributes,
+no comments or scripts inside the table. For markup like that, a regex
+tokenizer can build the same tree html.parser would, as plain Element objects
+that RowSpec.extract walks just like bs4 tags, so the parsers read their
+fields with the code they already have:
+
+    tree = parse_fragment(row_html)    # raises Unsupported for anything unusual
+    cells = RECIPE_ROW.extract(tree)
+
+Anything the tokenizer can't vouch for (comments, unbalanced or unknown tags,
+stray '<', duplicate attributes) raises Unsupported, and the caller parses
+that row with BeautifulSoup instead. FastPathStats counts both paths.
+"""
+from collections import Counter
+from html import unescape
+import re
+from typing import Dict, List, Optional, Tuple
+
+from bs4.builder import HTMLTreeBuilder
+
+# Tags the template uses. Others (script, style, textarea, ...) parse differently, so they fall back
+KNOWN_TAGS = frozenset([
+    'table', 'thead', 'tbody', 'tfoot', 'tr', 'th', 'td', 'caption',
+    'a', 'abbr', 'b', 'big', 'br', 'center', 'div', 'em', 'font', 'hr', 'i', 'img', 'li', 'ol', 'p',
+    's', 'small', 'span', 'strong', 'sub', 'sup', 'u', 'ul', 'wbr',
+])
+# BeautifulSoup closes these as soon as they open
+VOID_TAGS = frozenset(HTMLTreeBuilder.empty_element_tags)
+# Attributes BeautifulSoup splits into a list of words
+_LIST_ATTRIBUTES = HTMLTreeBuilder.DEFAULT_CDATA_LIST_ATTRIBUTES
+
+_TOKEN_RE = re.compile(
+    r'<(/?)([a-zA-Z][a-zA-Z0-9]*)'  # tag name
+    r'((?:\s+[^\s"\'<>/=]+(?:\s*=\s*(?:"[^"]*"|\'[^\']*\'|[^\s"\'=<>`]+))?)*)'  # attributes
+    r'\s*(/?)>'
+    r'|([^<]+)'  # text
+    r'|(<)'  # anything else: comments, doctypes, stray '<'
+)
+_ATTRIBUTE_RE = re.compile(r'([^\s"\'<>/=]+)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'=<>`]+)))?')
+
+class Unsupported(ValueError):
+    """Markup the fast path can't be sure it parses the way BeautifulSoup does."""
+
+class Element:
+    """A tag of a light tree, with just the parts of bs4's Tag that RowSpec and the parsers use.
+
+    Attributes are only parsed when first read, since most tags are never asked
+    for theirs; that can raise Unsupported too.
+    """
+
+    __slots__ = ('name', '_attrs', '_raw_attrs', 'contents', 'parent')
+
+    def __init__(self, name: str, raw_attrs: str, parent: Optional['Element']):
+        self.name = name
+        self._attrs: Optional[Dict[str, object]] = None
+        self._raw_attrs = raw_attrs
+        self.contents: list = []
+        self.parent = parent
+
+    @property
+    def attrs(self) -> Dict[str, object]:
+        if self._attrs is None:
+            self._attrs = _attributes(self.name, self._raw_attrs) if self._raw_attrs else {}
+        return self._attrs
+
+    def get(self, key: str, default=None):
+        return self.attrs.get(key, default)
+
+def _attributes(name: str, text: str) -> Dict[str, object]:
+    attrs: Dict[str, object] = {}
+    for key, double_quoted, single_quoted, unquoted in _ATTRIBUTE_RE.findall(text):
+        key = key.lower()
+        if key in attrs:
+            raise Unsupported(f'duplicate attribute {key}')
+        if unquoted.endswith('/'):
+            raise Unsupported('unquoted attribute ending in /')  # html.parser may read it as a self-closing tag
+        value = double_quoted or single_quoted or unquoted
+        if '&' in value:
+            value = unescape(value)
+        if key in _LIST_ATTRIBUTES['*'] or key in _LIST_ATTRIBUTES.get(name, ()):
+            value = value.split()
+        attrs[key] = value
+    return attrs
+
+def parse_fragment(markup: str) -> Element:
+    """A light tree of markup under a nameless root, as html.parser would build it.
+
+    Raises Unsupported unless every tag is known and balanced and there is
+    nothing but tags and text; reading an element's attributes may raise it
+    as well.
+    """
+    root = Element('', {}, None)
+    node = root
+    for m in _TOKEN_RE.finditer(markup):
+        closing, name, attributes, self_closing, text, other = m.groups()
+        if text is not None:
+            # html.parser hands text over with character references already converted
+            node.contents.append(unescape(text) if '&' in text else text)
+            continue
+        if other is not None:
+            raise Unsupported('comment, declaration or stray <')
+        name = name.lower()
+        if name not in KNOWN_TAGS:
+            raise Unsupported(f'<{name}>')
+        if closing:
+            if name != node.name or attributes or self_closing:
+                raise Unsupported(f'unbalanced </{name}>')
+            node = node.parent
+            continue
+        element = Element(name, attributes, node)
+        node.contents.append(element)
+        if not self_closing and name not in VOID_TAGS:
+            node = element
+    if node is not root:
+        raise Unsupported(f'unclosed <{node.name}>')
+    return root
+
+# Parts of a page html.parser never builds tags from, and the tags that start a table
+_SKIPPED_OR_TABLE_RE = re.compile(r'<!--.*?-->|<(script|style)\b.*?</\1\s*>|<table\b', re.DOTALL | re.IGNORECASE)
+_TABLE_END_RE = re.compile(r'</table\s*>', re.IGNORECASE)
+_ROW_RE = re.compile(r'<tr\b.*?</tr\s*>', re.DOTALL | re.IGNORECASE)
+_BETWEEN_ROWS_RE = re.compile(r'(?:\s|</?(?:thead|tbody|tfoot)\b[^<>]*>)*', re.IGNORECASE)
+_CELL_RE = re.compile(r'<t[hd]\b', re.IGNORECASE)
+
+def first_table(html_content: str) -> Optional[Tuple[int, int]]:
+    """Start and end offsets of the first <table> element of a page, or None if there isn't a plain one."""
+    for m in _SKIPPED_OR_TABLE_RE.finditer(html_content):
+        if m.group(0)[:6].lower() != '<table':
+            continue
+        end = _TABLE_END_RE.search(html_content, m.end())
+        if not end or re.search(r'<table\b', html_content[m.end():end.start()], re.IGNORECASE):
+            return None  # Unclosed or nested tables
+        return m.start(), end.end()
+    return None
+
+def split_rows(html_content: str) -> Optional[List[str]]:
+    """The markup of each <tr> in the first table, as find('table').find_all('tr') finds them.
+
+    Returns None when anything but the rows themselves, whitespace and
+    thead/tbody/tfoot tags sits in the table, or rows are nested.
+    """
+    span = first_table(html_content)
+    if span is None:
+        return None
+    table = html_content[span[0]:span[1]]
+    body_start = table.index('>') + 1
+    body_end = _TABLE_END_RE.search(table).start()
+
+    rows = []
+    position = body_start
+    for m in _ROW_RE.finditer(table, body_start, body_end):
+        if not _BETWEEN_ROWS_RE.fullmatch(table, position, m.start()):
+            return None
+        row = m.group(0)
+        if re.search(r'<tr\b', row[3:], re.IGNORECASE):
+            return None
+        rows.append(row)
+        position = m.end()
+    if not _BETWEEN_ROWS_RE.fullmatch(table, position, body_end):
+        return None
+    return rows
+
+def table_fragment(html_content: str) -> Element:
+    """A light tree of the first table of a page, which must hold every th and td cell of the page."""
+    span = first_table(html_content)
+    if span is None:
+        raise Unsupported('table layout')
+    start, end = span
+    if _CELL_RE.search(html_content, 0, start) or _CELL_RE.search(html_content, end):
+        raise Unsupported('cells outside the table')
+    return parse_fragment(html_content[start:end])
+
+class FastPathStats:
+    """How many rows took the fast path and how many fell back, and why."""
+
+    def __init__(self):
+        self.fast = 0
+        self.fallback = 0
+        self.reasons: Counter = Counter()
+
+    def fell_back(self, reason: str, rows: int = 1):
+        self.fallback += rows
+        self.reasons[reason] += rows
+
+    def summary(self) -> str:
+        text = f"Fast path: {self.fast} rows, {self.fallback} fell back to BeautifulSoup"
+        if self.reasons:
+            text += ' (' + ', '.join(f'{reason}: {count}' for reason, count in self.reasons.most_common()) + ')'
+        return text
@@ -0,0 +1,343 @@
+"""Plan which critters to feed from a food inventory within a time window.
+
+Joins the two outputs of parse_critter_data.py: critter types say which foods
+each kind of critter eats and what feeding it rewards, critters say which type
+each one is and when it is out. Feeding a critter once befriends it, so a plan
+gives each critter that is out during the window at most one food, choosing
+the foods so as many critters as possible are fed and, among those plans, the
+rewards expected are largest.
+
+    python feeding_planner.py critter-types.json critters.json --have Fish=3 Seafood=2 --from monday 06:00 --to monday 12:00
+"""
+import argparse
+from collections import deque
+import json
+import random
+import re
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from critter_schedule import DAYS, MINUTES_PER_DAY, MINUTES_PER_WEEK, minute_of_week, schedule_intervals
+
+WEEK_MASK = (1 << MINUTES_PER_WEEK) - 1
+
+def interval_mask(start: int, end: int) -> int:
+    """Bitmap of the minutes of the week in [start, end); end may run past the week and wrap."""
+    if end - start >= MINUTES_PER_WEEK:
+        return WEEK_MASK
+    start %= MINUTES_PER_WEEK
+    end = start + (end - start if end >= start else end - start + MINUTES_PER_WEEK)
+    mask = ((1 << (min(end, MINUTES_PER_WEEK) - start)) - 1) << start
+    if end > MINUTES_PER_WEEK:
+        mask |= (1 << (end - MINUTES_PER_WEEK)) - 1
+    return mask
+
+def reward_halves(rewards: List[dict]) -> int:
+    """Expected number of reward items, doubled so a "1-3" quantity stays a whole number."""
+    total = 0
+    for reward in rewards:
+        low, _, high = (reward.get('quantity') or '1').partition('-')
+        low = int(low) if low.isdigit() else 1
+        total += low + (int(high) if high.isdigit() else low)
+    return total
+
+class FlowNetwork:
+    """A min-cost flow network over integer capacities and costs, as adjacency lists of paired edges."""
+
+    def __init__(self, nodes: int):
+        # An edge is [to, capacity left, cost, index of its reverse edge in the list of to]
+        self.edges: List[List[list]] = [[] for _ in range(nodes)]
+
+    def add_edge(self, source: int, to: int, capacity: int, cost: int) -> list:
+        edge = [to, capacity, cost, len(self.edges[to])]
+        self.edges[source].append(edge)
+        self.edges[to].append([source, 0, -cost, len(self.edges[source]) - 1])
+        return edge
+
+    def _shortest_path(self, source: int, sink: int) -> Optional[List[Tuple[int, int]]]:
+        # Cheapest path with capacity left, found with a queue-based Bellman-Ford since
+        # residual edges cost less than nothing; as (node, edge index) steps into the sink
+        distance = [None] * len(self.edges)
+        previous: List[Optional[Tuple[int, int]]] = [None] * len(self.edges)
+        queued = [False] * len(self.edges)
+        distance[source] = 0
+        queue = deque([source])
+        while queue:
+            node = queue.popleft()
+            queued[node] = False
+            for index, (to, capacity, cost, _) in enumerate(self.edges[node]):
+                if capacity and (distance[to] is None or distance[node] + cost < distance[to]):
+                    distance[to] = distance[node] + cost
+                    previous[to] = (node, index)
+                    if not queued[to]:
+                        queued[to] = True
+                        queue.append(to)
+        if distance[sink] is None:
+            return None
+        path, node = [], sink
+        while node != source:
+            path.append(previous[node])
+            node = previous[node][0]
+        return path
+
+    def max_flow_min_cost(self, source: int, sink: int) -> Tuple[int, int]:
+        """Push the most flow possible from source to sink at the least cost; return (flow, cost)."""
+        flow = cost = 0
+        while True:
+            path = self._shortest_path(source, sink)
+            if path is None:
+                return flow, cost
+            # Each path carries as much as its narrowest edge, so the rounds don't grow with the counts
+            amount = min(self.edges[node][index][1] for node, index in path)
+            for node, index in path:
+                edge = self.edges[node][index]
+                edge[1] -= amount
+                self.edges[edge[0]][edge[3]][1] += amount
+                cost += amount * edge[2]
+            flow += amount
+
+class FeedingPlanner:
+    """Indexes over critter types and critters that answer feeding plan queries.
+
+    Built once from the parsed output:
+
+    - food_types: food -> the critter types that eat it
+    - rewards: (food, type) -> whether it's a favorite, its rewards and their value
+    - availability: one bitmap per critter with a bit for each minute of the
+      week it is out, so "out during the window" is a single AND
+
+    A query is a min-cost max-flow problem: the source feeds each critter
+    type as many units as it has critters out, each type passes them on to
+    the foods it eats at the cost of minus their reward, and each food takes
+    as many as are held. The maximum flow feeds the most critters, and the
+    cheapest such flow has the largest rewards. The network has a node per
+    type and food rather than per critter or item, so a query costs the same
+    for 3 or 300 of a food.
+    """
+
+    def __init__(self, critter_types: List[dict], critters: List[dict]):
+        self.type_names: List[str] = []
+        self.type_ids: Dict[str, int] = {}
+        self.type_locations: List[str] = []
+        self.food_types: Dict[str, List[int]] = {}
+        self.rewards: Dict[Tuple[str, int], Tuple[bool, List[dict], int]] = {}
+        for critter_type in critter_types:
+            if critter_type['name'] in self.type_ids:
+                continue  # The first row of a type wins, as it does for locations
+            id = self.type_ids[critter_type['name']] = len(self.type_names)
+            self.type_names.append(critter_type['name'])
+            self.type_locations.append(critter_type.get('location'))
+            for favorite, foods, rewards in ((True, critter_type['fav_food'], critter_type['fav_food_reward']),
+                                             (False, critter_type['liked_food'], critter_type['liked_food_reward'])):
+                for food in foods:
+                    if (food['name'], id) in self.rewards:
+                        continue  # Favorite foods are also listed as liked; the favorite reward applies
+                    self.food_types.setdefault(food['name'], []).append(id)
+                    self.rewards[(food['name'], id)] = (favorite, rewards, reward_halves(rewards))
+        self._foods_of_type: List[List[str]] = [[] for _ in self.type_names]
+        for food, type_ids in self.food_types.items():
+            for id in type_ids:
+                self._foods_of_type[id].append(food)
+
+        self.critters = critters
+        self.critter_types: List[Optional[int]] = [self.type_ids.get(critter['type']) for critter in critters]
+        self.availability: List[int] = []
+        for critter in critters:
+            mask = 0
+            for start, end in schedule_intervals(critter['schedule']):
+                mask |= ((1 << (end - start)) - 1) << start
+            self.availability.append(mask)
+
+    def critters_eating(self, food: str) -> List[str]:
+        """Names of the critters whose type eats a food."""
+        type_ids = set(self.food_types.get(food, ()))
+        return [critter['name'] for critter, id in zip(self.critters, self.critter_types) if id in type_ids]
+
+    def available(self, start: int, end: int) -> List[int]:
+        """Positions of the critters out at any point in [start, end)."""
+        window = interval_mask(start, end)
+        return [position for position, mask in enumerate(self.availability) if mask & window]
+
+    def _first_minute(self, position: int, start: int) -> int:
+        # Minutes from start until the critter is first out, rotating the week so start is bit 0
+        start %= MINUTES_PER_WEEK
+        mask = self.availability[position]
+        rotated = ((mask >> start) | (mask << (MINUTES_PER_WEEK - start))) & WEEK_MASK
+        return (rotated & -rotated).bit_length() - 1
+
+    def plan(self, inventory: Dict[str, int], start: int = 0, end: int = MINUTES_PER_WEEK) -> dict:
+        """The feeding plan for an inventory (food -> count) and the window [start, end)."""
+        inventory = {food: count for food, count in inventory.items() if count > 0 and food in self.food_types}
+        out_by_type: Dict[int, List[int]] = {}
+        for position in self.available(start, end):
+            id = self.critter_types[position]
+            if id is not None and any((food, id) in self.rewards for food in inventory):
+                out_by_type.setdefault(id, []).append(position)
+
+        # Source, sink, then a node per type out and per food held
+        type_nodes = {id: 2 + i for i, id in enumerate(sorted(out_by_type))}
+        food_nodes = {food: 2 + len(type_nodes) + i for i, food in enumerate(sorted(inventory))}
+        network = FlowNetwork(2 + len(type_nodes) + len(food_nodes))
+        feeds: List[Tuple[int, str, list]] = []
+        for id, node in type_nodes.items():
+            network.add_edge(0, node, len(out_by_type[id]), 0)
+            for food in self._foods_of_type[id]:
+                if food in inventory:
+                    feeds.append((id, food, network.add_edge(node, food_nodes[food], len(out_by_type[id]),
+                                                             -self.rewards[(food, id)][2])))
+        for food, node in food_nodes.items():
+            network.add_edge(node, 1, inventory[food], 0)
+        fed, cost = network.max_flow_min_cost(0, 1)
+        value = -cost
+
+        # Within a type, the most rewarding foods come first so they go to the critters out soonest
+        allocation = sorted(((id, food, len(out_by_type[id]) - edge[1]) for id, food, edge in feeds
+                             if edge[1] < len(out_by_type[id])),
+                            key=lambda item: (item[0], -self.rewards[(item[1], item[0])][2], item[1]))
+
+        steps = []
+        for id, food, amount in allocation:
+            # Within a type, the critters out soonest get the food
+            positions = sorted(out_by_type[id], key=lambda position: (self._first_minute(position, start),
+                                                                      self.critters[position]['name']))
+            favorite, rewards, _ = self.rewards[(food, id)]
+            for position in positions[:amount]:
+                critter = self.critters[position]
+                steps.append({
+                    'critter': critter['name'],
+                    'type': self.type_names[id],
+                    'location': critter.get('location'),
+                    'food': food,
+                    'favorite': favorite,
+                    'minute': (start + self._first_minute(position, start)) % MINUTES_PER_WEEK,
+                    'rewards': rewards,
+                })
+            # Later foods for the same type go to the critters not fed yet
+            out_by_type[id] = positions[amount:]
+        steps.sort(key=lambda step: ((step['minute'] - start) % MINUTES_PER_WEEK, step['location'] or '',
+                                     step['critter']))
+        return {
+            'fed': fed,
+            'expected_rewards': value / 2,
+            'steps': steps,
+            'unfed': sorted(self.critters[position]['name'] for positions in out_by_type.values()
+                            for position in positions),
+        }
+
+def brute_force_plan(planner: FeedingPlanner, inventory: Dict[str, int], start: int, end: int) -> Tuple[int, float]:
+    """(critters fed, expected rewards) of the best plan, found by trying every assignment; tiny inputs only."""
+    positions = [position for position in planner.available(start, end) if planner.critter_types[position] is not None]
+
+    def search(i: int, counts: Dict[str, int]) -> Tuple[int, int]:
+        if i == len(positions):
+            return 0, 0
+        best = search(i + 1, counts)
+        id = planner.critter_types[positions[i]]
+        for food, count in counts.items():
+            if count and (food, id) in planner.rewards:
+                fed, value = search(i + 1, {**counts, food: count - 1})
+                best = max(best, (fed + 1, value + planner.rewards[(food, id)][2]))
+        return best
+
+    fed, value = search(0, {food: count for food, count in inventory.items() if count > 0})
+    return fed, value / 2
+
+def benchmark(critter_types: List[dict], critters: List[dict], queries: int = 200, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    planner = FeedingPlanner(critter_types, critters)
+    build = time.perf_counter() - started
+
+    foods = sorted(planner.food_types)
+    windows = []
+    for _ in range(queries):
+        start = rng.randrange(0, MINUTES_PER_WEEK, 60)
+        inventory = {food: rng.randint(1, 6) for food in rng.sample(foods, min(len(foods), rng.randint(1, 8)))}
+        windows.append((inventory, start, start + rng.choice([60, 240, MINUTES_PER_DAY])))
+
+    started = time.perf_counter()
+    plans = [planner.plan(inventory, start, end) for inventory, start, end in windows]
+    cold = time.perf_counter() - started
+    # Inventories as players hold them: every food, tens to hundreds of each, over the whole week
+    stocked = [{food: rng.randint(20, 300) for food in foods} for _ in range(max(1, queries // 10))]
+    started = time.perf_counter()
+    for inventory in stocked:
+        planner.plan(inventory, 0, MINUTES_PER_WEEK)
+    stocked_seconds = time.perf_counter() - started
+
+    # The search should find the best plan; check it against every assignment on small windows
+    small = FeedingPlanner(critter_types, critters[:8])
+    checked = 0
+    for inventory, start, end in windows[:50]:
+        inventory = dict(list(inventory.items())[:3])
+        plan = small.plan(inventory, start, end)
+        assert (plan['fed'], plan['expected_rewards']) == brute_force_plan(small, inventory, start, end), \
+            'planner and exhaustive search disagree'
+        checked += 1
+
+    return {
+        'critter_types': len(planner.type_names),
+        'critters': len(critters),
+        'foods': len(foods),
+        'queries': queries,
+        'build_seconds': build,
+        'ms_per_query': cold / queries * 1000,
+        'stocked_queries': len(stocked),
+        'stocked_ms_per_query': stocked_seconds / len(stocked) * 1000,
+        'mean_critters_fed': sum(plan['fed'] for plan in plans) / queries,
+        'checked_against_exhaustive_search': checked,
+    }
+
+def parse_inventory(values: Iterable[str]) -> Dict[str, int]:
+    inventory = {}
+    for value in values:
+        food, _, count = value.rpartition('=')
+        if not food:
+            food, count = count, '1'
+        inventory[food] = inventory.get(food, 0) + int(count)
+    return inventory
+
+def format_minute(minute: int) -> str:
+    day, minute = divmod(minute % MINUTES_PER_WEEK, MINUTES_PER_DAY)
+    return f"{DAYS[day].capitalize()} {minute // 60:02d}:{minute % 60:02d}"
+
+def _window_edge(value: List[str]) -> int:
+    day, clock = value
+    match = re.fullmatch(r'(\d{1,2})(?::(\d{2}))?', clock)
+    if not match:
+        raise ValueError(f'expected HH:MM, got {clock!r}')
+    return minute_of_week(day, int(match.group(1)), int(match.group(2) or 0))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Plan which critters to feed from an inventory.')
+    parser.add_argument('critter_types_json', help='critter-types.json written by parse_critter_data.py')
+    parser.add_argument('critters_json', help='critters.json written by parse_critter_data.py')
+    parser.add_argument('--have', nargs='+', default=[], metavar='FOOD=COUNT', help='foods in the inventory')
+    parser.add_argument('--from', dest='start', nargs=2, metavar=('DAY', 'HH:MM'), help='start of the window')
+    parser.add_argument('--to', dest='end', nargs=2, metavar=('DAY', 'HH:MM'),
+                        help='end of the window; at or before the start wraps into the next week')
+    parser.add_argument('--benchmark', action='store_true', help='time random queries and check them exhaustively')
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    with open(args.critter_types_json, 'r', encoding='utf-8') as f:
+        critter_types = json.load(f)
+    with open(args.critters_json, 'r', encoding='utf-8') as f:
+        critters = json.load(f)
+
+    if args.benchmark:
+        print(json.dumps(benchmark(critter_types, critters, args.queries), indent=2))
+    else:
+        start = _window_edge(args.start) if args.start else 0
+        end = _window_edge(args.end) if args.end else start + MINUTES_PER_WEEK
+        if end <= start:
+            end += MINUTES_PER_WEEK
+        plan = FeedingPlanner(critter_types, critters).plan(parse_inventory(args.have), start, end)
+        for step in plan['steps']:
+            rewards = ', '.join(f"{reward['item']} x{reward['quantity']}" for reward in step['rewards'])
+            favorite = 'favorite' if step['favorite'] else 'liked'
+            print(f"{format_minute(step['minute'])}  {step['critter']} ({step['location']}): "
+                  f"{step['food']} [{favorite}] -> {rewards}")
+        print(f"Feeds {plan['fed']} critters for about {plan['expected_rewards']:g} reward items")
+        if plan['unfed']:
+            print(f"Out but not fed: {', '.join(plan['unfed'])}")
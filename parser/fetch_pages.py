@@ -0,0 +1,318 @@
+"""Download the wiki source pages the parsers read, with conditional GETs and an on-disk cache.
+
+Each page's body is kept in the cache directory along with its ETag and
+Last-Modified validators. The next fetch sends them back as If-None-Match and
+If-Modified-Since, so a page that hasn't changed costs one 304 and its parser
+isn't run again:
+
+    python fetch_pages.py ../data --parse
+    python fetch_pages.py /tmp/pages --origin http://127.0.0.1:8000   # against a local stand-in
+
+The parsers read a single table, so only the page's data table is kept:
+the first table with the class PAGE_TABLES lists for the file, cut out of
+the page exactly as written. Navboxes and the rest of the page are dropped
+before the body is cached or saved.
+
+Pages are fetched concurrently with asyncio; the blocking requests run in
+threads, so nothing beyond the standard library is needed.
+"""
+import argparse
+import asyncio
+import hashlib
+from html.parser import HTMLParser
+import json
+import os
+import re
+import time
+from typing import Callable, Dict, List, Optional
+import urllib.error
+from urllib.parse import urlsplit
+import urllib.request
+
+WIKI_URL = 'https://dreamlightvalleywiki.com'
+DEFAULT_CACHE_DIR = '.page-cache'
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RETRIES = 2
+DEFAULT_TIMEOUT = 30
+INDEX_FILE = 'index.json'
+USER_AGENT = 'dlv-recipes-page-fetcher'
+
+# Output file -> page it is saved from; override with --page FILE=URL
+PAGES = {
+    'ingredients-table.html': f'{WIKI_URL}/Ingredients',
+    'recipe-table.html': f'{WIKI_URL}/Recipes',
+    'critter-type-table.html': f'{WIKI_URL}/Critters',
+    'critter-schedule-table.html': f'{WIKI_URL}/Critter_Schedule',
+}
+
+# Output file -> class of the table cut out of its page
+PAGE_TABLES = {
+    'ingredients-table.html': 'wikitable',
+    'recipe-table.html': 'wikitable',
+    'critter-type-table.html': 'wikitable',
+    'critter-schedule-table.html': 'wikitable',
+}
+DEFAULT_TABLE_CLASS = 'wikitable'
+
+# Statuses of a fetched page; only CHANGED pages need parsing again
+CHANGED = 'changed'
+NOT_MODIFIED = 'not_modified'
+UNCHANGED = 'unchanged'
+FAILED = 'failed'
+
+def _atomic_write(path: str, data: bytes):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+class TableCutter(HTMLParser):
+    """Finds where the first table with a class starts and ends, at the offsets the tokenizer reports."""
+
+    def __init__(self, html_content: str, table_class: str):
+        super().__init__(convert_charrefs=False)
+        self.table_class = table_class
+        self.start: Optional[int] = None
+        self.end: Optional[int] = None
+        self._line_offsets = [0] + [match.end() for match in re.finditer('\n', html_content)]
+        self._html_content = html_content
+        self._depth = 0
+
+    def _offset(self) -> int:
+        line, column = self.getpos()
+        return self._line_offsets[line - 1] + column
+
+    def handle_starttag(self, tag, attrs):
+        if tag != 'table' or self.end is not None:
+            return
+        if self.start is not None:
+            self._depth += 1  # A table nested in the one being cut
+        elif self.table_class in (dict(attrs).get('class') or '').split():
+            self.start = self._offset()
+
+    def handle_endtag(self, tag):
+        if tag != 'table' or self.start is None or self.end is not None:
+            return
+        if self._depth:
+            self._depth -= 1
+        else:
+            self.end = self._html_content.index('>', self._offset()) + 1
+
+def cut_table(body: bytes, table_class: str) -> Optional[bytes]:
+    """The markup of the first table with table_class in a page, or None if it has none."""
+    html_content = body.decode('utf-8')
+    cutter = TableCutter(html_content, table_class)
+    cutter.feed(html_content)
+    cutter.close()
+    if cutter.start is None:
+        return None
+    # An unclosed table runs to the end of the page
+    end = cutter.end if cutter.end is not None else len(html_content)
+    return html_content[cutter.start:end].encode('utf-8')
+
+class PageCache:
+    """Bodies and validators of previously fetched pages, keyed by URL."""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self._index: Dict[str, dict] = {}
+        path = os.path.join(cache_dir, INDEX_FILE)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self._index = json.load(f)
+
+    def _body_path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode('utf-8')).hexdigest() + '.html')
+
+    def entry(self, url: str) -> Optional[dict]:
+        """The cached entry for url, if its body is still on disk."""
+        entry = self._index.get(url)
+        if entry and os.path.exists(self._body_path(url)):
+            return entry
+        return None
+
+    def body(self, url: str) -> bytes:
+        with open(self._body_path(url), 'rb') as f:
+            return f.read()
+
+    def store(self, url: str, body: bytes, etag: Optional[str], last_modified: Optional[str],
+              table_class: Optional[str] = None):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        _atomic_write(self._body_path(url), body)
+        self._index[url] = {
+            'etag': etag,
+            'last_modified': last_modified,
+            'table_class': table_class,
+            'sha256': hashlib.sha256(body).hexdigest(),
+            'fetched_at': time.time(),
+        }
+
+    def save(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        _atomic_write(os.path.join(self.cache_dir, INDEX_FILE),
+                      json.dumps(self._index, indent=2, sort_keys=True).encode('utf-8'))
+
+class PageFetcher:
+    """Fetches pages concurrently, revalidating cached copies instead of re-downloading them."""
+
+    def __init__(self, cache: PageCache, concurrency: int = DEFAULT_CONCURRENCY, retries: int = DEFAULT_RETRIES,
+                 timeout: float = DEFAULT_TIMEOUT, origin: Optional[str] = None):
+        self.cache = cache
+        self.concurrency = concurrency
+        self.retries = retries
+        self.timeout = timeout
+        self.origin = urlsplit(origin) if origin else None
+
+    def _request(self, url: str, entry: Optional[dict]):
+        # Blocking; runs in a worker thread. Returns (status code, body, headers)
+        parts = urlsplit(url)
+        if self.origin:
+            parts = parts._replace(scheme=self.origin.scheme, netloc=self.origin.netloc)
+        headers = {'User-Agent': USER_AGENT}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        request = urllib.request.Request(parts.geturl(), headers=headers)
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(2 ** (attempt - 1))
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    return response.status, response.read(), response.headers
+            except urllib.error.HTTPError as e:
+                if e.code < 500 and e.code != 429:
+                    # 304 lands here too; urllib treats every non-2xx status as an error
+                    return e.code, b'', e.headers
+                error = e
+            except (urllib.error.URLError, OSError) as e:
+                error = e
+        raise IOError(f'{url}: {error}')
+
+    async def fetch(self, url: str, semaphore: asyncio.Semaphore, table_class: Optional[str] = None) -> dict:
+        """Fetch one page, returning its status and, unless it failed, its body.
+
+        With table_class the body is only the first table of that class.
+        """
+        entry = self.cache.entry(url)
+        if entry and entry.get('table_class') != table_class:
+            entry = None  # Cached as a different cut of the page
+        async with semaphore:
+            try:
+                code, body, headers = await asyncio.to_thread(self._request, url, entry)
+            except IOError as e:
+                return {'url': url, 'status': FAILED, 'error': str(e)}
+
+        if code == 304 and entry:
+            return {'url': url, 'status': NOT_MODIFIED, 'body': self.cache.body(url)}
+        if code != 200:
+            return {'url': url, 'status': FAILED, 'error': f'HTTP {code}'}
+
+        if table_class:
+            body = cut_table(body, table_class)
+            if body is None:
+                return {'url': url, 'status': FAILED, 'error': f'no <table class="{table_class}"> in the page'}
+
+        # Servers without validators still cost a download, but an identical body skips parsing.
+        # Only the table is compared, so edits elsewhere on the page don't count as changes
+        status = UNCHANGED if entry and entry['sha256'] == hashlib.sha256(body).hexdigest() else CHANGED
+        self.cache.store(url, body, headers.get('ETag'), headers.get('Last-Modified'), table_class)
+        return {'url': url, 'status': status, 'body': body}
+
+    async def fetch_all(self, urls: List[str], table_classes: Optional[Dict[str, str]] = None) -> Dict[str, dict]:
+        """Fetch each page once; table_classes maps a URL to the class of the table to keep of it."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        unique_urls = list(dict.fromkeys(urls))
+        table_classes = table_classes or {}
+        results = await asyncio.gather(*(self.fetch(url, semaphore, table_classes.get(url)) for url in unique_urls))
+        self.cache.save()
+        return dict(zip(unique_urls, results))
+
+def fetch_pages(out_dir: str, pages: Dict[str, str], fetcher: PageFetcher,
+                tables: Dict[str, str] = PAGE_TABLES) -> Dict[str, str]:
+    """Fetch pages into out_dir and return each file's status.
+
+    Each file is saved as the table tables names for it (the first
+    DEFAULT_TABLE_CLASS table for files it doesn't list). A file whose page
+    is unchanged is still rewritten if it is missing from out_dir, and then
+    counts as changed.
+    """
+    table_classes = {url: tables.get(file_name, DEFAULT_TABLE_CLASS) for file_name, url in pages.items()}
+    results = asyncio.run(fetcher.fetch_all(list(pages.values()), table_classes))
+    os.makedirs(out_dir, exist_ok=True)
+    statuses = {}
+    for file_name, url in pages.items():
+        result = results[url]
+        status = result['status']
+        path = os.path.join(out_dir, file_name)
+        if status == FAILED:
+            print(f"Could not fetch {file_name}: {result['error']}")
+        elif status == CHANGED or not os.path.exists(path):
+            _atomic_write(path, result['body'])
+            status = CHANGED
+        statuses[file_name] = status
+    return statuses
+
+def parse_ingredients(out_dir: str):
+    from script_loader import ingredients_parser
+    with open(os.path.join(out_dir, 'ingredients-table.html'), 'r', encoding='utf-8') as f:
+        ingredients = ingredients_parser().parse_ingredients_table(f.read())
+    with open(os.path.join(out_dir, 'ingredients.json'), 'w', encoding='utf-8') as f:
+        json.dump(ingredients, f, indent=2, ensure_ascii=False)
+
+def parse_recipes(out_dir: str):
+    from script_loader import recipe_parser
+    recipe_parser().convert_html_file_to_csv(os.path.join(out_dir, 'recipe-table.html'),
+                                             os.path.join(out_dir, 'recipes.csv'))
+
+def parse_critters(out_dir: str):
+    import parse_critter_data
+    parse_critter_data.main(out_dir)
+
+# Parser run for each group of pages, when any page in the group changed
+PARSERS: List[tuple] = [
+    (['ingredients-table.html'], parse_ingredients),
+    (['recipe-table.html'], parse_recipes),
+    (['critter-type-table.html', 'critter-schedule-table.html'], parse_critters),
+]
+
+def parse_changed(out_dir: str, statuses: Dict[str, str], parsers: List[tuple] = PARSERS) -> List[Callable]:
+    """Run the parsers whose pages changed and return them; the rest are skipped."""
+    ran = []
+    for file_names, parse in parsers:
+        if any(statuses.get(file_name) == CHANGED for file_name in file_names):
+            if all(os.path.exists(os.path.join(out_dir, file_name)) for file_name in file_names):
+                parse(out_dir)
+                ran.append(parse)
+    return ran
+
+def parse_page_overrides(values: List[str]) -> Dict[str, str]:
+    pages = dict(PAGES)
+    for value in values:
+        file_name, _, url = value.partition('=')
+        pages[file_name] = url
+    return pages
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Download the wiki source pages, skipping ones that have not changed.')
+    parser.add_argument('out_dir', help='directory the pages (and, with --parse, the parsed output) are written to')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='where page bodies and validators are kept')
+    parser.add_argument('--page', action='append', default=[], metavar='FILE=URL',
+                        help='fetch FILE from URL instead of its default page; may be repeated')
+    parser.add_argument('--only', nargs='+', metavar='FILE', help='fetch only these files')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help='pages fetched at once')
+    parser.add_argument('--origin', metavar='URL', help='send requests to this server instead, e.g. a local stand-in')
+    parser.add_argument('--parse', action='store_true', help='run the parsers for pages that changed')
+    args = parser.parse_args()
+
+    pages = parse_page_overrides(args.page)
+    if args.only:
+        pages = {file_name: pages[file_name] for file_name in args.only}
+    fetcher = PageFetcher(PageCache(args.cache_dir), args.concurrency, origin=args.origin)
+    statuses = fetch_pages(args.out_dir, pages, fetcher)
+    for file_name, status in statuses.items():
+        print(f"{file_name}: {status}")
+    if args.parse:
+        if not parse_changed(args.out_dir, statuses):
+            print('No pages changed; nothing to parse')
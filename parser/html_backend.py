@@ -0,0 +1,153 @@
+"""Choose the HTML tree builder the parsers use, and check that the choices agree.
+
+Every parser builds its trees with make_soup() instead of naming a builder, so
+a faster one can be picked per run with --html-backend:
+
+    python parse_critter_data.py --html-backend lxml
+    python html_backend.py ../data                 # compare every installed backend
+
+All backends are BeautifulSoup tree builders, so the row extraction code is
+the same whichever one built the tree. Optional ones fall back to the default
+with a message when their package isn't installed.
+"""
+import argparse
+import importlib.util
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+DEFAULT_BACKEND = 'html.parser'
+
+# Backend -> module it needs, if any
+BACKENDS = {
+    'html.parser': None,
+    'lxml': 'lxml',
+    'html5lib': 'html5lib',
+}
+
+_backend = DEFAULT_BACKEND
+
+def available(name: str) -> bool:
+    module = BACKENDS[name]
+    return module is None or importlib.util.find_spec(module) is not None
+
+def set_backend(name: str) -> str:
+    """Build trees with this backend from now on, or the default if it isn't installed; return the one used."""
+    global _backend
+    if not available(name):
+        print(f"HTML backend {name} is not installed ({BACKENDS[name]}); using {DEFAULT_BACKEND}")
+        name = DEFAULT_BACKEND
+    _backend = name
+    return name
+
+def current() -> str:
+    return _backend
+
+def make_soup(markup: str) -> BeautifulSoup:
+    """Build a tree from markup with the current backend."""
+    return BeautifulSoup(markup, _backend)
+
+def add_arguments(parser):
+    """Add the --html-backend flag to a parser's argparse CLI."""
+    parser.add_argument('--html-backend', choices=list(BACKENDS), default=DEFAULT_BACKEND,
+                        help='tree builder used to parse the HTML; optional ones fall back to html.parser '
+                             'when not installed')
+
+def from_arguments(args) -> str:
+    # parallel.py hands the backend chosen here to its pool workers
+    return set_backend(args.html_backend)
+
+def _read(path: str) -> str:
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def parse_recipes(data_dir: str) -> list:
+    from script_loader import recipe_parser
+    return recipe_parser().parse_table(_read(os.path.join(data_dir, 'recipe-table.html')))
+
+def parse_ingredients(data_dir: str) -> list:
+    from script_loader import ingredients_parser
+    categories = ingredients_parser().parse_ingredients_table(_read(os.path.join(data_dir, 'ingredients-table.html')))
+    return list(categories.items())
+
+def parse_critters(data_dir: str) -> list:
+    import parse_critter_data
+    return [row for table in parse_critter_data.TABLES for row in parse_critter_data.parse_table_file(data_dir, table)]
+
+# What the harness runs for each saved table: (name, file name, function returning its rows)
+PARSERS: List[Tuple[str, str, Callable[[str], list]]] = [
+    ('recipes', 'recipe-table.html', parse_recipes),
+    ('ingredients', 'ingredients-table.html', parse_ingredients),
+    ('critters', 'critter-type-table.html', parse_critters),
+]
+
+def _first_difference(expected: list, actual: list) -> str:
+    if len(expected) != len(actual):
+        return f'{len(actual)} rows instead of {len(expected)}'
+    for i, (expected_row, actual_row) in enumerate(zip(expected, actual)):
+        if expected_row != actual_row:
+            return f'row {i}: {actual_row!r} instead of {expected_row!r}'
+    return ''
+
+def compare_backends(data_dir: str, backends: Optional[List[str]] = None, repeat: int = 3) -> Dict[str, dict]:
+    """Run every parser with every installed backend and compare each result with the default backend's.
+
+    Returns backend -> parser -> {'rows', 'seconds', 'rows_per_second', 'difference'}; an empty
+    difference means the output matched. Backends that aren't installed are left out.
+    """
+    backends = [DEFAULT_BACKEND] + [name for name in (backends or BACKENDS) if name != DEFAULT_BACKEND]
+    parsers = [parser for parser in PARSERS if os.path.exists(os.path.join(data_dir, parser[1]))]
+    previous = current()
+    report: Dict[str, dict] = {}
+    expected: Dict[str, list] = {}
+    try:
+        for backend in backends:
+            if not available(backend):
+                print(f"Skipping {backend}: {BACKENDS[backend]} is not installed")
+                continue
+            set_backend(backend)
+            report[backend] = {}
+            for name, _, parse in parsers:
+                best = None
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    result = parse(data_dir)
+                    elapsed = time.perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+                if backend == DEFAULT_BACKEND:
+                    expected[name] = result
+                rows = len(result)
+                report[backend][name] = {
+                    'rows': rows,
+                    'seconds': best,
+                    'rows_per_second': rows / best if best else 0.0,
+                    'difference': _first_difference(expected[name], result),
+                }
+    finally:
+        set_backend(previous)
+    return report
+
+def print_report(report: Dict[str, dict]):
+    print(f"{'backend':<12} {'parser':<12} {'rows':>6} {'seconds':>8} {'rows/s':>9}  output")
+    for backend, parsers in report.items():
+        for name, result in parsers.items():
+            output = 'same' if not result['difference'] else f"DIFFERS: {result['difference']}"
+            print(f"{backend:<12} {name:<12} {result['rows']:>6} {result['seconds']:>8.3f} "
+                  f"{result['rows_per_second']:>9.0f}  {output}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Parse the saved tables with every HTML backend and compare.')
+    parser.add_argument('data_dir', help='directory holding the saved tables')
+    parser.add_argument('--backends', nargs='+', choices=list(BACKENDS),
+                        help='backends to compare with html.parser (default: all)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per parser; the fastest is reported')
+    args = parser.parse_args()
+
+    # The parsers import this file as html_backend, not __main__, so that's the module whose backend is set
+    import html_backend
+    report = html_backend.compare_backends(args.data_dir, args.backends, args.repeat)
+    print_report(report)
+    if any(result['difference'] for parsers in report.values() for result in parsers.values()):
+        raise SystemExit(1)
@@ -0,0 +1,249 @@
+"""Mirror the wiki images referenced by parsed rows into a local content-addressed store.
+
+Every image_url in the parsed output is collected and de-duplicated, fetched
+concurrently over keep-alive connections with retries and a shared rate limit,
+and stored under the sha256 of its bytes, so identical images are kept once:
+
+    <mirror_dir>/ab/ab12...ef.png
+    <mirror_dir>/index.json   # source URL -> stored path, so reruns only fetch new URLs
+
+The rows are then rewritten to point at url_prefix + stored path. For testing,
+origin sends every request to another server, e.g. http://127.0.0.1:8000,
+while the index stays keyed by the wiki URL.
+"""
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import hashlib
+import http.client
+import json
+import os
+import posixpath
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+from records import replaced
+
+DEFAULT_URL_PREFIX = '/images/mirror'
+DEFAULT_WORKERS = 8
+DEFAULT_RETRIES = 3
+DEFAULT_REQUESTS_PER_SECOND = 10.0
+DEFAULT_TIMEOUT = 30
+INDEX_FILE = 'index.json'
+USER_AGENT = 'dlv-recipes-image-mirror'
+
+# Worth retrying: the server is busy or briefly unavailable
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+def collect_image_urls(value, urls: Optional[Dict[str, None]] = None) -> Dict[str, None]:
+    """Every image_url in nested rows, de-duplicated in first-seen order."""
+    if urls is None:
+        urls = {}
+    # Rows are dicts or the read-only records of records.py
+    if isinstance(value, Mapping):
+        for key, item in value.items():
+            if key == 'image_url':
+                if item:
+                    urls[item] = None
+            else:
+                collect_image_urls(item, urls)
+    elif isinstance(value, list):
+        for item in value:
+            collect_image_urls(item, urls)
+    return urls
+
+def rewrite_image_urls(value, mapping: Dict[str, str]):
+    """A copy of value with each image_url found in mapping replaced; records are rebuilt as records."""
+    if isinstance(value, Mapping):
+        return replaced(value, **{
+            key: (mapping.get(item, item) if key == 'image_url' else rewrite_image_urls(item, mapping))
+            for key, item in value.items()
+        })
+    if isinstance(value, list):
+        return [rewrite_image_urls(item, mapping) for item in value]
+    return value
+
+class RateLimiter:
+    """Spaces requests evenly so all threads together stay under a rate."""
+
+    def __init__(self, per_second: float):
+        self.interval = 1 / per_second if per_second > 0 else 0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+class ImageMirror:
+    """Fetches images into mirror_dir and maps their URLs to the stored copies."""
+
+    def __init__(self, mirror_dir: str, url_prefix: str = DEFAULT_URL_PREFIX, workers: int = DEFAULT_WORKERS,
+                 retries: int = DEFAULT_RETRIES, requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+                 timeout: float = DEFAULT_TIMEOUT, origin: Optional[str] = None):
+        self.mirror_dir = mirror_dir
+        self.url_prefix = url_prefix.rstrip('/')
+        self.workers = workers
+        self.retries = retries
+        self.timeout = timeout
+        self.origin = urlsplit(origin) if origin else None
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.fetched = 0
+        self.stored = 0
+        self.failed: Dict[str, str] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._index: Dict[str, str] = {}
+        self._load_index()
+
+    def _load_index(self):
+        path = os.path.join(self.mirror_dir, INDEX_FILE)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self._index = json.load(f)
+
+    def save_index(self):
+        os.makedirs(self.mirror_dir, exist_ok=True)
+        path = os.path.join(self.mirror_dir, INDEX_FILE)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(dict(sorted(self._index.items())), f, indent=2, ensure_ascii=False)
+        os.replace(path + '.tmp', path)
+
+    def _connection(self, scheme: str, netloc: str) -> http.client.HTTPConnection:
+        # One keep-alive connection per host per thread, reused across requests
+        connections = self._local.__dict__.setdefault('connections', {})
+        connection = connections.get((scheme, netloc))
+        if connection is None:
+            connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+            connection = connections[(scheme, netloc)] = connection_class(netloc, timeout=self.timeout)
+        return connection
+
+    def _drop_connection(self, scheme: str, netloc: str):
+        connection = self._local.__dict__.get('connections', {}).pop((scheme, netloc), None)
+        if connection:
+            connection.close()
+
+    def _get(self, url: str) -> bytes:
+        parts = urlsplit(url)
+        if self.origin:
+            parts = parts._replace(scheme=self.origin.scheme, netloc=self.origin.netloc)
+        path = parts.path + ('?' + parts.query if parts.query else '')
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(min(2 ** (attempt - 1) * 0.5, 8))
+            self.rate_limiter.wait()
+            try:
+                connection = self._connection(parts.scheme, parts.netloc)
+                connection.request('GET', path, headers={'User-Agent': USER_AGENT})
+                response = connection.getresponse()
+                body = response.read()
+            except (OSError, http.client.HTTPException) as e:
+                self._drop_connection(parts.scheme, parts.netloc)
+                error = f'{type(e).__name__}: {e}'
+                continue
+            if response.status == 200:
+                return body
+            error = f'HTTP {response.status}'
+            if response.status not in RETRY_STATUSES:
+                break
+        raise IOError(error)
+
+    def _store(self, url: str, body: bytes) -> str:
+        digest = hashlib.sha256(body).hexdigest()
+        extension = posixpath.splitext(urlsplit(url).path)[1].lower()
+        relative_path = f'{digest[:2]}/{digest}{extension}'
+        path = os.path.join(self.mirror_dir, *relative_path.split('/'))
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+            with self._lock:
+                self.stored += 1
+        return relative_path
+
+    def _mirror_one(self, url: str):
+        try:
+            relative_path = self._store(url, self._get(url))
+        except IOError as e:
+            with self._lock:
+                self.failed[url] = str(e)
+            return
+        with self._lock:
+            self._index[url] = relative_path
+            self.fetched += 1
+
+    def mirror(self, urls: Iterable[str]) -> Dict[str, str]:
+        """Fetch the URLs not mirrored yet and return URL -> local URL for every mirrored one."""
+        urls = list(dict.fromkeys(urls))
+        missing = [url for url in urls if url not in self._index]
+        if missing:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                list(pool.map(self._mirror_one, missing))
+            self.save_index()
+        return {
+            url: f'{self.url_prefix}/{self._index[url]}'
+            for url in urls if url in self._index
+        }
+
+    def summary(self) -> str:
+        return f"Image mirror: {self.fetched} fetched, {self.stored} new files, {len(self.failed)} failed"
+
+def mirror_rows(mirror: ImageMirror, *tables: List[dict]) -> List[List[dict]]:
+    """Mirror every image in the given tables of rows and return them pointing at the copies.
+
+    Images that fail to download keep their wiki URL.
+    """
+    urls: Dict[str, None] = {}
+    for rows in tables:
+        collect_image_urls(rows, urls)
+    mapping = mirror.mirror(urls)
+    print(mirror.summary())
+    for url, error in mirror.failed.items():
+        print(f"Could not mirror {url}: {error}")
+    return [rewrite_image_urls(rows, mapping) for rows in tables]
+
+def add_arguments(parser):
+    """Add the --mirror-images flags to a parser's argparse CLI."""
+    parser.add_argument('--mirror-images', metavar='DIR',
+                        help='download every image into DIR, stored by content hash, and point the output at the copies')
+    parser.add_argument('--mirror-prefix', default=DEFAULT_URL_PREFIX,
+                        help='URL path the mirror directory is served under')
+    parser.add_argument('--mirror-workers', type=int, default=DEFAULT_WORKERS,
+                        help='concurrent image downloads')
+    parser.add_argument('--mirror-rate', type=float, default=DEFAULT_REQUESTS_PER_SECOND,
+                        help='maximum image requests per second across all downloads')
+    parser.add_argument('--mirror-origin', metavar='URL',
+                        help='fetch images from this server instead of the wiki, e.g. a local stand-in')
+
+def from_arguments(args) -> Optional[ImageMirror]:
+    if not args.mirror_images:
+        return None
+    return ImageMirror(args.mirror_images, args.mirror_prefix, args.mirror_workers,
+                       requests_per_second=args.mirror_rate, origin=args.mirror_origin)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Mirror the images referenced by parsed JSON files and rewrite them.')
+    parser.add_argument('json_files', nargs='+', help='parsed JSON output, e.g. data/critters.json; rewritten in place')
+    add_arguments(parser)
+    args = parser.parse_args()
+    if not args.mirror_images:
+        parser.error('--mirror-images is required')
+
+    tables = []
+    for path in args.json_files:
+        with open(path, 'r', encoding='utf-8') as f:
+            tables.append(json.load(f))
+    for path, rows in zip(args.json_files, mirror_rows(from_arguments(args), *tables)):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, indent=2, ensure_ascii=False)
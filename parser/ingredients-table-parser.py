@@ -1,45 +1,121 @@
-from bs4 import BeautifulSoup
+import argparse
 import json
 import re
 
+from fast_extract import FastPathStats, Unsupported, table_fragment
+import html_backend
+from html_backend import make_soup
+import ndjson_io
+import profiling
+from row_extractor import Column, RowSpec, Select
+from snapshot import write_snapshot
+
+# Header and ingredient cells alike are read through their links, in one walk of the page
+INGREDIENTS_TABLE = RowSpec([], rest=Column(Select('links', 'a', text=True)), cell=('th', 'td'))
+
 def clean_text(text):
     # Remove extra whitespace and newlines
     return re.sub(r'\s+', ' ', text).strip()
 
-def parse_ingredients_table(html_content):
-    soup = BeautifulSoup(html_content, 'html.parser')
+def parse_ingredients_table(html_content, fast=None):
+    # fast is a FastPathStats to read the table without BeautifulSoup where its markup allows it
+    if fast is not None:
+        try:
+            # Cells counted before an Unsupported are counted again by the fallback, so only a finished pass counts
+            with profiling.counts_if_done():
+                with profiling.stage('build_tree'):
+                    tree = table_fragment(html_content)
+                with profiling.stage('find_cells'):
+                    ingredients_by_category = ingredients_from_cells(INGREDIENTS_TABLE.extract(tree))
+        except Unsupported as e:
+            reason = str(e)
+        else:
+            fast.fast += len(ingredients_by_category)
+            return ingredients_by_category
+    
+    with profiling.stage('build_tree'):
+        soup = make_soup(html_content)
     
+    with profiling.stage('find_cells'):
+        found = INGREDIENTS_TABLE.extract(soup)
+    ingredients_by_category = ingredients_from_cells(found)
+    if fast is not None:
+        fast.fell_back(reason, len(ingredients_by_category))
+    return ingredients_by_category
+
+def ingredients_from_cells(found):
+    # found is every th and td of the page, as gathered by INGREDIENTS_TABLE
     # Find all table headers to get categories
-    headers = soup.find_all('th', class_='headerSort')
+    headers = [cell for cell in found if cell.tag.name == 'th' and 'headerSort' in cell.tag.get('class', ())]
 
     categories = []
     for header in headers:
         # Extract category name from the last <a> tag in the header
-        category_link = header.find_all('a')[-1]
-        categories.append(category_link.text)
+        category_link = header.all('links')[-1]
+        categories.append(category_link.text())
     
-    # Find all table cells (td) containing ingredients
-    cells = soup.find_all('td')
+    # Table cells (td) containing ingredients
+    cells = [cell for cell in found if cell.tag.name == 'td']
+    profiling.count('cells', len(cells))
 
     ingredients_by_category = {}
     
     # Process each cell (column) with its corresponding category
-    for category, cell in zip(categories, cells):
-        ingredients = []
-        # Find all ingredient links
-        for ingredient_link in cell.find_all('a'):
-            ingredients.append(ingredient_link.text)
+    for i, (category, cell) in enumerate(zip(categories, cells)):
+        with profiling.capture_row(i), profiling.stage('parse_cell'):
+            ingredients = []
+            # Find all ingredient links
+            for ingredient_link in cell.all('links'):
+                ingredients.append(ingredient_link.text())
         
         ingredients_by_category[category] = ingredients
+        profiling.count('rows')
+        profiling.count('ingredients', len(ingredients))
     
     return ingredients_by_category
 
-# Example usage:
-with open('ingredients-table.html', 'r', encoding='utf-8') as file:
-    html_content = file.read()
-
-ingredients_json = parse_ingredients_table(html_content)
-
-# Write to JSON file with pretty printing
-with open('ingredients.json', 'w', encoding='utf-8') as f:
-    json.dump(ingredients_json, f, indent=2, ensure_ascii=False)
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert the wiki ingredients table to JSON.')
+    parser.add_argument('input_file', nargs='?', default='ingredients-table.html', help='saved ingredients table HTML')
+    parser.add_argument('output_file', nargs='?',
+                        help='JSON file to write (default ingredients.json, or ingredients.ndjson with --ndjson)')
+    parser.add_argument('--snapshot', metavar='PATH',
+                        help='also write the categories as a memory-mappable binary snapshot (see snapshot.py)')
+    parser.add_argument('--fast', action='store_true',
+                        help='read regular table markup without BeautifulSoup, falling back to it when the '
+                             'fast path cannot vouch for the markup')
+    html_backend.add_arguments(parser)
+    ndjson_io.add_arguments(parser)
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    html_backend.from_arguments(args)
+    ndjson = ndjson_io.from_arguments(parser, args)
+    
+    if args.profile:
+        profiling.enable(args.profile_row)
+    
+    with profiling.stage('read'):
+        with open(args.input_file, 'r', encoding='utf-8') as file:
+            html_content = file.read()
+    
+    fast = FastPathStats() if args.fast else None
+    ingredients_json = parse_ingredients_table(html_content, fast)
+    if fast:
+        print(fast.summary())
+    
+    with profiling.stage('write_json'):
+        if ndjson:
+            # One record per category, in table order
+            output_file = args.output_file or ndjson.file_name('ingredients')
+            with ndjson.writer(output_file) as writer:
+                for category, ingredients in ingredients_json.items():
+                    writer.write({'category': category, 'ingredients': ingredients})
+        else:
+            # Write to JSON file with pretty printing
+            with open(args.output_file or 'ingredients.json', 'w', encoding='utf-8') as f:
+                json.dump(ingredients_json, f, indent=2, ensure_ascii=False)
+    if args.snapshot:
+        write_snapshot(args.snapshot, ingredients=ingredients_json)
+    
+    if args.profile:
+        profiling.profiler.save(args.profile)
@@ -0,0 +1,112 @@
+"""Load test for query_server.py: requests per second and latency percentiles.
+
+Each connection is a keep-alive HTTP/1.1 client sending requests back to back,
+cycling through the given paths, for a fixed time:
+
+    python load_test.py http://127.0.0.1:8000 --connections 16 --duration 10
+    python load_test.py http://127.0.0.1:8000 /recipes '/recipes?type=Desserts' --etag
+
+With --etag every request after the first for a path sends that path's ETag
+back, so the numbers are for revalidations answered with 304.
+"""
+import argparse
+import asyncio
+from collections import Counter
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+DEFAULT_PATHS = ['/recipes', '/ingredients', '/critters']
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+class Results:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.statuses: Counter = Counter()
+        self.bytes = 0
+        self.errors = 0
+
+async def _request(reader, writer, host: str, path: str, etag: Optional[str]):
+    headers = f"GET {path} HTTP/1.1\r\nHost: {host}\r\n"
+    if etag:
+        headers += f"If-None-Match: {etag}\r\n"
+    writer.write((headers + '\r\n').encode('latin-1'))
+    await writer.drain()
+    head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+    status = int(head[0].split(' ')[1])
+    response_headers = {}
+    for line in head[1:]:
+        name, _, value = line.partition(':')
+        if name:
+            response_headers[name.strip().lower()] = value.strip()
+    length = int(response_headers.get('content-length', 0))
+    if length and status != 304:
+        await reader.readexactly(length)
+    else:
+        length = 0
+    return status, length, response_headers.get('etag')
+
+async def _client(host: str, port: int, paths: List[str], deadline: float, use_etag: bool, offset: int,
+                  results: Results):
+    etags: Dict[str, str] = {}
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        i = offset
+        while time.perf_counter() < deadline:
+            path = paths[i % len(paths)]
+            i += 1
+            started = time.perf_counter()
+            try:
+                status, length, etag = await _request(reader, writer, host, path, etags.get(path) if use_etag else None)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                results.errors += 1
+                writer.close()
+                reader, writer = await asyncio.open_connection(host, port)
+                continue
+            results.latencies.append(time.perf_counter() - started)
+            results.statuses[status] += 1
+            results.bytes += length
+            if etag:
+                etags[path] = etag
+    finally:
+        writer.close()
+
+async def run(url: str, paths: List[str], connections: int, duration: float, use_etag: bool) -> Results:
+    address = urlsplit(url)
+    host, port = address.hostname or '127.0.0.1', address.port or 80
+    results = Results()
+    deadline = time.perf_counter() + duration
+    # Connections start at different paths so every path is in flight at once
+    await asyncio.gather(*(_client(host, port, paths, deadline, use_etag, i, results) for i in range(connections)))
+    return results
+
+def report(results: Results, elapsed: float) -> str:
+    latencies = sorted(results.latencies)
+    count = len(latencies)
+    milliseconds = lambda fraction: percentile(latencies, fraction) * 1000
+    statuses = ', '.join(f'{status}: {n}' for status, n in sorted(results.statuses.items()))
+    return (f"{count} requests in {elapsed:.1f}s: {count / elapsed:.0f} req/s, "
+            f"{results.bytes / elapsed / 1024 / 1024:.1f} MiB/s\n"
+            f"latency ms: p50 {milliseconds(0.5):.2f}  p90 {milliseconds(0.9):.2f}  "
+            f"p99 {milliseconds(0.99):.2f}  max {milliseconds(1.0):.2f}\n"
+            f"status {statuses or 'none'}; {results.errors} connection errors")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure query_server.py throughput and latency.')
+    parser.add_argument('url', help='server address, e.g. http://127.0.0.1:8000')
+    parser.add_argument('paths', nargs='*', default=DEFAULT_PATHS, help='paths to request in turn')
+    parser.add_argument('--connections', type=int, default=8, help='concurrent keep-alive connections')
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds to run')
+    parser.add_argument('--etag', action='store_true',
+                        help="send each path's last ETag back so the server can answer 304")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    results = asyncio.run(run(args.url, args.paths, args.connections, args.duration, args.etag))
+    print(report(results, time.perf_counter() - started))
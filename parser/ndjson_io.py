@@ -0,0 +1,186 @@
+"""Newline-delimited JSON output shared by the parsers, written and read one record at a time.
+
+Each record is one line of JSON, so a writer never holds more than the record
+it is given, and a reader can go through a file of any size without loading it:
+
+    with NdjsonWriter('recipes.ndjson.gz') as writer:   # compression follows the extension
+        for row in rows:
+            writer.write(row)
+
+    for row in read_ndjson('recipes.ndjson.gz'):       # compression is detected from the file
+        ...
+
+Files are written next to their final path and moved over it when closed, so
+readers never see half a file; a writer left by an exception removes its
+temporary file instead. gzip is always available, zstd needs the zstandard
+package.
+"""
+import argparse
+import gzip
+import importlib.util
+import io
+import json
+import os
+from typing import Iterable, Iterator, Optional
+
+from records import to_json
+
+# Compression -> (module it needs, if any; file name suffix)
+COMPRESSIONS = {
+    'none': (None, ''),
+    'gzip': (None, '.gz'),
+    'zstd': ('zstandard', '.zst'),
+}
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+def available(compression: str) -> bool:
+    module = COMPRESSIONS[compression][0]
+    return module is None or importlib.util.find_spec(module) is not None
+
+def compression_for(path: str) -> str:
+    """The compression a file name asks for by its extension."""
+    for compression, (_, suffix) in COMPRESSIONS.items():
+        if suffix and path.endswith(suffix):
+            return compression
+    return 'none'
+
+def _check_available(compression: str):
+    if not available(compression):
+        raise ValueError(f"{compression} compression needs the {COMPRESSIONS[compression][0]} package")
+
+class NdjsonWriter:
+    """Write records to path as NDJSON, replacing the old file atomically on close.
+
+    compression defaults to the one the extension asks for. compact drops the
+    spaces after separators as well; either way each record is a single line.
+    """
+
+    def __init__(self, path: str, compression: Optional[str] = None, compact: bool = False):
+        self.path = path
+        self.compression = compression or compression_for(path)
+        _check_available(self.compression)
+        self.separators = (',', ':') if compact else None
+        self.count = 0
+        self._tmp_path = path + '.tmp'
+        self._file = open(self._tmp_path, 'wb')
+        if self.compression == 'gzip':
+            # A fixed mtime gives the same bytes for the same records; level 6 is gzip's own default speed
+            self._stream = gzip.GzipFile(fileobj=self._file, mode='wb', compresslevel=6, mtime=0)
+        elif self.compression == 'zstd':
+            import zstandard
+            self._stream = zstandard.ZstdCompressor().stream_writer(self._file, closefd=False)
+        else:
+            self._stream = self._file
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False, separators=self.separators, default=to_json)
+        self._stream.write(line.encode('utf-8') + b'\n')
+        self.count += 1
+
+    def write_all(self, records: Iterable) -> int:
+        """Write every record and return how many there were."""
+        for record in records:
+            self.write(record)
+        return self.count
+
+    def close(self):
+        """Finish the file and move it over path."""
+        if self._file.closed:
+            return
+        if self._stream is not self._file:
+            self._stream.close()
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        """Drop what was written and leave path as it was."""
+        if self._file.closed:
+            return
+        if self._stream is not self._file:
+            self._stream.close()
+        self._file.close()
+        os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+def write_ndjson(path: str, records: Iterable, compression: Optional[str] = None, compact: bool = False) -> int:
+    """Write records to path as NDJSON and return how many were written."""
+    with NdjsonWriter(path, compression, compact) as writer:
+        return writer.write_all(records)
+
+def read_ndjson(path: str) -> Iterator:
+    """Yield the records of an NDJSON file one at a time, whatever compression it was written with."""
+    with open(path, 'rb') as f:
+        magic = f.peek(len(ZSTD_MAGIC))[:len(ZSTD_MAGIC)]
+        if magic.startswith(GZIP_MAGIC):
+            stream = gzip.GzipFile(fileobj=f, mode='rb')
+        elif magic == ZSTD_MAGIC:
+            _check_available('zstd')
+            import zstandard
+            stream = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(f, closefd=False))
+        else:
+            stream = f
+        # json.loads reads UTF-8 bytes itself, so lines are never decoded to text first
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+class NdjsonOutput:
+    """How a parser was asked to write its NDJSON output."""
+
+    def __init__(self, compression: str = 'none', compact: bool = False):
+        _check_available(compression)
+        self.compression = compression
+        self.compact = compact
+
+    def file_name(self, base: str) -> str:
+        """File name for an output called base, e.g. critters -> critters.ndjson.gz."""
+        return base + '.ndjson' + COMPRESSIONS[self.compression][1]
+
+    def writer(self, path: str) -> NdjsonWriter:
+        # An explicit file name with a compression extension wins over --compression
+        compression = compression_for(path)
+        if compression == 'none':
+            compression = self.compression
+        return NdjsonWriter(path, compression, self.compact)
+
+def add_arguments(parser):
+    """Add the --ndjson flags to a parser's argparse CLI."""
+    parser.add_argument('--ndjson', action='store_true',
+                        help='write the output as newline-delimited JSON, one record per line, as it is produced')
+    parser.add_argument('--compression', choices=list(COMPRESSIONS), default='none',
+                        help='compress the --ndjson output; a .gz or .zst output file name picks it as well')
+    parser.add_argument('--compact', action='store_true',
+                        help='leave the spaces out of --ndjson records')
+
+def from_arguments(parser, args) -> Optional[NdjsonOutput]:
+    if not args.ndjson:
+        if args.compression != 'none' or args.compact:
+            parser.error('--compression and --compact apply to --ndjson output')
+        return None
+    if not available(args.compression):
+        parser.error(f"--compression {args.compression} needs the {COMPRESSIONS[args.compression][0]} package")
+    return NdjsonOutput(args.compression, args.compact)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Count the records of NDJSON files, or print the first few.')
+    parser.add_argument('files', nargs='+', help='NDJSON files, compressed or not')
+    parser.add_argument('--head', type=int, default=0, help='print this many records of each file')
+    args = parser.parse_args()
+
+    for path in args.files:
+        count = 0
+        for record in read_ndjson(path):
+            if count < args.head:
+                print(json.dumps(record, ensure_ascii=False))
+            count += 1
+        print(f"{path}: {count} records")
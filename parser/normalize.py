@@ -0,0 +1,120 @@
+"""Normalized, id-referenced form of the parsed recipe table."""
+import json
+from typing import Dict, List, Optional
+
+from entity_resolution import AliasIndex, ingredient_index, is_generic
+
+class Interner:
+    """Assigns stable integer ids to keys in first-seen order."""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.records: List[dict] = []
+
+    def intern(self, key: str, record: dict) -> int:
+        """Return the id of key, adding record under a new id the first time it is seen."""
+        id = self.ids.get(key)
+        if id is None:
+            id = len(self.records) + 1
+            self.ids[key] = id
+            self.records.append({'id': id, **record})
+        return id
+
+def load_ingredient_categories(path: str) -> Dict[str, dict]:
+    """Load ingredients.json as {category: {'image_url', 'ingredients'}}.
+
+    Accepts both the {category: [names]} map written by
+    ingredients-table-parser.py and the {key: {name, image_url, ingredients}}
+    form the seed script reads.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    categories = {}
+    for key, value in data.items():
+        if isinstance(value, dict):
+            categories[value['name']] = {'image_url': value.get('image_url'), 'ingredients': value['ingredients']}
+        else:
+            categories[key] = {'image_url': None, 'ingredients': value}
+    return categories
+
+class RecipeNormalizer:
+    """Interns ingredients, recipe types and collections so recipes refer to them by id.
+
+    Ingredient types and the ingredients listed under them get their ids from
+    the order of ingredients.json, so the ids are stable between runs as long as
+    that file is. Recipe ingredient names are reconciled with that file's
+    spelling where they differ only in case, plural or a known variant; the
+    rest are numbered after them and counted in ingredient_names.unresolved.
+    """
+
+    def __init__(self, categories: Optional[Dict[str, dict]] = None):
+        self.ingredient_types = Interner()
+        self.ingredients = Interner()
+        self.recipe_types = Interner()
+        self.collections = Interner()
+        self.recipes: List[dict] = []
+        self.ingredient_names: Optional[AliasIndex] = ingredient_index(categories) if categories else None
+
+        for category, data in (categories or {}).items():
+            type_id = self.ingredient_types.intern(category, {'name': category, 'image_url': data['image_url']})
+            for name in data['ingredients']:
+                self.ingredients.intern(name, {'name': name, 'image_url': None, 'ingredient_type_id': type_id})
+
+    def ingredient_id(self, ingredient: dict) -> int:
+        name = ingredient['name']
+        if self.ingredient_names:
+            # Generic slots name a category, so they aren't expected in the table's ingredient lists
+            resolve = self.ingredient_names.lookup if is_generic(name) else self.ingredient_names.resolve
+            name = resolve(name) or name
+        id = self.ingredients.intern(name, {
+            'name': name,
+            'image_url': ingredient['image_url'],
+            'ingredient_type_id': None,
+        })
+        record = self.ingredients.records[id - 1]
+        if record['image_url'] is None:
+            record['image_url'] = ingredient['image_url']
+        return id
+
+    def add_recipe(self, row: dict) -> dict:
+        """Add a parsed recipe row and return its normalized form."""
+        ingredient_ids = []
+        for ingredient in row['ingredients']:
+            if isinstance(ingredient, list):
+                # Optional ingredients become a list of interchangeable ids
+                ingredient_ids.append([self.ingredient_id(option) for option in ingredient])
+            else:
+                ingredient_ids.append(self.ingredient_id(ingredient))
+
+        recipe = {
+            'id': len(self.recipes) + 1,
+            'image_url': row['image_url'],
+            'name': row['name'],
+            'type_id': self.recipe_types.intern(row['type']['name'], dict(row['type'])),
+            'stars': row['stars'],
+            'energy': row['energy'],
+            'sell_price': row['sell_price'],
+            'ingredient_ids': ingredient_ids,
+            'collection_id': self.collections.intern(row['collection'], {'name': row['collection']}),
+        }
+        self.recipes.append(recipe)
+        return recipe
+
+    def to_dict(self) -> dict:
+        return {
+            'ingredient_types': self.ingredient_types.records,
+            'ingredients': self.ingredients.records,
+            'recipe_types': self.recipe_types.records,
+            'collections': self.collections.records,
+            'recipes': self.recipes,
+        }
+
+    def save(self, path: str):
+        # Written compactly; this file is meant for loaders rather than people
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, separators=(',', ':'))
+
+def load_normalized(path: str) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
@@ -0,0 +1,60 @@
+"""Process-pool helpers for parsing table rows, or whole input files, on several cores.
+
+Work is handed out in order and results come back in that same order, so the
+output of a parallel run is identical to a single-process one. Functions and
+their arguments are pickled to the workers, so they must be module-level and
+rows must be passed as raw HTML rather than as soup tags. Workers may be
+spawned rather than forked, so module state set from the command line, like
+the HTML backend, is handed to each of them when it starts.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import functools
+import os
+from typing import Callable, List, Optional, Sequence
+
+import html_backend
+
+# Rows per task; big enough that pickling and scheduling stay small next to parsing
+DEFAULT_CHUNK_ROWS = 200
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+def chunks(items: Sequence, size: int) -> List[Sequence]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def _start_worker(backend: str, initializer: Optional[Callable], initargs: tuple):
+    html_backend.set_backend(backend)
+    if initializer:
+        initializer(*initargs)
+
+def _pool(workers: int, initializer: Optional[Callable] = None, initargs: tuple = ()) -> ProcessPoolExecutor:
+    """A pool whose workers build trees with the backend this process uses, then run initializer(*initargs)."""
+    return ProcessPoolExecutor(max_workers=workers, initializer=_start_worker,
+                               initargs=(html_backend.current(), initializer, initargs))
+
+def _map_chunk(func: Callable, chunk: Sequence) -> list:
+    return [func(item) for item in chunk]
+
+def map_chunks(func: Callable, items: Sequence, workers: int, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+               initializer: Optional[Callable] = None, initargs: tuple = ()) -> list:
+    """[func(item) for item in items], spread over workers processes in chunks of chunk_rows.
+
+    initializer(*initargs) runs in each worker before its first chunk, to set
+    module state the caller's own process already has.
+    """
+    if workers <= 1 or len(items) <= chunk_rows:
+        return _map_chunk(func, items)
+    results = []
+    with _pool(workers, initializer, initargs) as pool:
+        for chunk_results in pool.map(functools.partial(_map_chunk, func), chunks(items, chunk_rows)):
+            results.extend(chunk_results)
+    return results
+
+def map_calls(func: Callable, calls: Sequence[tuple], workers: int, initializer: Optional[Callable] = None,
+              initargs: tuple = ()) -> list:
+    """[func(*args) for args in calls], one call per task, e.g. one input file each; initializer as for map_chunks."""
+    if workers <= 1 or len(calls) <= 1:
+        return [func(*args) for args in calls]
+    with _pool(min(workers, len(calls)), initializer, initargs) as pool:
+        return list(pool.map(func, *zip(*calls)))
@@ -1,8 +1,29 @@
-from bs4 import BeautifulSoup, Tag
+from bs4 import Tag
+import argparse
+from collections import Counter
+from html.parser import HTMLParser
 import json
 import os
-from typing import Dict, List, Optional, TypedDict, Union
+from typing import Dict, List, Mapping, Optional, TypedDict, Union
 import re
+import sys
+
+from critter_schedule import DAYS, schedule_intervals
+from entity_resolution import AliasIndex, critter_type_index, critter_variants, print_unresolved, write_unresolved_report
+import html_backend
+from html_backend import make_soup
+import image_mirror
+from image_mirror import ImageMirror
+import ndjson_io
+from ndjson_io import NdjsonOutput
+from parallel import map_calls
+from pg_copy import critter_tables, write_tables
+import profiling
+from records import Critter, CritterType, ImageRef, Named, Reward, image_ref, intern_text, named, replaced, reward, to_json
+from row_cache import DEFAULT_MAX_ENTRIES, RowCache
+from row_extractor import Column, Found, RowSpec, Select
+from snapshot import write_snapshot
+import sqlite_catalog
 
 class Schedule(TypedDict, total=False):
     sunday: Union[str, bool]
@@ -13,44 +34,14 @@ class Schedule(TypedDict, total=False):
     friday: Union[str, bool]
     saturday: Union[str, bool]
 
-class FavFood(TypedDict, total=False):
-    ingredient: str
-    item: str
-    name: str
-
-class LikedFood(TypedDict, total=False):
-    generic_ingredient: str
-    specific_ingredients: List[str]
-    generic_item: str
-    location: str
-    name: str
-
-class Reward(TypedDict):
-    quantity: Optional[str]
-    item: Optional[str]
-    ingredient: Optional[str]
-
-class Location(TypedDict):
-    name: str
-    image_url: Optional[str]
-
-class CritterType(TypedDict):
-    name: str
-    fav_food: List[FavFood]
-    liked_food: List[LikedFood]
-    location: str
-    fav_food_reward: List[Reward]
-    liked_food_reward: List[Reward]
-
-class Critter(TypedDict):
-    image_url: str
-    name: str
-    type: str
-    location: str
-    schedule: Schedule
+# Rows are built as the records of records.py; these name the shapes they have
+FavFood = LikedFood = Named
+Location = ImageRef
 
 BASE_URL = 'https://dreamlightvalleywiki.com'
 
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
 CRITTER_TYPE_MAP = {
     'Crocodile': {
         'plural': 'Crocodiles',
@@ -110,14 +101,44 @@ CRITTER_TYPE_MAP = {
     }    
 }
 
-def parse_schedule(row) -> Schedule:
-    """Parse the schedule from a row in the schedule table."""
-    days = ['sunday', 'monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday']
+# Built once so each lookup is a dict probe rather than a scan of the map
+CRITTER_TYPES = critter_type_index(CRITTER_TYPE_MAP)
+
+# Critter names in the schedule table are variant names, matched exactly; the first type listing one wins
+CRITTER_VARIANTS = critter_variants(CRITTER_TYPE_MAP)
+
+# Location spellings that differ between the tables and aren't just a case change
+KNOWN_LOCATION_VARIANTS: Dict[str, str] = {}
+
+# Critters and critter types whose location cell links to no usable name, counted for the report
+MISSING_LOCATIONS = AliasIndex('critter_location')
+
+# Indexes whose unresolved names are reported, in report order
+UNRESOLVED_INDEXES = (CRITTER_TYPES, MISSING_LOCATIONS)
+
+# A cell read with extract_clean_text, and one read with extract_location
+NAME_COLUMN = Column(Select('link', 'a', first=True, text=True), text=True)
+LOCATION_COLUMN = Column(Select('link', 'a', first=True, text=True), Select('image', 'img', first=True), text=True)
+FOOD_COLUMN = Column(Select('links', 'a', text=True))
+REWARD_COLUMN = Column(Select('items', 'span', id='nametemplate', text=True, nested=[Select('link', 'a', first=True, text=True)]))
+
+# Everything parse_type_row and parse_schedule_row read from a row, gathered in one walk
+TYPE_ROW = RowSpec([
+    Column(), NAME_COLUMN, FOOD_COLUMN, Column(), LOCATION_COLUMN, Column(), REWARD_COLUMN, REWARD_COLUMN,
+])
+SCHEDULE_ROW = RowSpec([
+    Column(Select('image', 'img', first=True)), NAME_COLUMN, LOCATION_COLUMN,
+    *(Column(text=True) for _ in DAYS),
+])
+
+@profiling.timed('parse_schedule')
+def parse_schedule(cells: List[Found]) -> Schedule:
+    """Parse the schedule from the cells of a row in the schedule table."""
     schedule: Schedule = {}
     
-    for i, day in enumerate(days):
-        cell = row.find_all('td')[i + 3]  # +3 because first 3 columns are image, name, location
-        text = cell.get_text(strip=True)
+    for i, day in enumerate(DAYS):
+        cell = cells[i + 3]  # +3 because first 3 columns are image, name, location
+        text = cell.stripped_text()
         
         if text == 'n/a':
             schedule[day] = False
@@ -125,100 +146,78 @@ def parse_schedule(row) -> Schedule:
         elif text == 'All day':
             schedule[day] = True
         else:
-            schedule[day] = text
+            schedule[day] = intern_text(text)
             
     return schedule
 
-def parse_food_rewards(cell) -> List[Reward]:
+@profiling.timed('parse_food_rewards')
+def parse_food_rewards(cell: Found) -> List[Reward]:
     """Parse food rewards from a cell."""
     rewards = []
-    items = cell.find_all("span", {"id": "nametemplate"})
+    items = cell.all('items')
     
     for item in items:
-        name = item.find('a').get_text(strip=True)
+        name = item.first('link').stripped_text()
         if not name:
             continue
             
         # Look for quantity in parentheses
-        quantity_text = item.get_text(strip=True)
+        quantity_text = item.stripped_text()
         quantity_match = re.search(r'\((\d+(?:-\d+)?)\)', quantity_text)
         quantity = quantity_match.group(1) if quantity_match else '1'
         
-        rewards.append({
-            'quantity': quantity,
-            'item': name,  # This should be mapped to actual IDs
-        })
+        rewards.append(reward(quantity, name))  # The item should be mapped to actual IDs
     
     return rewards
 
-def parse_food_items(cell) -> tuple[List[FavFood], List[LikedFood]]:
+@profiling.timed('parse_food_items')
+def parse_food_items(cell: Found) -> tuple[List[FavFood], List[LikedFood]]:
     """Parse food items from a cell."""
     fav_food: List[FavFood] = []
     liked_food: List[LikedFood] = []
     
-    # Parse favorite food
-    fav_links = cell.find_all('a')
-    for link in fav_links:
-        name = link.get_text(strip=True)
-        if name:
-            fav_food.append({'name': name})
-    
-    # Parse liked food
-    liked_links = cell.find_all('a')
-    for link in liked_links:
-        name = link.get_text(strip=True)
+    # The same links are read as both favorite and liked food
+    for link in cell.all('links'):
+        name = link.stripped_text()
         if name:
-            liked_food.append({'name': name})
+            fav_food.append(named(name))
+            liked_food.append(named(name))
     
     return fav_food, liked_food
 
-def extract_clean_text(cell) -> str:
+def extract_clean_text(cell: Found) -> str:
     """Extract clean text from a cell, removing citations and handling both linked and plain text."""
     # First try to find a direct link
-    link = cell.find('a')
-    if link and not link.find_parent('sup'):  # Only use link text if it's not inside a citation
-        return link.get_text(strip=True)
+    link = cell.first('link')
+    if link and not link.tag.find_parent('sup'):  # Only use link text if it's not inside a citation
+        return link.stripped_text()
     
     # If no direct link or it's a citation, get all text and remove citation markers
-    text = cell.get_text(strip=True)
+    text = cell.stripped_text()
     # Remove citation markers like [1], [2], etc.
     text = re.sub(r'\[\d+\]', '', text)
     return text.strip()
 
-def extract_location(cell, locations: Optional[Dict[str, Location]] = None) -> Optional[Location]:
-    """Extract location information from a cell."""
-    link = cell.find('a')
+@profiling.timed('extract_location')
+def extract_location(cell: Found, row_name: Optional[str] = None) -> Optional[Location]:
+    """Extract location information from a cell; row_name is the critter or type the row is about."""
+    link = cell.first('link')
     if not link:
         return None
         
     name = extract_clean_text(cell)
     if not name:
-        name = cell.get_text(strip=True)
+        name = cell.stripped_text()
     if not name or name == 'n/a':
-        print(f"No location found for {cell}")
+        MISSING_LOCATIONS.unresolved[row_name or cell.stripped_text()] += 1
         return None
         
-    img = cell.find('img')
-    image_url = get_image_url(img)
-
-    if locations:
-        # get location from locations
-        location = locations.get(name)
-        if location:
-            return location
-        else:
-            new_location = {
-                'name': name,
-                'image_url': image_url
-            }
-            locations[name] = new_location
-            return new_location
-    
-    return {
-        'name': name,
-        'image_url': image_url
-    }
+    img = cell.first('image')
+    image_url = get_image_url(img.tag if img else None)
+
+    return image_ref(name, image_url)
 
+@profiling.timed('get_image_url')
 def get_image_url(img: Tag) -> str:
     """Get the image url from a tag."""
     image_url = img['src'] if img else None
@@ -228,107 +227,448 @@ def get_image_url(img: Tag) -> str:
         image_url = image_url.replace(' 2x', '')
     return BASE_URL + image_url
 
-def main():
-    # Read HTML files
-    data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
-    
-    with open(os.path.join(data_dir, 'critter-type-table.html'), 'r', encoding='utf-8') as f:
-        type_soup = BeautifulSoup(f.read(), 'html.parser')
+@profiling.timed('parse_type_row')
+def parse_type_row(row) -> Optional[dict]:
+    """Parse a row of the type table into its critter type and location."""
+    cells = TYPE_ROW.extract(row)
+    if len(cells) < 8:  # Skip rows that don't have all columns
+        return None
+    profiling.count('cells', len(cells))
+        
+    name = extract_clean_text(cells[1])
+    location_cell = cells[4]
+    location_data = extract_location(location_cell, name)
+        
+    fav_food, liked_food = parse_food_items(cells[2])
+    fav_rewards = parse_food_rewards(cells[6])
+    liked_rewards = parse_food_rewards(cells[7])
     
-    with open(os.path.join(data_dir, 'critter-schedule-table.html'), 'r', encoding='utf-8') as f:
-        schedule_soup = BeautifulSoup(f.read(), 'html.parser')
+    critter_type: Optional[CritterType] = None
+    if name and location_data:
+        critter_type = CritterType(
+            get_critter_type_from_type_name(name),
+            location_data['name'],
+            fav_food,
+            liked_food,
+            fav_rewards,
+            liked_rewards,
+        )
+    # The type name as written stays with the row, to name it when the type doesn't resolve
+    return {'critter_type': critter_type, 'location': location_data, 'type_name': name}
+
+@profiling.timed('parse_schedule_row')
+def parse_schedule_row(row) -> Optional[dict]:
+    """Parse a row of the schedule table into its critter and location."""
+    cells = SCHEDULE_ROW.extract(row)
+    if len(cells) < 10:  # Skip rows that don't have all columns
+        print(f"Skipping row {cells[1].stripped_text()}")
+        return None
+    profiling.count('cells', len(cells))
+        
+    img = cells[0].first('image')
+    image_url = get_image_url(img.tag if img else None)
+    name = extract_clean_text(cells[1])
+    location_cell = cells[2]
+    location_data = extract_location(location_cell, name)
+        
+    schedule = parse_schedule(cells)
+    type = get_critter_type(name)
     
+    critter: Optional[Critter] = None
+    if name and location_data and image_url:
+        critter = Critter(image_url, name, type, location_data['name'], schedule)
+    return {'critter': critter, 'location': location_data}
+
+def parse_rows(rows, parse_row, table: str) -> List[dict]:
+    """Parse each row of a table's tree."""
+    results = []
+    for i, row in enumerate(rows):
+        with profiling.capture_row(i):
+            result = parse_row(row)
+        if not result:
+            continue
+        profiling.count(f'{table}_rows')
+        results.append(result)
+    return results
+
+# Saved table file and row parser of each table, keyed by its row cache table name
+TABLES = {
+    'critter_types': ('critter-type-table.html', parse_type_row),
+    'critters': ('critter-schedule-table.html', parse_schedule_row),
+}
+
+def parse_table_file(data_dir: str, table: str, cache: Optional[RowCache] = None) -> List[dict]:
+    """Read one saved table, build its soup and parse its rows.
+
+    With a cache the rows are split out of the markup instead, so they are
+    keyed by their HTML as written whichever way the table is parsed.
+    """
+    file_name, parse_row = TABLES[table]
+    with open(os.path.join(data_dir, file_name), 'r', encoding='utf-8') as f:
+        with profiling.stage('read'):
+            html_content = f.read()
+    if cache:
+        with profiling.stage('find_rows'):
+            row_htmls = split_table_rows(html_content)
+            if row_htmls is None:
+                row_htmls = scan_body_rows(html_content)
+        return parse_row_htmls(row_htmls, table, cache)
+    with profiling.stage('build_tree'):
+        soup = make_soup(html_content)
+    with profiling.stage('find_rows'):
+        rows = soup.select('tbody tr')
+    return parse_rows(rows, parse_row, table)
+
+# Rows of a table body, for splitting a saved table without building its whole tree
+TBODY_PATTERN = re.compile(r'<tbody\b[^>]*>(.*?)</tbody>', re.DOTALL | re.IGNORECASE)
+ROW_PATTERN = re.compile(r'<tr\b.*?</tr>', re.DOTALL | re.IGNORECASE)
+
+def split_table_rows(html_content: str) -> Optional[List[str]]:
+    """The markup of each row inside a <tbody>, as soup.select('tbody tr') would find them.
+
+    Returns None when the markup is too irregular to split by pattern (nested
+    tables or rows, unclosed rows, text between rows); build the tree instead.
+    """
+    bodies = TBODY_PATTERN.findall(html_content)
+    if len(bodies) != len(re.findall(r'<tbody\b', html_content, re.IGNORECASE)):
+        return None
+    row_htmls = []
+    for body in bodies:
+        if re.search(r'<t(?:able|body)\b', body, re.IGNORECASE):
+            return None
+        rows = ROW_PATTERN.findall(body)
+        if ROW_PATTERN.sub('', body).strip() or any(re.search(r'<tr\b', row[3:], re.IGNORECASE) for row in rows):
+            return None
+        row_htmls.extend(rows)
+    return row_htmls
+
+class BodyRowScanner(HTMLParser):
+    """Finds the raw markup of each row in the body of a table, for markup split_table_rows can't split.
+
+    Rows are cut out of the document at the offsets the tokenizer reports, so
+    they are exactly as written; a row ends at its end tag, at the next row or
+    at the end of its body.
+    """
+
+    def __init__(self, html_content: str):
+        super().__init__(convert_charrefs=False)
+        self.html_content = html_content
+        self.rows: List[str] = []
+        self._line_offsets = [0] + [match.end() for match in re.finditer('\n', html_content)]
+        self._tables = 0
+        self._in_body = False
+        self._start: Optional[int] = None
+
+    def _offset(self) -> int:
+        line, column = self.getpos()
+        return self._line_offsets[line - 1] + column
+
+    def close(self):
+        super().close()
+        self._end_row(len(self.html_content))
+
+    def _end_row(self, end: int):
+        if self._start is not None:
+            self.rows.append(self.html_content[self._start:end])
+            self._start = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'table':
+            self._tables += 1
+        elif self._tables == 1 and tag == 'tbody':
+            self._in_body = True
+        elif self._tables == 1 and self._in_body and tag == 'tr':
+            # A new row implicitly closes an unterminated one
+            self._end_row(self._offset())
+            self._start = self._offset()
+
+    def handle_endtag(self, tag):
+        if self._tables == 1 and tag in ('tr', 'tbody', 'table'):
+            start = self._offset()
+            self._end_row(self.html_content.index('>', start) + 1 if tag == 'tr' else start)
+            if tag != 'tr':
+                self._in_body = False
+        if tag == 'table':
+            self._tables -= 1
+
+def scan_body_rows(html_content: str) -> List[str]:
+    """The markup of each row in the body of a table, however irregular the surrounding markup is."""
+    scanner = BodyRowScanner(html_content)
+    scanner.feed(html_content)
+    scanner.close()
+    return scanner.rows
+
+def parse_noting_unresolved(parse_row, row) -> Optional[dict]:
+    """parse_row, keeping the names it couldn't resolve in the result instead of counting them.
+
+    A cached result is reused without parsing, so what it couldn't resolve has
+    to travel with it; count_unresolved counts it, on the first run and every
+    cached one alike.
+    """
+    counted = [index.unresolved for index in UNRESOLVED_INDEXES]
+    for index in UNRESOLVED_INDEXES:
+        index.unresolved = Counter()
+    try:
+        result = parse_row(row)
+        unresolved = {index.kind: dict(index.unresolved) for index in UNRESOLVED_INDEXES if index.unresolved}
+    finally:
+        for index, unresolved_before in zip(UNRESOLVED_INDEXES, counted):
+            index.unresolved = unresolved_before
+    if result and unresolved:
+        result['unresolved'] = unresolved
+    return result
+
+def count_unresolved(result: dict):
+    for index in UNRESOLVED_INDEXES:
+        index.unresolved.update(result.get('unresolved', {}).get(index.kind, {}))
+
+def parse_row_htmls(row_htmls: List[str], table: str, cache: Optional[RowCache] = None) -> List[dict]:
+    """parse_rows for rows split out by split_table_rows; cached rows skip even their one-row soup."""
+    _, parse_row = TABLES[table]
+    results = []
+    for row_html in row_htmls:
+        if cache:
+            key, result = cache.lookup(
+                table, row_html, lambda: parse_noting_unresolved(parse_row, make_soup(row_html).tr))
+            if result:
+                count_unresolved(result)
+        else:
+            result = parse_row(make_soup(row_html).tr)
+        if not result:
+            continue
+        profiling.count(f'{table}_rows')
+        results.append(result)
+        record = result.get('critter_type') or result.get('critter')
+        if cache and record:
+            cache.record(table, record['name'], key)
+    return results
+
+def parse_table_file_in_worker(data_dir: str, table: str):
+    """parse_table_file for a pool worker, also returning the names it couldn't resolve."""
+    for index in UNRESOLVED_INDEXES:
+        index.unresolved.clear()
+    return parse_table_file(data_dir, table), [index.unresolved for index in UNRESOLVED_INDEXES]
+
+def with_canonical_location(location_data: Optional[Location], record: Optional[Mapping], location_names: AliasIndex):
+    """Rename a parsed location, and the record that refers to it, when it is a known variant spelling.
+
+    Spellings that only differ from an earlier one in case or plural are kept
+    as written, and counted in location_names.unresolved so they can be reported.
+    """
+    if not location_data:
+        return location_data, record
+    name = KNOWN_LOCATION_VARIANTS.get(location_data['name'], location_data['name'])
+    seen = location_names.lookup(name)
+    if seen is None:
+        location_names.add(name)
+    elif seen != name:
+        location_names.unresolved[name] += 1
+    if name == location_data['name']:
+        return location_data, record
+    return image_ref(name, location_data['image_url']), (replaced(record, location=name) if record else record)
+
+def combine_tables(type_results: List[dict], schedule_results: List[dict]):
+    """Merge the parsed type and schedule rows into critter types, critters and locations."""
     critter_types: List[CritterType] = []
     critters: List[Critter] = []
     locations: Dict[str, Location] = {}  # Using dict to ensure uniqueness
+    # Spellings of a location that differ only in case or plural are reported, not merged
+    location_names = AliasIndex('location')
     
     # Process type table
-    type_rows = type_soup.select('tbody tr')
-    for row in type_rows:
-        cells = row.find_all('td')
-        if len(cells) < 8:  # Skip rows that don't have all columns
-            continue
-            
-        name = extract_clean_text(cells[1])
-        location_cell = cells[4]
-        location_data = extract_location(location_cell)
+    for result in type_results:
+        location_data, critter_type = with_canonical_location(result['location'], result['critter_type'], location_names)
         if location_data:
             locations[location_data['name']] = location_data
-            
-        fav_food, liked_food = parse_food_items(cells[2])
-        fav_rewards = parse_food_rewards(cells[6])
-        liked_rewards = parse_food_rewards(cells[7])
-        
-        if name and location_data:
-            critter_types.append({
-                'name': get_critter_type_from_type_name(name),
-                'location': location_data['name'],
-                'fav_food': fav_food,
-                'liked_food': liked_food,
-                'fav_food_reward': fav_rewards,
-                'liked_food_reward': liked_rewards
-            })
+        if critter_type:
+            critter_types.append(critter_type)
     
     # Process schedule table
-    schedule_rows = schedule_soup.select('tbody tr')
-    for row in schedule_rows:
-        cells = row.find_all('td')
-        if len(cells) < 10:  # Skip rows that don't have all columns
-            print(f"Skipping row {cells[1].get_text(strip=True)}")
-            continue
-            
-        img = cells[0].find('img')
-        image_url = get_image_url(img)
-        name = extract_clean_text(cells[1])
-        location_cell = cells[2]
-        location_data = extract_location(location_cell, locations)
+    for result in schedule_results:
+        location_data, critter = with_canonical_location(result['location'], result['critter'], location_names)
         if location_data:
-            locations[location_data['name']] = location_data
-            
-        schedule = parse_schedule(row)
-        type = get_critter_type(name)
-        
-        if name and location_data and image_url:
-            critters.append({
-                'image_url': image_url,
-                'name': name,
-                'type': type,
-                'location': location_data['name'],
-                'schedule': schedule
-            })
+            # Locations already seen in the type table keep their data
+            locations.setdefault(location_data['name'], location_data)
+        if critter:
+            critters.append(critter)
+    
+    if location_names.unresolved:
+        print(f"Locations spelled like another but for case or plural, kept apart: "
+              f"{', '.join(sorted(location_names.unresolved))}")
+    return critter_types, critters, list(locations.values())
+
+# Tables each output file is built from; when only some tables change, the rest of the outputs can be kept
+OUTPUT_TABLES = {
+    'critter-types.json': {'critter_types'},
+    'critters.json': {'critter_types', 'critters'},
+    'locations.json': {'critter_types', 'critters'},
+    'critter-schedules.json': {'critter_types', 'critters'},
+}
+
+def output_files(critter_types: List[CritterType], critters: List[Critter], locations_list: List[Location],
+                 unparsed: list) -> Dict[str, Union[list, dict]]:
+    """The data of each JSON output file, by file name; unreadable schedule entries are added to unparsed."""
+    # Schedules as minute-of-week intervals so consumers don't re-parse the day strings
+    schedules = {}
+    for critter in critters:
+        intervals = schedule_intervals(critter['schedule'], unparsed)
+        schedules[critter['name']] = [list(interval) for interval in intervals]
+    return {
+        'critter-types.json': critter_types,
+        'critters.json': critters,
+        'locations.json': locations_list,
+        'critter-schedules.json': schedules,
+    }
+
+def dump_json(file_name: str, data) -> str:
+    # The schedules are only read by code, so they're written compactly
+    if file_name == 'critter-schedules.json':
+        return json.dumps(data, ensure_ascii=False, default=to_json)
+    return json.dumps(data, indent=2, ensure_ascii=False, default=to_json)
+
+def write_json(path: str, data, text: Optional[str] = None):
+    """Write an output file, replacing the old one atomically so readers never see half of it."""
+    if text is None:
+        text = dump_json(os.path.basename(path), data)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def output_records(data: Union[list, dict]) -> list:
+    # The schedules are keyed by critter name; as NDJSON each becomes a record of its own
+    if isinstance(data, dict):
+        return [{'name': name, 'intervals': intervals} for name, intervals in data.items()]
+    return data
+
+def write_ndjson_outputs(data_dir: str, outputs: Dict[str, Union[list, dict]], ndjson: NdjsonOutput):
+    """Write each output as <name>.ndjson, one record per line, instead of <name>.json."""
+    for file_name, data in outputs.items():
+        path = os.path.join(data_dir, ndjson.file_name(os.path.splitext(file_name)[0]))
+        with ndjson.writer(path) as writer:
+            writer.write_all(output_records(data))
+
+def main(data_dir: Optional[str] = None, cache: Optional[RowCache] = None, copy_dir: Optional[str] = None,
+         workers: int = 1, mirror: Optional[ImageMirror] = None, snapshot: Optional[str] = None,
+         ndjson: Optional[NdjsonOutput] = None, sqlite: Optional[str] = None):
+    if data_dir is None:
+        data_dir = DEFAULT_DATA_DIR
+    
+    if workers > 1:
+        # Neither table depends on the other, so each is read and parsed in its own process.
+        # The row cache lives in this process, so the CLI doesn't allow it here.
+        (type_results, type_unresolved), (schedule_results, schedule_unresolved) = map_calls(
+            parse_table_file_in_worker, [(data_dir, 'critter_types'), (data_dir, 'critters')], workers)
+        for index, *counts in zip(UNRESOLVED_INDEXES, type_unresolved, schedule_unresolved):
+            for unresolved in counts:
+                index.unresolved.update(unresolved)
+    else:
+        type_results = parse_table_file(data_dir, 'critter_types', cache)
+        schedule_results = parse_table_file(data_dir, 'critters', cache)
+    
+    critter_types, critters, locations_list = combine_tables(type_results, schedule_results)
+    if mirror:
+        # Point critter and location images at the local copies
+        with profiling.stage('mirror_images'):
+            critters, locations_list = image_mirror.mirror_rows(mirror, critters, locations_list)
     
     # Write output files
-    with open(os.path.join(data_dir, 'critter-types.json'), 'w', encoding='utf-8') as f:
-        json.dump(critter_types, f, indent=2, ensure_ascii=False)
+    unparsed = []
+    outputs = output_files(critter_types, critters, locations_list, unparsed)
+    with profiling.stage('write_json'):
+        if ndjson:
+            write_ndjson_outputs(data_dir, outputs, ndjson)
+        else:
+            for file_name, data in outputs.items():
+                write_json(os.path.join(data_dir, file_name), data)
+    if unparsed:
+        print(f"Could not read {len(unparsed)} schedule entries: {sorted(set(text for _, text in unparsed))}")
     
-    with open(os.path.join(data_dir, 'critters.json'), 'w', encoding='utf-8') as f:
-        json.dump(critters, f, indent=2, ensure_ascii=False)
-        
-    # Convert locations dict to list and write to file
-    locations_list = list(locations.values())
-    with open(os.path.join(data_dir, 'locations.json'), 'w', encoding='utf-8') as f:
-        json.dump(locations_list, f, indent=2, ensure_ascii=False)
+    if copy_dir or sqlite:
+        # A type whose name didn't resolve has no name to load it under, so it is left out of the tables
+        unnamed = [result.get('type_name') for result in type_results
+                   if result['critter_type'] and not result['critter_type']['name']]
+        if unnamed:
+            print(f"Leaving {len(unnamed)} critter types with unresolved names out of the tables: "
+                  f"{', '.join(map(str, unnamed))}")
+        exported_types = [critter_type for critter_type in critter_types if critter_type['name']]
+        tables = critter_tables(exported_types, critters, locations_list)
+        if copy_dir:
+            try:
+                write_tables(copy_dir, tables)
+            except ValueError as e:
+                sys.exit(f"Not writing COPY files to {copy_dir}: {e}")
+        if sqlite:
+            try:
+                with profiling.stage('write_sqlite'):
+                    sqlite_catalog.write_tables(sqlite, tables)
+            except ValueError as e:
+                sys.exit(f"Not writing the critter tables to {sqlite}: {e}")
+    if snapshot:
+        write_snapshot(snapshot, critters=critters, critter_types=critter_types, locations=locations_list)
     
+    print_unresolved(*UNRESOLVED_INDEXES)
     print('Successfully parsed critter data and saved to JSON files')
 
 def get_critter_type(name: str) -> str:
     """Get the critter type from the name."""
-    for critter_type, details in CRITTER_TYPE_MAP.items():
-        if name in details['types']:
-            return critter_type
-    return None
+    return CRITTER_VARIANTS.get(name)
 
 def get_critter_type_from_type_name(name: str) -> str:
     """Get the critter type from the type name."""
-    for critter_type, details in CRITTER_TYPE_MAP.items():
-        if name.lower() == critter_type.lower():
-            return critter_type
-        if name.lower() == details['plural'].lower():
-            return critter_type
-        if name in details['types']:
-            return critter_type
-    print(f"No critter type found for {name}")
-    return None
+    return CRITTER_TYPES.resolve(name)
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Parse the critter type and schedule tables to JSON.')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR,
+                        help='directory holding the saved tables and the JSON output')
+    parser.add_argument('--cache', metavar='PATH',
+                        help='row cache file; unchanged rows are reused instead of re-parsed')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_MAX_ENTRIES,
+                        help='maximum number of rows kept in the cache')
+    parser.add_argument('--delta', metavar='PATH',
+                        help='write the rows added, changed and removed since the last cached run')
+    parser.add_argument('--copy-dir', metavar='DIR',
+                        help='also write one Postgres COPY file per critter table, plus a manifest, to DIR')
+    parser.add_argument('--sqlite', metavar='PATH',
+                        help='also write the critter tables into an indexed SQLite catalog (see sqlite_catalog.py)')
+    parser.add_argument('--unresolved-report', metavar='PATH',
+                        help='write the critter type names that could not be resolved, and the critters with no location, '
+                             'with counts, as JSON')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='parse the type and schedule tables in this many processes (at most 2 are used)')
+    parser.add_argument('--snapshot', metavar='PATH',
+                        help='also write critters, critter types and locations as a memory-mappable binary snapshot')
+    html_backend.add_arguments(parser)
+    image_mirror.add_arguments(parser)
+    ndjson_io.add_arguments(parser)
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    html_backend.from_arguments(args)
+    ndjson = ndjson_io.from_arguments(parser, args)
+    
+    if args.profile:
+        profiling.enable(args.profile_row)
+    
+    if args.delta and not args.cache:
+        parser.error('--delta requires --cache')
+    if args.cache and args.workers > 1:
+        parser.error('--cache cannot be combined with --workers')
+    cache = RowCache(args.cache, args.cache_size) if args.cache else None
+    
+    main(args.data_dir, cache, args.copy_dir, args.workers, image_mirror.from_arguments(args), args.snapshot, ndjson,
+         args.sqlite)
+    
+    if args.unresolved_report:
+        write_unresolved_report(args.unresolved_report, *UNRESOLVED_INDEXES)
+    
+    if cache:
+        if args.delta:
+            cache.write_delta(args.delta, ['critter_types', 'critters'])
+        cache.save()
+        print(f"Row cache: {cache.hits} hits, {cache.misses} misses")
+        profiling.count('cache_hits', cache.hits)
+        profiling.count('cache_misses', cache.misses)
+    
+    if args.profile:
+        profiling.profiler.save(args.profile) 
\ No newline at end of file
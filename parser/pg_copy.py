@@ -0,0 +1,219 @@
+"""Export of the parsed tables as Postgres COPY text-format files."""
+import json
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from entity_resolution import is_generic
+
+# Tables in the order they have to be loaded so foreign keys resolve
+LOAD_ORDER = [
+    'collections',
+    'recipe_types',
+    'ingredient_types',
+    'ingredients',
+    'recipes',
+    'locations',
+    'critter_types',
+    'critters',
+]
+
+# Columns the seed scripts declare NOT NULL, beyond the ids; a NULL in one fails the whole COPY
+NOT_NULL_COLUMNS = {
+    'collections': ['name'],
+    'recipe_types': ['name', 'image_url'],
+    'ingredient_types': ['name', 'image_url'],
+    'ingredients': ['name', 'image_url', 'is_generic'],
+    'recipes': ['image_url', 'name', 'ingredient_ids', 'stars', 'energy', 'sell_price'],
+    'locations': ['name'],
+    'critter_types': ['name'],
+    'critters': ['name', 'schedule'],
+}
+
+# What to do about a NULL where it is known to come from the input files
+NULL_HINTS = {
+    ('ingredient_types', 'image_url'): 'the {category: [names]} form of ingredients.json has no category images; '
+                                      'pass the {key: {name, image_url, ingredients}} form the seed script reads',
+}
+
+MANIFEST_FILE = 'manifest.json'
+LOAD_SCRIPT_FILE = 'load.sql'
+
+_ESCAPES = {'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'}
+_ESCAPE_RE = re.compile(r'[\\\t\n\r]')
+_UNESCAPES = {'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t', 'v': '\v'}
+_UNESCAPE_RE = re.compile(r'\\(?:([0-7]{1,3})|x([0-9a-fA-F]{1,2})|(.))', re.DOTALL)
+
+Table = Tuple[List[str], List[Sequence]]
+
+def escape_copy_value(value) -> str:
+    """Format a value as a field of COPY's text format."""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, ensure_ascii=False)
+    return _ESCAPE_RE.sub(lambda m: _ESCAPES[m.group(0)], str(value))
+
+def unescape_copy_value(field: str) -> Optional[str]:
+    """Decode a field of COPY's text format, returning None for NULL."""
+    if field == '\\N':
+        return None
+
+    def replace(m):
+        octal, hex, char = m.groups()
+        if octal:
+            return chr(int(octal, 8))
+        if hex:
+            return chr(int(hex, 16))
+        return _UNESCAPES.get(char, char)
+
+    return _UNESCAPE_RE.sub(replace, field)
+
+def write_copy_file(path: str, rows: Iterable[Sequence]) -> int:
+    """Write rows as tab-separated COPY text and return how many were written."""
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        for row in rows:
+            f.write('\t'.join(escape_copy_value(value) for value in row))
+            f.write('\n')
+            count += 1
+    return count
+
+def read_copy_file(path: str) -> List[List[Optional[str]]]:
+    """Read a COPY text file back into rows of strings (None for NULL)."""
+    rows = []
+    with open(path, 'r', encoding='utf-8', newline='\n') as f:
+        for line in f:
+            line = line[:-1] if line.endswith('\n') else line
+            if line == '\\.':
+                break
+            rows.append([unescape_copy_value(field) for field in line.split('\t')])
+    return rows
+
+def check_not_null(tables: Dict[str, Table]):
+    """Raise ValueError naming the rows with NULL in a column the seed schema declares NOT NULL."""
+    problems = []
+    for table, (columns, rows) in tables.items():
+        for column in NOT_NULL_COLUMNS.get(table, ()):
+            index = columns.index(column)
+            missing = [row for row in rows if row[index] is None]
+            if not missing:
+                continue
+            # Rows are named by their name column, which every table has, or by id where that is the NULL
+            name_index = columns.index('name')
+            names = ', '.join(f'id {row[0]}' if row[name_index] is None else str(row[name_index])
+                              for row in missing[:5])
+            more = f' and {len(missing) - 5} more' if len(missing) > 5 else ''
+            hint = NULL_HINTS.get((table, column))
+            problems.append(f"{table}.{column} is NOT NULL but is missing for {names}{more}"
+                            + (f" ({hint})" if hint else ''))
+    if problems:
+        raise ValueError('; '.join(problems))
+
+def write_tables(out_dir: str, tables: Dict[str, Table]):
+    """Write one COPY file per table and merge them into the directory's manifest.
+
+    The recipe and critter parsers each export their own tables into the same
+    directory, so the manifest keeps entries written by the other one. Tables
+    that the seed schema would reject are refused before anything is written.
+    """
+    check_not_null(tables)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST_FILE)
+    entries = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            entries = {entry['table']: entry for entry in json.load(f)['tables']}
+
+    for table, (columns, rows) in tables.items():
+        file_name = f'{table}.tsv'
+        count = write_copy_file(os.path.join(out_dir, file_name), rows)
+        entries[table] = {'table': table, 'file': file_name, 'columns': columns, 'rows': count}
+
+    ordered = [entries[table] for table in LOAD_ORDER if table in entries]
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({'format': 'text', 'tables': ordered}, f, indent=2)
+
+    with open(os.path.join(out_dir, LOAD_SCRIPT_FILE), 'w', encoding='utf-8') as f:
+        f.write(load_script(ordered))
+
+def load_script(entries: List[dict]) -> str:
+    """psql script that bulk loads the files and moves each id sequence past the loaded ids.
+
+    The file paths are relative, so run it from inside the export directory.
+    """
+    lines = ['BEGIN;']
+    for entry in entries:
+        lines.append(f"\\copy {entry['table']} ({', '.join(entry['columns'])}) FROM '{entry['file']}'")
+    for entry in entries:
+        table = entry['table']
+        lines.append(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 1)) FROM {table};")
+    lines.append('COMMIT;')
+    return '\n'.join(lines) + '\n'
+
+def recipe_tables(normalized: dict) -> Dict[str, Table]:
+    """Rows for the recipe tables the seed script creates, from normalized recipe output."""
+    # Like the seed script, only load what the recipes actually use and skip
+    # recipes without the numbers the NOT NULL columns require
+    recipes = [
+        recipe for recipe in normalized['recipes']
+        if recipe['stars'] is not None and recipe['energy'] is not None and recipe['sell_price'] is not None
+    ]
+    used_ingredient_ids = set()
+    for recipe in recipes:
+        for entry in recipe['ingredient_ids']:
+            used_ingredient_ids.update(entry if isinstance(entry, list) else [entry])
+    ingredients = [i for i in normalized['ingredients'] if i['id'] in used_ingredient_ids]
+    used_type_ids = {i['ingredient_type_id'] for i in ingredients}
+    ingredient_types = [t for t in normalized['ingredient_types'] if t['id'] in used_type_ids]
+
+    return {
+        'collections': (['id', 'name'], [(c['id'], c['name']) for c in normalized['collections']]),
+        'recipe_types': (
+            ['id', 'name', 'image_url'],
+            [(t['id'], t['name'], t['image_url']) for t in normalized['recipe_types']],
+        ),
+        'ingredient_types': (
+            ['id', 'name', 'image_url'],
+            [(t['id'], t['name'], t['image_url']) for t in ingredient_types],
+        ),
+        'ingredients': (
+            ['id', 'name', 'image_url', 'ingredient_type_id', 'is_generic'],
+            [(i['id'], i['name'], i['image_url'], i['ingredient_type_id'], is_generic(i['name'])) for i in ingredients],
+        ),
+        'recipes': (
+            ['id', 'image_url', 'name', 'type_id', 'collection_id', 'ingredient_ids', 'stars', 'energy', 'sell_price'],
+            [
+                (r['id'], r['image_url'], r['name'], r['type_id'], r['collection_id'], r['ingredient_ids'],
+                 r['stars'], r['energy'], r['sell_price'])
+                for r in recipes
+            ],
+        ),
+    }
+
+def critter_tables(critter_types: List[dict], critters: List[dict], locations: List[dict]) -> Dict[str, Table]:
+    """Rows for the critter tables the seed script creates, from the parsed critter output."""
+    location_ids = {location['name']: id for id, location in enumerate(locations, 1)}
+    critter_type_ids = {}
+    for id, critter_type in enumerate(critter_types, 1):
+        critter_type_ids.setdefault(critter_type['name'], id)
+
+    return {
+        'locations': (
+            ['id', 'name', 'image_url'],
+            [(id, location['name'], location['image_url']) for id, location in enumerate(locations, 1)],
+        ),
+        'critter_types': (
+            ['id', 'name', 'location_id'],
+            [(id, t['name'], location_ids.get(t['location'])) for id, t in enumerate(critter_types, 1)],
+        ),
+        'critters': (
+            ['id', 'name', 'critter_type_id', 'image_url', 'schedule'],
+            [
+                (id, c['name'], critter_type_ids.get(c['type']), c['image_url'], c['schedule'])
+                for id, c in enumerate(critters, 1)
+            ],
+        ),
+    }
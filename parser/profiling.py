@@ -0,0 +1,168 @@
+"""Opt-in per-stage timings, counters and allocation stats for the parsers.
+
+Everything here is a no-op until enable() is called, which the parsers do for
+--profile. Stages nest, and each one reports its inclusive time.
+"""
+import contextlib
+import cProfile
+import functools
+import gc
+import io
+import json
+import pstats
+import sys
+import time
+import tracemalloc
+from typing import Dict, Optional
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.capture_row: Optional[int] = None
+        self.stages: Dict[str, list] = {}  # name -> [calls, seconds]
+        self.counters: Dict[str, int] = {}
+        self.row_profile: Optional[dict] = None
+        self._started = None
+        self._gc_collections = None
+
+    def enable(self, capture_row: Optional[int] = None):
+        self.enabled = True
+        self.capture_row = capture_row
+        self._started = time.perf_counter()
+        self._gc_collections = [stats['collections'] for stats in gc.get_stats()]
+
+    def add_time(self, name: str, seconds: float):
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = [0, 0.0]
+        stage[0] += 1
+        stage[1] += seconds
+
+    def report(self) -> dict:
+        gc_collections = [stats['collections'] for stats in gc.get_stats()]
+        return {
+            'total_seconds': time.perf_counter() - self._started if self._started else None,
+            'stages': {
+                name: {'calls': calls, 'seconds': seconds, 'mean_us': seconds / calls * 1e6}
+                for name, (calls, seconds) in sorted(self.stages.items(), key=lambda item: -item[1][1])
+            },
+            'counters': dict(sorted(self.counters.items())),
+            'allocations': {
+                'peak_rss_mib': _peak_rss_mib(),
+                'gc_collections': [now - then for now, then in zip(gc_collections, self._gc_collections or gc_collections)],
+                'gc_objects': len(gc.get_objects()),
+            },
+            'row_profile': self.row_profile,
+        }
+
+    def save(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+
+profiler = Profiler()
+
+def _peak_rss_mib() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak /= 1024
+    return peak / 1024
+
+def enable(capture_row: Optional[int] = None):
+    """Start recording; capture_row also profiles that row index in detail."""
+    profiler.enable(capture_row)
+
+def count(name: str, amount: int = 1):
+    if profiler.enabled:
+        profiler.counters[name] = profiler.counters.get(name, 0) + amount
+
+@contextlib.contextmanager
+def _timed_stage(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.add_time(name, time.perf_counter() - started)
+
+_DISABLED = contextlib.nullcontext()
+
+def stage(name: str):
+    """Context manager that adds the time spent inside it to a stage."""
+    return _timed_stage(name) if profiler.enabled else _DISABLED
+
+@contextlib.contextmanager
+def _held_counts():
+    counters = profiler.counters
+    profiler.counters = {}
+    try:
+        yield
+    except BaseException:
+        profiler.counters = counters
+        raise
+    held, profiler.counters = profiler.counters, counters
+    for name, amount in held.items():
+        count(name, amount)
+
+def counts_if_done():
+    """Context manager keeping the counts made inside it only if it finishes, e.g. an attempt that may fall back."""
+    return _held_counts() if profiler.enabled else _DISABLED
+
+def timed(name: str):
+    """Decorator that times every call of a hot function as a stage."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.add_time(name, time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+@contextlib.contextmanager
+def _captured_row(index: int):
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    row_profiler = cProfile.Profile()
+    row_profiler.enable()
+    try:
+        yield
+    finally:
+        row_profiler.disable()
+        after = tracemalloc.take_snapshot()
+        if not was_tracing:
+            tracemalloc.stop()
+
+        stats_text = io.StringIO()
+        pstats.Stats(row_profiler, stream=stats_text).sort_stats('cumulative').print_stats(25)
+        allocations = after.compare_to(before, 'lineno')
+        profiler.row_profile = {
+            'row': index,
+            'cprofile': stats_text.getvalue(),
+            'allocated_bytes': sum(stat.size_diff for stat in allocations if stat.size_diff > 0),
+            'top_allocations': [
+                {'where': str(stat.traceback), 'size_diff': stat.size_diff, 'count_diff': stat.count_diff}
+                for stat in allocations[:15]
+            ],
+        }
+
+def capture_row(index: int):
+    """Run cProfile and tracemalloc around the row chosen with enable(capture_row=...)."""
+    if profiler.enabled and profiler.capture_row == index:
+        return _captured_row(index)
+    return _DISABLED
+
+def add_arguments(parser):
+    """Add the --profile and --profile-row flags to a parser's argparse CLI."""
+    parser.add_argument('--profile', metavar='PATH',
+                        help='record per-stage timings and counters and write them to PATH as JSON')
+    parser.add_argument('--profile-row', type=int, metavar='N',
+                        help='with --profile, also capture cProfile and tracemalloc output for row N')
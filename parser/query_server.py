@@ -0,0 +1,315 @@
+"""Local HTTP server answering the app's recipe, ingredient and critter queries from memory.
+
+The catalog written with --sqlite (see sqlite_catalog.py) is read once at
+startup into the JSON shapes getAllRecipes, getAllIngredients and
+getAllCritters in src/lib/db.ts return. Each record is serialized once, the
+full lists are kept as ready response bodies, and filtered lists are joined
+from the serialized records through in-memory indexes:
+
+    python query_server.py catalog.db --port 8000
+    curl localhost:8000/recipes
+    curl 'localhost:8000/recipes?ingredient=Tomato&type=Entrees'
+    curl localhost:8000/critters/12
+
+Filters match names case-insensitively, and several filters all have to
+match; / answers with the number of records per endpoint. Every response
+carries an ETag; a request sending it back in If-None-Match gets 304 without
+a body. load_test.py measures the server.
+"""
+import argparse
+import asyncio
+from hashlib import blake2b
+import json
+import sqlite3
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8000
+
+# Filtered responses kept serialized; the cache is emptied when it fills up
+MAX_CACHED_RESPONSES = 4096
+MAX_HEADER_BYTES = 16 * 1024
+
+_REASONS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            500: 'Internal Server Error'}
+
+def _key(value) -> str:
+    return str(value).casefold()
+
+class Response:
+    """A serialized response body and its ETag."""
+
+    __slots__ = ('status', 'body', 'etag')
+
+    def __init__(self, status: int, body: bytes):
+        self.status = status
+        self.body = body
+        self.etag = '"' + blake2b(body, digest_size=12).hexdigest() + '"'
+
+def json_response(status: int, data) -> Response:
+    return Response(status, json.dumps(data, ensure_ascii=False).encode('utf-8'))
+
+class Resource:
+    """The records of one endpoint, serialized once, with an index per filter.
+
+    keys maps each filter name to a function giving the values a record can
+    be found under; a record is listed once per value.
+    """
+
+    def __init__(self, name: str, records: List[dict], keys: Dict[str, Callable[[dict], Iterable]]):
+        self.name = name
+        self.records = records
+        self.pieces = [json.dumps(record, ensure_ascii=False).encode('utf-8') for record in records]
+        self.positions = {record['id']: position for position, record in enumerate(records)}
+        self.indexes: Dict[str, Dict[str, List[int]]] = {}
+        for filter_name, values in keys.items():
+            index: Dict[str, List[int]] = {}
+            for position, record in enumerate(records):
+                for value in dict.fromkeys(_key(value) for value in values(record) if value is not None):
+                    index.setdefault(value, []).append(position)
+            self.indexes[filter_name] = index
+        self.all = Response(200, self._join(range(len(records))))
+        self._cache: Dict[Tuple, Response] = {}
+
+    def _join(self, positions: Iterable[int]) -> bytes:
+        return b'[' + b','.join(self.pieces[position] for position in positions) + b']'
+
+    def one(self, id: str) -> Response:
+        position = self.positions.get(int(id)) if id.isascii() and id.isdigit() else None
+        if position is None:
+            return json_response(404, {'error': f'no {self.name} with id {id}'})
+        cached = self._cache.get(('id', position))
+        if cached is None:
+            cached = self._store(('id', position), Response(200, self.pieces[position]))
+        return cached
+
+    def query(self, filters: List[Tuple[str, str]]) -> Response:
+        """The records matching every filter, in id order."""
+        if not filters:
+            return self.all
+        unknown = sorted({name for name, _ in filters if name not in self.indexes})
+        if unknown:
+            return json_response(400, {'error': f"unknown filter {', '.join(unknown)}",
+                                       'filters': sorted(self.indexes)})
+        key = tuple(sorted((name, _key(value)) for name, value in filters))
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        # Intersect starting from the shortest list
+        matches = sorted((self.indexes[name].get(value, []) for name, value in key), key=len)
+        positions = matches[0]
+        for other in matches[1:]:
+            if not positions:
+                break
+            other = set(other)
+            positions = [position for position in positions if position in other]
+        return self._store(key, Response(200, self._join(positions)))
+
+    def _store(self, key: Tuple, response: Response) -> Response:
+        if len(self._cache) >= MAX_CACHED_RESPONSES:
+            self._cache.clear()
+        self._cache[key] = response
+        return response
+
+def load_catalog(path: str) -> Dict[str, Resource]:
+    """Read a catalog into the recipes, ingredients and critters resources.
+
+    Rows are shaped and joined like the db.ts queries, so rows those queries'
+    inner joins drop are left out here as well.
+    """
+    connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        ingredient_refs = {
+            id: {'name': name, 'image_url': image_url}
+            for id, name, image_url in connection.execute('SELECT id, name, image_url FROM ingredients')
+        }
+
+        def ingredient_ref(entry):
+            if isinstance(entry, list):
+                return [ingredient_refs[id] for id in entry if id in ingredient_refs]
+            return ingredient_refs.get(entry)
+
+        recipes = [
+            {
+                'id': id,
+                'image_url': image_url,
+                'name': name,
+                'type': {'name': type_name, 'image_url': type_image_url},
+                'stars': stars,
+                'energy': energy,
+                'sell_price': sell_price,
+                'collection': collection,
+                'ingredients': [ingredient_ref(entry) for entry in json.loads(ingredient_ids)],
+            }
+            for id, image_url, name, type_name, type_image_url, stars, energy, sell_price, collection, ingredient_ids
+            in connection.execute("""
+                SELECT r.id, r.image_url, r.name, rt.name, rt.image_url, r.stars, r.energy, r.sell_price,
+                       c.name, r.ingredient_ids
+                FROM recipes r
+                JOIN recipe_types rt ON r.type_id = rt.id
+                JOIN collections c ON r.collection_id = c.id
+                ORDER BY r.id
+            """)
+        ]
+        ingredients = [
+            {'id': id, 'name': name, 'image_url': image_url, 'ingredient_type': ingredient_type,
+             'is_generic': bool(is_generic)}
+            for id, name, image_url, ingredient_type, is_generic in connection.execute("""
+                SELECT i.id, i.name, i.image_url, it.name, i.is_generic
+                FROM ingredients i
+                JOIN ingredient_types it ON i.ingredient_type_id = it.id
+                ORDER BY i.id
+            """)
+        ]
+        critters = [
+            {'id': id, 'name': name, 'image_url': image_url, 'type': type_name,
+             'location': {'name': location, 'image_url': location_image_url}, 'schedule': json.loads(schedule)}
+            for id, name, image_url, type_name, location, location_image_url, schedule in connection.execute("""
+                SELECT c.id, c.name, c.image_url, ct.name, l.name, l.image_url, c.schedule
+                FROM critters c
+                JOIN critter_types ct ON c.critter_type_id = ct.id
+                JOIN locations l ON ct.location_id = l.id
+                ORDER BY c.id
+            """)
+        ]
+    finally:
+        connection.close()
+
+    def recipe_ingredient_names(recipe):
+        for entry in recipe['ingredients']:
+            for ingredient in (entry if isinstance(entry, list) else [entry]):
+                if ingredient:
+                    yield ingredient['name']
+
+    return {
+        'recipes': Resource('recipe', recipes, {
+            'name': lambda recipe: [recipe['name']],
+            'type': lambda recipe: [recipe['type']['name']],
+            'collection': lambda recipe: [recipe['collection']],
+            'ingredient': recipe_ingredient_names,
+        }),
+        'ingredients': Resource('ingredient', ingredients, {
+            'name': lambda ingredient: [ingredient['name']],
+            'type': lambda ingredient: [ingredient['ingredient_type']],
+        }),
+        'critters': Resource('critter', critters, {
+            'name': lambda critter: [critter['name']],
+            'type': lambda critter: [critter['type']],
+            'location': lambda critter: [critter['location']['name']],
+        }),
+    }
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate == '*' or candidate.removeprefix('W/') == etag:
+            return True
+    return False
+
+class QueryServer:
+    """Routes requests to the resources of a catalog and serves them over HTTP/1.1 with keep-alive."""
+
+    def __init__(self, resources: Dict[str, Resource]):
+        self.resources = resources
+        self.health = json_response(200, {name: len(resource.records) for name, resource in resources.items()})
+        self.requests = 0
+
+    def route(self, target: str) -> Response:
+        url = urlsplit(target)
+        parts = [part for part in url.path.split('/') if part]
+        if not parts:
+            return self.health
+        resource = self.resources.get(parts[0])
+        if resource is None or len(parts) > 2:
+            return json_response(404, {'error': f'no such endpoint {url.path}',
+                                       'endpoints': ['/' + name for name in self.resources]})
+        if len(parts) == 2:
+            return resource.one(parts[1])
+        return resource.query(parse_qsl(url.query))
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lines = head.decode('latin-1').split('\r\n')
+                request = lines[0].split(' ')
+                if len(request) != 3:
+                    break
+                method, target, version = request
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(':')
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection == 'keep-alive' if version == 'HTTP/1.0' else connection != 'close'
+                length = headers.get('content-length', '0')
+                valid_length = length.isascii() and length.isdigit()
+                if valid_length and int(length):
+                    try:
+                        await reader.readexactly(int(length))
+                    except asyncio.IncompleteReadError:
+                        break
+
+                self.requests += 1
+                if not valid_length:
+                    # Where this request's body ends is unknown, so nothing after it on the connection can be read
+                    response = json_response(400, {'error': f'invalid Content-Length {length!r}'})
+                    keep_alive = False
+                elif method in ('GET', 'HEAD'):
+                    try:
+                        response = self.route(target)
+                    except Exception as e:
+                        # A bug answering one request shouldn't drop the connection without a reply
+                        print(f"Error answering {target}: {e!r}")
+                        response = json_response(500, {'error': 'internal error'})
+                else:
+                    response = json_response(405, {'error': f'{method} is not supported'})
+
+                not_modified = response.status == 200 and _etag_matches(headers.get('if-none-match'), response.etag)
+                status = 304 if not_modified else response.status
+                body = b'' if not_modified or method == 'HEAD' else response.body
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {0 if not_modified else len(response.body)}\r\n"
+                    f"ETag: {response.etag}\r\n"
+                    f"Cache-Control: no-cache\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass  # The client went away mid-response
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER_BYTES)
+        print(f"Serving {', '.join(f'/{name}' for name in self.resources)} on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve the parsed recipes, ingredients and critters from memory.')
+    parser.add_argument('catalog', help='SQLite catalog written by the parsers with --sqlite')
+    parser.add_argument('--host', default=DEFAULT_HOST, help='address to listen on')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='port to listen on')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    resources = load_catalog(args.catalog)
+    counts = ', '.join(f'{len(resource.records)} {name}' for name, resource in resources.items())
+    print(f"Loaded {counts} in {time.perf_counter() - started:.2f}s")
+    try:
+        asyncio.run(QueryServer(resources).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -1,7 +1,64 @@
-from bs4 import BeautifulSoup
+from html.parser import HTMLParser
+import argparse
 import csv
 import json
+import os
 import re
+import sys
+
+from category_index import CategoryIndex, ExpandedRecipes
+from entity_resolution import print_unresolved, write_unresolved_report
+from fast_extract import FastPathStats, Unsupported, parse_fragment, split_rows
+import html_backend
+from html_backend import make_soup
+import image_mirror
+import ndjson_io
+from normalize import RecipeNormalizer, load_ingredient_categories
+from parallel import DEFAULT_CHUNK_ROWS, map_calls, map_chunks
+from pg_copy import recipe_tables, write_tables
+import profiling
+from records import Recipe, image_ref, intern_text, to_json
+from row_cache import DEFAULT_MAX_ENTRIES, RowCache
+from row_extractor import Column, RowSpec, Select
+from snapshot import SnapshotWriter
+import sqlite_catalog
+
+# How much of the input file the streaming mode reads at a time
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Keep "Any Fruit"-style slots, which link to their category, instead of dropping them (--generic).
+# Pool workers get it through keep_generic_slots, since spawned ones don't see it set
+KEEP_GENERIC_SLOTS = False
+
+def keep_generic_slots(keep: bool):
+    # Pool worker initializer, so rows are parsed the same way in every process
+    global KEEP_GENERIC_SLOTS
+    KEEP_GENERIC_SLOTS = keep
+
+# An ingredient's name template: its image and the link holding its name
+NAME_TEMPLATE_FIELDS = [
+    Select('image', 'img', first=True),
+    Select('link', 'a', first=True, text=True),
+]
+
+# Everything parse_row reads from a row, gathered in one walk
+RECIPE_ROW = RowSpec([
+    Column(Select('image', 'img', first=True)),
+    Column(text=True),
+    Column(Select('type', 'span', first=True, text=True, nested=[Select('image', 'img', first=True)])),
+    Column(Select('stars', 'span', id='star-color', first=True, text=True)),
+    Column(text=True),
+    Column(text=True),
+    Column(
+        Select('ingredients', 'span', id='nametemplate', text=True, nested=NAME_TEMPLATE_FIELDS),
+        Select('options', 'ul', first=True, nested=[
+            Select('items', 'li', nested=[
+                Select('ingredient', 'span', id='nametemplate', first=True, text=True, nested=NAME_TEMPLATE_FIELDS),
+            ]),
+        ]),
+    ),
+    Column(text=True),
+])
 
 def count_stars(star_text):
     return len(star_text.strip())
@@ -10,6 +67,7 @@ def clean_number(text):
     # Remove commas and any non-digit characters except minus sign
     return re.sub(r'[^\d-]', '', text)
 
+@profiling.timed('extract_image_url')
 def extract_image_url(img_tag):
     if not img_tag:
         return None
@@ -30,7 +88,20 @@ def extract_image_url(img_tag):
     
     return None
 
+def name_template_ingredient(span):
+    # The image and name of a gathered name template span
+    img = span.first('image')
+    img_url = extract_image_url(img.tag if img else None)
+    link = span.first('link')
+    name = link.text() if link else span.stripped_text()
+    if not name and KEEP_GENERIC_SLOTS and link and link.tag.get('href', '').startswith('/Category:'):
+        # A generic slot's first link only wraps the category image; its name follows it
+        name = span.stripped_text()
+    return name, img_url
+
+@profiling.timed('parse_ingredients')
 def parse_ingredients(td):
+    # td is the ingredients cell as gathered by RECIPE_ROW
     # Example ingredients table cell:
     # <td>
     # <p><span id="nametemplate"><a href="/Category:Fruit" title="Category:Fruit"><img alt="Fruit.png" src="/images/thumb/a/a0/Fruit.png/20px-Fruit.png" decoding="async" loading="lazy" width="20" height="20" srcset="/images/thumb/a/a0/Fruit.png/30px-Fruit.png 1.5x, /images/thumb/a/a0/Fruit.png/40px-Fruit.png 2x"></a> <a href="/Category:Fruit" title="Category:Fruit">Any Fruit</a></span><br>
@@ -50,7 +121,7 @@ def parse_ingredients(td):
     # for each ingredient in a table cell, there could be a mandatory or optional ingredient
     # if there is an <ul> tag, then there are optional ingredients
     # if there is a <span> tag outside of a ul tag, then there is a mandatory ingredient
-    # exclude the "Any" ingredients
+    # exclude the "Any" ingredients, unless KEEP_GENERIC_SLOTS keeps them as {"name": "Any Fruit", ...}
 
     # so ingredients for example #1 would be [
     #   [{
@@ -102,132 +173,546 @@ def parse_ingredients(td):
     optional_ingredients = []
 
     # Find all elements with id=nametemplate within the td that are not a child of ul/li
-    for span in td.find_all('span', id='nametemplate'):
-        if span.parent.name != 'ul' and span.parent.name != 'li':
-            img = span.find('img')
-            img_url = extract_image_url(img)
-            name = span.find('a').text if span.find('a') else span.get_text(strip=True)
+    for span in td.all('ingredients'):
+        if span.tag.parent.name != 'ul' and span.tag.parent.name != 'li':
+            name, img_url = name_template_ingredient(span)
+        elif KEEP_GENERIC_SLOTS:
+            # Options are read from the list below. Without --generic the name before the list is
+            # repeated here instead, which only shows when that name isn't a dropped "Any" slot
+            continue
             
         if name != "":
-            ingredients.append({
-                'name': name,
-                'image_url': img_url
-            })
+            ingredients.append(image_ref(name, img_url))
     
     # Find optional ingredients in ul lists
-    ul = td.find('ul')
+    ul = td.first('options')
     if ul:
-        for li in ul.find_all('li'):
-            span = li.find('span', id='nametemplate')
+        for li in ul.all('items'):
+            span = li.first('ingredient')
             if span:
-                img = span.find('img')
-                img_url = extract_image_url(img)
-                name = span.find('a').text if span.find('a') else span.get_text(strip=True)
+                name, img_url = name_template_ingredient(span)
                 
-                optional_ingredients.append({
-                    'name': name,
-                    'image_url': img_url
-                })
+                optional_ingredients.append(image_ref(name, img_url))
+    
+    profiling.count('ingredients', len(ingredients) + len(optional_ingredients))
     
     # If we have optional ingredients, make them the first element in the list
     if optional_ingredients:
         return [optional_ingredients] + ingredients
     return ingredients
 
-def parse_table(html_content):
-    soup = BeautifulSoup(html_content, 'html.parser')
-    table = soup.find('table')
+@profiling.timed('parse_row')
+def parse_row(tr):
+    cols = RECIPE_ROW.extract(tr)
+    if not cols:
+        return None
+    profiling.count('rows')
+    profiling.count('cells', len(cols))
+        
+    # Image
+    main_img = cols[0].first('image')
+    image_url = extract_image_url(main_img.tag if main_img else None)
+    
+    # Name (remove hyperlink)
+    name = cols[1].stripped_text()
+    
+    # Type (create object with name and image)
+    type_span = cols[2].first('type')
+    type_img = type_span.first('image')
+    type_name = type_span.stripped_text()
+    type_data = image_ref(type_name, extract_image_url(type_img.tag if type_img else None))
+    
+    # Stars (convert to number)
+    stars_span = cols[3].first('stars')
+    if stars_span:
+        stars_text = stars_span.stripped_text()
+        stars_count = count_stars(stars_text)
+    else:
+        stars_count = None
+    
+    # Energy
+    energy = clean_number(cols[4].stripped_text())
+    
+    # Sell Price
+    sell_price = clean_number(cols[5].stripped_text())
+    
+    # Ingredients
+    ingredients = parse_ingredients(cols[6])
+    
+    # Collection
+    collection = cols[7].stripped_text()
+    
+    # Types, ingredients and collections repeat across rows, so those are shared rather than copied
+    return Recipe(
+        image_url,
+        name,
+        type_data,
+        stars_count,
+        int(energy) if energy else None,
+        int(sell_price) if sell_price else None,
+        ingredients,
+        intern_text(collection),
+    )
+
+def parse_table(html_content, cache=None, fast=None):
+    # fast is a FastPathStats to parse rows without BeautifulSoup where the markup allows it
+    if fast is not None:
+        row_htmls = split_rows(html_content)
+        if row_htmls is not None:
+            return parse_row_htmls(row_htmls[1:], cache, fast)  # Skip header row
+    if cache:
+        # Cached rows are keyed by their markup as written in the file, as in --stream and --workers mode,
+        # so the rows are scanned out the same way rather than re-serialized from a tree
+        with profiling.stage('scan_rows'):
+            row_htmls = scan_table_rows(html_content)
+        return parse_row_htmls(row_htmls[1:], cache, fast)  # Skip header row
+    with profiling.stage('build_tree'):
+        soup = make_soup(html_content)
+    with profiling.stage('find_rows'):
+        table = soup.find('table')
+        trs = table.find_all('tr')[1:]  # Skip header row
     rows = []
     
-    for tr in table.find_all('tr')[1:]:  # Skip header row
-        cols = tr.find_all('td')
-        if not cols:
-            continue
-            
-        # Image
-        main_img = cols[0].find('img')
-        image_url = extract_image_url(main_img)
-        
-        # Name (remove hyperlink)
-        name = cols[1].get_text(strip=True)
-        
-        # Type (create object with name and image)
-        type_span = cols[2].find('span')
-        type_img = type_span.find('img')
-        type_name = type_span.get_text(strip=True)
-        type_data = {
-            'name': type_name,
-            'image_url': extract_image_url(type_img)
-        }
-        
-        # Stars (convert to number)
-        stars_span = cols[3].find('span', id='star-color')
-        if stars_span:
-            stars_text = stars_span.get_text(strip=True)
-            stars_count = count_stars(stars_text)
-        else:
-            stars_count = None
-        
-        # Energy
-        energy = clean_number(cols[4].get_text(strip=True))
-        
-        # Sell Price
-        sell_price = clean_number(cols[5].get_text(strip=True))
-        
-        # Ingredients
-        ingredients = parse_ingredients(cols[6])
-        
-        # Collection
-        collection = cols[7].get_text(strip=True)
-        
-        row = {
-            'image_url': image_url,
-            'name': name,
-            'type': type_data,
-            'stars': stars_count,
-            'energy': int(energy) if energy else None,
-            'sell_price': int(sell_price) if sell_price else None,
-            'ingredients': ingredients,
-            'collection': collection
-        }
-        rows.append(row)
+    for i, tr in enumerate(trs):
+        with profiling.capture_row(i):
+            row = parse_row(tr)
+        if row:
+            rows.append(row)
+    if fast is not None:
+        fast.fell_back('table layout', len(trs))
     
     return rows
 
-def save_to_csv(rows, output_file):
+def parse_row_htmls(row_htmls, cache=None, fast=None):
+    # Rows already split out of the page, keyed in the cache by their markup as in --stream mode
+    rows = []
+    for i, row_html in enumerate(row_htmls):
+        with profiling.capture_row(i):
+            if cache:
+                key, row = cache.lookup('recipes', row_html, lambda: parse_row_markup(row_html, fast))
+                if row:
+                    cache.record('recipes', row['name'], key)
+            else:
+                row = parse_row_markup(row_html, fast)
+        if row:
+            rows.append(row)
+    return rows
+
+class TableRowScanner(HTMLParser):
+    """Collects the raw markup of each <tr> in the first <table> of a document.
+
+    Everything outside that table is discarded as it is scanned, so only the
+    row currently being read is ever held in memory.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.done = False
+        self._rows = []
+        self._row = None
+        self._table_depth = 0
+
+    def drain(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def _end_row(self):
+        if self._row is not None:
+            self._rows.append(''.join(self._row))
+            self._row = None
+
+    def _append(self, markup):
+        if self._row is not None:
+            self._row.append(markup)
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if tag == 'table':
+            self._table_depth += 1
+        elif tag == 'tr' and self._table_depth == 1:
+            # A new row implicitly closes an unterminated one
+            self._end_row()
+            self._row = []
+        self._append(self.get_starttag_text())
+
+    def handle_startendtag(self, tag, attrs):
+        if not self.done:
+            self._append(self.get_starttag_text())
+
+    def handle_endtag(self, tag):
+        if self.done:
+            return
+        if self._table_depth == 1 and tag in ('table', 'tbody', 'thead', 'tfoot'):
+            self._end_row()
+        else:
+            self._append(f'</{tag}>')
+            if tag == 'tr' and self._table_depth == 1:
+                self._end_row()
+        if tag == 'table':
+            self._table_depth -= 1
+            if self._table_depth == 0:
+                self.done = True
+
+    def handle_data(self, data):
+        self._append(data)
+
+    def handle_entityref(self, name):
+        self._append(f'&{name};')
+
+    def handle_charref(self, name):
+        self._append(f'&#{name};')
+
+    def handle_comment(self, data):
+        self._append(f'<!--{data}-->')
+
+def iter_table_rows(input_file, chunk_size=STREAM_CHUNK_SIZE):
+    # Yield the raw markup of each row of the first table, reading the file incrementally
+    scanner = TableRowScanner()
+    with open(input_file, 'r', encoding='utf-8') as f:
+        while not scanner.done:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            with profiling.stage('scan_rows'):
+                scanner.feed(chunk)
+            yield from scanner.drain()
+    scanner.close()
+    yield from scanner.drain()
+
+def scan_table_rows(html_content):
+    # The raw markup of each row of the first table, as iter_table_rows yields them from a file
+    scanner = TableRowScanner()
+    scanner.feed(html_content)
+    scanner.close()
+    return scanner.drain()
+
+def parse_row_html(row_html):
+    # Build a soup for a single <tr> fragment only
+    with profiling.stage('build_tree'):
+        tr = make_soup(row_html).find('tr')
+    return parse_row(tr) if tr else None
+
+def parse_row_markup(row_html, fast=None):
+    # parse_row_html, reading regular markup into a light tree instead of a soup when fast is given
+    if fast is None:
+        return parse_row_html(row_html)
+    try:
+        # Values are read lazily, so Unsupported can come after some of the row was counted
+        with profiling.counts_if_done():
+            with profiling.stage('build_tree'):
+                tree = parse_fragment(row_html)
+            row = parse_row(tree)
+    except Unsupported as e:
+        row = parse_row_html(row_html)
+        fast.fell_back(str(e))
+        return row
+    fast.fast += 1
+    return row
+
+def iter_parsed_rows(input_file, chunk_size=STREAM_CHUNK_SIZE, cache=None, fast=None):
+    row_htmls = iter_table_rows(input_file, chunk_size)
+    next(row_htmls, None)  # Skip header row
+    for i, row_html in enumerate(row_htmls):
+        with profiling.capture_row(i):
+            if cache:
+                # Unchanged rows skip even the single-row soup
+                key, row = cache.lookup('recipes', row_html, lambda: parse_row_markup(row_html, fast))
+                if row:
+                    cache.record('recipes', row['name'], key)
+            else:
+                row = parse_row_markup(row_html, fast)
+        if row:
+            yield row
+
+def parse_rows_parallel(input_file, workers, chunk_rows=DEFAULT_CHUNK_ROWS, cache=None):
+    # Split the table's rows into chunks and parse them in a process pool, keeping their order
+    with profiling.stage('scan_rows'):
+        row_htmls = list(iter_table_rows(input_file))[1:]  # Skip header row
+    parse_many = lambda htmls: map_chunks(parse_row_html, htmls, workers, chunk_rows,
+                                         keep_generic_slots, (KEEP_GENERIC_SLOTS,))
+    if cache:
+        # Only rows missing from the cache are sent to the pool
+        keys, rows = cache.lookup_many('recipes', row_htmls, parse_many)
+        for key, row in zip(keys, rows):
+            if row:
+                cache.record('recipes', row['name'], key)
+    else:
+        rows = parse_many(row_htmls)
+    return [row for row in rows if row]
+
+# Columns whose objects/lists are written to the CSV as JSON strings
+JSON_COLUMNS = ('type', 'ingredients')
+
+class CsvRowWriter:
+    """Writes rows to a CSV file one at a time; the header is taken from the first row."""
+
+    def __init__(self, output_file):
+        self.file = open(output_file, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.fieldnames = None
+        self.json_indexes = ()
+        self.count = 0
+
+    def write(self, row):
+        if self.fieldnames is None:
+            self.fieldnames = list(row)
+            self.json_indexes = [i for i, key in enumerate(self.fieldnames) if key in JSON_COLUMNS]
+            self.writer.writerow(self.fieldnames)
+        self.writer.writerow(serialize_row(row, self.fieldnames, self.json_indexes))
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+def open_row_writer(output_file, ndjson=None):
+    # ndjson is an NdjsonOutput to write one JSON record per row instead of CSV
+    return ndjson.writer(output_file) if ndjson else CsvRowWriter(output_file)
+
+def save_to_csv(rows, output_file, ndjson=None):
     if not rows:
         return
     
-    fieldnames = rows[0].keys()
-    
-    with open(output_file, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
+    with open_row_writer(output_file, ndjson) as writer:
         for row in rows:
-            # Convert objects/lists to JSON strings for CSV
-            row_copy = row.copy()
-            row_copy['type'] = json.dumps(row_copy['type'])
-            row_copy['ingredients'] = json.dumps(row_copy['ingredients'])
-            writer.writerow(row_copy)
+            writer.write(row)
+
+@profiling.timed('serialize_row')
+def serialize_row(row, fieldnames, json_indexes):
+    # The row's values as a CSV record, objects/lists converted to JSON strings; the row itself isn't copied
+    values = [row[key] for key in fieldnames]
+    for i in json_indexes:
+        values[i] = json.dumps(values[i], default=to_json)
+    return values
+
+def stream_html_file_to_csv(input_file, output_file, chunk_size=STREAM_CHUNK_SIZE, cache=None, normalizer=None,
+                            snapshot=None, fast=None, ndjson=None, expanded=None):
+    # Parse and write one row at a time instead of building the whole table in memory
+    with open_row_writer(output_file, ndjson) as writer:
+        for row in iter_parsed_rows(input_file, chunk_size, cache, fast):
+            with profiling.stage('write_csv'):
+                writer.write(row)
+            if normalizer:
+                normalizer.add_recipe(row)
+            if snapshot:
+                snapshot.add_recipe(row)
+            if expanded:
+                expanded.add_recipe(row)
+    return writer.count
 
-def convert_html_file_to_csv(input_file, output_file):
+def parallel_html_file_to_csv(input_file, output_file, workers, chunk_rows=DEFAULT_CHUNK_ROWS, cache=None,
+                              normalizer=None, mirror=None, snapshot=None, ndjson=None, expanded=None):
+    rows = parse_rows_parallel(input_file, workers, chunk_rows, cache)
+    if mirror:
+        with profiling.stage('mirror_images'):
+            rows, = image_mirror.mirror_rows(mirror, rows)
+    with profiling.stage('write_csv'):
+        save_to_csv(rows, output_file, ndjson)
+    if normalizer:
+        for row in rows:
+            normalizer.add_recipe(row)
+    if snapshot:
+        for row in rows:
+            snapshot.add_recipe(row)
+    if expanded:
+        for row in rows:
+            expanded.add_recipe(row)
+    return len(rows)
+
+def convert_file(input_file, output_file):
+    # Worker side of --inputs: one whole file per process, streamed to keep memory flat
+    return stream_html_file_to_csv(input_file, output_file)
+
+def convert_files(input_files, output_dir, workers):
+    # Convert many saved tables at once, writing <name>.csv for each into output_dir
+    os.makedirs(output_dir, exist_ok=True)
+    calls = [
+        (input_file, os.path.join(output_dir, os.path.splitext(os.path.basename(input_file))[0] + '.csv'))
+        for input_file in input_files
+    ]
+    return list(zip(calls, map_calls(convert_file, calls, workers, keep_generic_slots, (KEEP_GENERIC_SLOTS,))))
+
+def peak_rss_mib():
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak /= 1024
+    return peak / 1024
+
+def convert_html_file_to_csv(input_file, output_file, cache=None, normalizer=None, mirror=None, snapshot=None,
+                             fast=None, ndjson=None, expanded=None):
     # Read the HTML file
-    with open(input_file, 'r', encoding='utf-8') as f:
-        html_content = f.read()
+    with profiling.stage('read'):
+        with open(input_file, 'r', encoding='utf-8') as f:
+            html_content = f.read()
     
     # Parse and convert
-    rows = parse_table(html_content)
-    save_to_csv(rows, output_file)
+    rows = parse_table(html_content, cache, fast)
+    if mirror:
+        # Point recipe, type and ingredient images at the local copies
+        with profiling.stage('mirror_images'):
+            rows, = image_mirror.mirror_rows(mirror, rows)
+    with profiling.stage('write_csv'):
+        save_to_csv(rows, output_file, ndjson)
+    
+    if normalizer:
+        for row in rows:
+            normalizer.add_recipe(row)
+    if snapshot:
+        for row in rows:
+            snapshot.add_recipe(row)
+    if expanded:
+        for row in rows:
+            expanded.add_recipe(row)
 
 # Usage example
 if __name__ == "__main__":
-    import sys
+    parser = argparse.ArgumentParser(description='Convert the wiki recipe table to CSV.')
+    parser.add_argument('input_file', nargs='?', help='saved recipe table HTML')
+    parser.add_argument('output_file', nargs='?', help='CSV file to write, or NDJSON with --ndjson')
+    parser.add_argument('--stream', action='store_true',
+                        help='read the input incrementally and write each row as it is parsed')
+    parser.add_argument('--fast', action='store_true',
+                        help='read regular row markup without BeautifulSoup, falling back to it for any row '
+                             'the fast path cannot vouch for')
+    parser.add_argument('--chunk-size', type=int, default=STREAM_CHUNK_SIZE,
+                        help='bytes of input to read at a time in --stream mode')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='parse rows, or --inputs files, in this many processes')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                        help='rows handed to a worker at a time with --workers')
+    parser.add_argument('--inputs', nargs='+', metavar='FILE',
+                        help='convert several saved tables concurrently instead of input_file')
+    parser.add_argument('--output-dir', metavar='DIR',
+                        help='with --inputs, directory the CSV for each input is written to')
+    parser.add_argument('--cache', metavar='PATH',
+                        help='row cache file; unchanged rows are reused instead of re-parsed')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_MAX_ENTRIES,
+                        help='maximum number of rows kept in the cache')
+    parser.add_argument('--delta', metavar='PATH',
+                        help='write the rows added, changed and removed since the last cached run')
+    parser.add_argument('--normalized', metavar='PATH',
+                        help='also write recipes with ingredients, types and collections referenced by id')
+    parser.add_argument('--ingredients', metavar='PATH',
+                        help='ingredients.json whose category order fixes the ingredient ids in --normalized output')
+    parser.add_argument('--copy-dir', metavar='DIR',
+                        help='also write one Postgres COPY file per recipe table, plus a manifest, to DIR')
+    parser.add_argument('--sqlite', metavar='PATH',
+                        help='also write the recipe tables into an indexed SQLite catalog (see sqlite_catalog.py)')
+    parser.add_argument('--unresolved-report', metavar='PATH',
+                        help='write the recipe ingredient names missing from --ingredients, with counts, as JSON')
+    parser.add_argument('--snapshot', metavar='PATH',
+                        help='also write the recipes as a memory-mappable binary snapshot (see snapshot.py)')
+    parser.add_argument('--generic', action='store_true',
+                        help='keep generic "Any ..." ingredient slots instead of dropping them')
+    parser.add_argument('--expanded', metavar='PATH',
+                        help='with --generic and --ingredients, also write every recipe\'s ingredient slots expanded '
+                             'to the ingredients that can fill them (see category_index.py)')
+    html_backend.add_arguments(parser)
+    image_mirror.add_arguments(parser)
+    ndjson_io.add_arguments(parser)
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    html_backend.from_arguments(args)
+    ndjson = ndjson_io.from_arguments(parser, args)
+    
+    if args.profile:
+        profiling.enable(args.profile_row)
+    
+    if args.delta and not args.cache:
+        parser.error('--delta requires --cache')
+    if args.unresolved_report and not args.ingredients:
+        parser.error('--unresolved-report requires --ingredients')
+    if args.expanded and not (args.generic and args.ingredients):
+        parser.error('--expanded requires --generic and --ingredients')
+    if args.generic and args.cache:
+        parser.error('--generic rows differ from the cached ones and cannot be combined with --cache')
+    KEEP_GENERIC_SLOTS = args.generic
+    if args.fast and (args.workers > 1 or args.inputs):
+        parser.error('--fast cannot be combined with --workers or --inputs')
+    if args.inputs:
+        if not args.output_dir or args.input_file:
+            parser.error('--inputs takes --output-dir instead of input_file and output_file')
+        if (args.cache or args.normalized or args.copy_dir or args.sqlite or args.unresolved_report
+                or args.mirror_images or ndjson or args.expanded):
+            parser.error('--inputs converts each file on its own and cannot be combined with --cache, --normalized, '
+                         '--copy-dir, --sqlite, --unresolved-report, --mirror-images, --ndjson or --expanded')
+        for (input_file, output_file), count in convert_files(args.inputs, args.output_dir, args.workers):
+            print(f"{input_file}: wrote {count} rows to {output_file}")
+        sys.exit(0)
+    if not args.output_file:
+        parser.error('input_file and output_file are required unless --inputs is given')
+    if args.stream and args.workers > 1:
+        parser.error('--stream parses rows one at a time and cannot be combined with --workers')
+    if args.stream and args.mirror_images:
+        parser.error('--mirror-images needs every row before writing and cannot be combined with --stream')
+    mirror = image_mirror.from_arguments(args)
+    cache = RowCache(args.cache, args.cache_size) if args.cache else None
+    
+    normalizer = None
+    if args.normalized or args.copy_dir or args.sqlite or args.unresolved_report:
+        categories = load_ingredient_categories(args.ingredients) if args.ingredients else None
+        normalizer = RecipeNormalizer(categories)
+    
+    snapshot = SnapshotWriter() if args.snapshot else None
+    expanded = ExpandedRecipes(CategoryIndex(load_ingredient_categories(args.ingredients))) if args.expanded else None
+    fast = FastPathStats() if args.fast else None
+    
+    if args.stream:
+        count = stream_html_file_to_csv(args.input_file, args.output_file, args.chunk_size, cache, normalizer, snapshot,
+                                        fast, ndjson, expanded)
+        print(f"Wrote {count} rows, peak RSS {peak_rss_mib():.1f} MiB")
+    elif args.workers > 1:
+        count = parallel_html_file_to_csv(args.input_file, args.output_file, args.workers, args.chunk_rows, cache,
+                                          normalizer, mirror, snapshot, ndjson, expanded)
+        print(f"Wrote {count} rows using {args.workers} workers")
+    else:
+        convert_html_file_to_csv(args.input_file, args.output_file, cache, normalizer, mirror, snapshot, fast, ndjson,
+                                 expanded)
+    if fast:
+        print(fast.summary())
+    
+    if snapshot:
+        snapshot.write(args.snapshot)
+    if expanded:
+        expanded.save(args.expanded)
+        print_unresolved(expanded.index.category_names)
     
-    if len(sys.argv) != 3:
-        print("Usage: python script.py input.html output.csv")
-        sys.exit(1)
+    if args.normalized:
+        normalizer.save(args.normalized)
+    if args.copy_dir or args.sqlite:
+        tables = recipe_tables(normalizer.to_dict())
+        if args.copy_dir:
+            try:
+                write_tables(args.copy_dir, tables)
+            except ValueError as e:
+                sys.exit(f"Not writing COPY files to {args.copy_dir}: {e}")
+        if args.sqlite:
+            try:
+                with profiling.stage('write_sqlite'):
+                    counts = sqlite_catalog.write_tables(args.sqlite, tables)
+            except ValueError as e:
+                sys.exit(f"Not writing the recipe tables to {args.sqlite}: {e}")
+            print(f"Wrote {counts['recipes']} recipes to {args.sqlite}")
+    if normalizer and normalizer.ingredient_names:
+        print_unresolved(normalizer.ingredient_names)
+        if args.unresolved_report:
+            write_unresolved_report(args.unresolved_report, normalizer.ingredient_names)
     
-    input_file = sys.argv[1]
-    output_file = sys.argv[2]
+    if cache:
+        if args.delta:
+            cache.write_delta(args.delta, ['recipes'])
+        cache.save()
+        print(f"Row cache: {cache.hits} hits, {cache.misses} misses")
+        profiling.count('cache_hits', cache.hits)
+        profiling.count('cache_misses', cache.misses)
     
-    convert_html_file_to_csv(input_file, output_file)
\ No newline at end of file
+    if args.profile:
+        profiling.profiler.save(args.profile)
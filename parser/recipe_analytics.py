@@ -0,0 +1,318 @@
+"""Rank and group recipes with NumPy columns instead of loops over row dicts.
+
+Recipes are loaded once into columns: stars, energy and sell price as float
+arrays (NaN where the wiki left a value out), collection and type as integer
+codes, and ingredient use as a sparse recipe x ingredient matrix kept as
+(recipe, ingredient) index pairs. Rankings, group-bys and top-k selections
+are then whole-array operations:
+
+    columns = RecipeColumns(load_recipes_csv('recipes.csv'), load_ingredient_categories('ingredients.json'))
+    columns.top_k('sell_price_per_ingredient', 10)
+    columns.best_per('collection', 'energy_per_star')
+    columns.score_batch({'sell_price': 1.0, 'energy': 0.2}, ...)
+
+NumPy is only needed for this module, not for the parsers.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from typing import Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError as e:
+    raise ImportError('recipe_analytics needs numpy (pip install numpy); the parsers do not') from e
+
+from normalize import load_ingredient_categories
+from recipe_query import load_recipes_csv, resolved_ingredients
+
+# Per-recipe values that can be ranked, combined in weightings or grouped on
+FEATURES = ['stars', 'energy', 'sell_price', 'ingredient_slots',
+            'sell_price_per_ingredient', 'energy_per_ingredient', 'energy_per_star', 'sell_price_per_star']
+
+def _codes(values: List[str]):
+    # Integer code per value, plus the distinct values in first-seen order
+    names: Dict[str, int] = {}
+    codes = np.fromiter((names.setdefault(value, len(names)) for value in values), dtype=np.int32, count=len(values))
+    return codes, list(names)
+
+def _top_indexes(values: np.ndarray, k: int, mask: Optional[np.ndarray] = None) -> np.ndarray:
+    # Indexes of the k largest values, descending, ties by index; NaN never ranks
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.flatnonzero(~np.isnan(values) & (True if mask is None else mask))
+    if len(candidates) > k:
+        # Only the k largest need sorting; partition finds the cut-off in linear time
+        kth = np.partition(values[candidates], len(candidates) - k)[len(candidates) - k]
+        candidates = candidates[values[candidates] >= kth]
+    return candidates[np.lexsort((candidates, -values[candidates]))][:k]
+
+class RecipeColumns:
+    """Columnar copy of a recipe catalog for vectorized ranking and grouping."""
+
+    def __init__(self, recipes: List[dict], categories: Optional[Dict[str, dict]] = None):
+        """categories come from ingredients.json; generic slots are resolved with them, see resolved_ingredients."""
+        self.recipes = recipes
+        self.names = [recipe['name'] for recipe in recipes]
+        self.columns: Dict[str, np.ndarray] = {
+            field: np.array([np.nan if recipe[field] is None else recipe[field] for recipe in recipes], dtype=float)
+            for field in ('stars', 'energy', 'sell_price')
+        }
+        self.collection, self.collections = _codes([recipe['collection'] for recipe in recipes])
+        self.type, self.types = _codes([recipe['type']['name'] for recipe in recipes])
+
+        # Ingredient use as (recipe, ingredient) pairs; an optional group's options all count as used
+        self.ingredient_ids: Dict[str, int] = {}
+        pair_recipes, pair_ingredients = [], []
+        slots = np.zeros(len(recipes), dtype=float)
+        for position, ingredients in enumerate(resolved_ingredients(recipes, categories)):
+            for entry in ingredients:
+                slots[position] += 1  # each required ingredient or optional group takes one slot
+                for ingredient in (entry if isinstance(entry, list) else [entry]):
+                    pair_recipes.append(position)
+                    pair_ingredients.append(self.ingredient_ids.setdefault(ingredient['name'], len(self.ingredient_ids)))
+        self.pair_recipe = np.array(pair_recipes, dtype=np.int64)
+        self.pair_ingredient = np.array(pair_ingredients, dtype=np.int64)
+        self.columns['ingredient_slots'] = slots
+
+        # Ingredient -> category code, -1 when ingredients.json doesn't list it
+        self.categories = list(categories or {})
+        self.ingredient_category = np.full(len(self.ingredient_ids), -1, dtype=np.int64)
+        for code, data in enumerate((categories or {}).values()):
+            for name in data['ingredients']:
+                id = self.ingredient_ids.get(name)
+                if id is not None and self.ingredient_category[id] < 0:
+                    self.ingredient_category[id] = code
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            per_slot = np.where(slots > 0, slots, np.nan)
+            stars = np.where(self.columns['stars'] > 0, self.columns['stars'], np.nan)
+            self.columns['sell_price_per_ingredient'] = self.columns['sell_price'] / per_slot
+            self.columns['energy_per_ingredient'] = self.columns['energy'] / per_slot
+            self.columns['energy_per_star'] = self.columns['energy'] / stars
+            self.columns['sell_price_per_star'] = self.columns['sell_price'] / stars
+
+    def __len__(self) -> int:
+        return len(self.recipes)
+
+    def feature_matrix(self, features: Sequence[str] = FEATURES) -> np.ndarray:
+        """Recipes x features, with missing values as NaN."""
+        return np.column_stack([self.columns[feature] for feature in features])
+
+    def using_mask(self, ingredient: str) -> np.ndarray:
+        """Boolean mask of the recipes that use an ingredient in any way."""
+        mask = np.zeros(len(self), dtype=bool)
+        id = self.ingredient_ids.get(ingredient)
+        if id is not None:
+            mask[self.pair_recipe[self.pair_ingredient == id]] = True
+        return mask
+
+    def top_k(self, feature: str, k: int = 10, mask: Optional[np.ndarray] = None) -> List[tuple]:
+        """The k best (name, value) pairs by a feature, among mask if given."""
+        values = self.columns[feature]
+        return [(self.names[i], float(values[i])) for i in _top_indexes(values, k, mask)]
+
+    def _best_of_groups(self, groups: np.ndarray, positions: np.ndarray, values: np.ndarray) -> Dict[int, int]:
+        # For (group, recipe position) pairs with positions ascending, the best position per group.
+        # There are only a handful of groups, so one masked argmax each beats sorting every pair.
+        values = np.nan_to_num(values[positions], nan=-np.inf)
+        best = {}
+        for group in np.unique(groups):
+            in_group = np.flatnonzero(groups == group)
+            i = in_group[np.argmax(values[in_group])]
+            if values[i] > -np.inf:
+                best[int(group)] = int(positions[i])
+        return best
+
+    def best_per(self, by: str, feature: str) -> Dict[str, tuple]:
+        """Best (name, value) by a feature for each collection, type or ingredient category.
+
+        A recipe counts toward every category any of its ingredients belongs to.
+        """
+        values = self.columns[feature]
+        if by in ('collection', 'type'):
+            labels = self.collections if by == 'collection' else self.types
+            best = self._best_of_groups(getattr(self, by), np.arange(len(self)), values)
+        elif by == 'category':
+            labels = self.categories
+            categories = self.ingredient_category[self.pair_ingredient]
+            known = categories >= 0
+            pairs = np.unique(np.column_stack([categories[known], self.pair_recipe[known]]), axis=0)
+            best = self._best_of_groups(pairs[:, 0], pairs[:, 1], values) if len(pairs) else {}
+        else:
+            raise ValueError(f'cannot group by {by!r}; use collection, type or category')
+        return {labels[group]: (self.names[i], float(values[i])) for group, i in sorted(best.items())}
+
+    def score_batch(self, *weightings: Dict[str, float], features: Sequence[str] = FEATURES) -> np.ndarray:
+        """Recipes x weightings matrix of weighted feature sums; missing features count as 0.
+
+        Raises ValueError for a weighting naming a feature that isn't one of features.
+        """
+        unknown = sorted({feature for weighting in weightings for feature in weighting} - set(features))
+        if unknown:
+            raise ValueError(f"unknown feature {', '.join(unknown)}; use {', '.join(features)}")
+        weights = np.array([[weighting.get(feature, 0.0) for feature in features] for weighting in weightings])
+        return np.nan_to_num(self.feature_matrix(features), nan=0.0) @ weights.T
+
+    def top_k_batch(self, weightings: Sequence[Dict[str, float]], k: int = 10) -> List[List[tuple]]:
+        """top_k for each weighting, all scored in one matrix product."""
+        scores = self.score_batch(*weightings)
+        results = []
+        for column in range(scores.shape[1]):
+            values = scores[:, column]
+            results.append([(self.names[i], float(values[i])) for i in _top_indexes(values, k)])
+        return results
+
+def _python_feature(recipe: dict, feature: str) -> Optional[float]:
+    # Plain-Python version of the columns, for checking and benchmarking
+    slots = len(recipe['ingredients'])
+    stars, energy, sell_price = recipe['stars'], recipe['energy'], recipe['sell_price']
+    if feature == 'ingredient_slots':
+        return float(slots)
+    if feature in ('stars', 'energy', 'sell_price'):
+        return None if recipe[feature] is None else float(recipe[feature])
+    numerator = sell_price if feature.startswith('sell_price') else energy
+    denominator = slots if feature.endswith('ingredient') else stars
+    if numerator is None or not denominator:
+        return None
+    return numerator / denominator
+
+def python_top_k(recipes: List[dict], feature: str, k: int = 10) -> List[tuple]:
+    scored = [(i, _python_feature(recipe, feature)) for i, recipe in enumerate(recipes)]
+    scored = sorted(((i, value) for i, value in scored if value is not None), key=lambda item: (-item[1], item[0]))
+    return [(recipes[i]['name'], value) for i, value in scored[:k]]
+
+def python_best_per_collection(recipes: List[dict], feature: str) -> Dict[str, tuple]:
+    best: Dict[str, tuple] = {}
+    for recipe in recipes:
+        value = _python_feature(recipe, feature)
+        if value is not None and (recipe['collection'] not in best or value > best[recipe['collection']][1]):
+            best[recipe['collection']] = (recipe['name'], value)
+    return best
+
+def python_top_k_batch(recipes: List[dict], weightings: Sequence[Dict[str, float]], k: int = 10) -> List[List[tuple]]:
+    results = []
+    for weighting in weightings:
+        scores = []
+        for i, recipe in enumerate(recipes):
+            score = 0.0
+            for feature, weight in weighting.items():
+                value = _python_feature(recipe, feature)
+                score += weight * (value or 0.0)
+            scores.append((i, score))
+        scores.sort(key=lambda item: (-item[1], item[0]))
+        results.append([(recipes[i]['name'], score) for i, score in scores[:k]])
+    return results
+
+def synthetic_recipes(count: int, ingredients: int = 400, seed: int = 0) -> List[dict]:
+    """A random catalog shaped like the parser output, for benchmarking."""
+    rng = random.Random(seed)
+    names = [f'Ingredient {i}' for i in range(ingredients)]
+    recipes = []
+    for i in range(count):
+        entries = [{'name': name, 'image_url': None} for name in rng.sample(names, rng.randint(1, 5))]
+        if rng.random() < 0.3:
+            entries.insert(0, [{'name': name, 'image_url': None} for name in rng.sample(names, 3)])
+        recipes.append({
+            'image_url': None,
+            'name': f'Recipe {i}',
+            'type': {'name': rng.choice(['Appetizers', 'Entrées', 'Desserts']), 'image_url': None},
+            'stars': rng.randint(1, 5),
+            'energy': rng.randint(100, 9000) if rng.random() > 0.02 else None,
+            'sell_price': rng.randint(10, 2000),
+            'ingredients': entries,
+            'collection': rng.choice(['Base Game', 'A Rift in Time', 'The Storybook Vale', 'Eternity Isle']),
+        })
+    return recipes
+
+BENCHMARK_WEIGHTINGS = [
+    {'sell_price': 1.0},
+    {'energy': 1.0, 'stars': -50.0},
+    {'sell_price_per_ingredient': 1.0, 'energy_per_ingredient': 0.1},
+    {'sell_price_per_star': 2.0, 'energy_per_star': 0.5, 'ingredient_slots': -10.0},
+]
+
+def benchmark(recipes: List[dict], k: int = 10) -> dict:
+    def timed(func, repeat: int = 1):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            seconds = time.perf_counter() - started
+            best = seconds if best is None else min(best, seconds)
+        return result, best
+
+    columns, load_time = timed(lambda: RecipeColumns(recipes))
+    cases = {
+        'top_k': (lambda: columns.top_k('sell_price_per_ingredient', k),
+                  lambda: python_top_k(recipes, 'sell_price_per_ingredient', k)),
+        'best_per_collection': (lambda: columns.best_per('collection', 'energy_per_star'),
+                                lambda: python_best_per_collection(recipes, 'energy_per_star')),
+        'top_k_batch': (lambda: columns.top_k_batch(BENCHMARK_WEIGHTINGS, k),
+                        lambda: python_top_k_batch(recipes, BENCHMARK_WEIGHTINGS, k)),
+    }
+    report = {'recipes': len(recipes), 'load_seconds': load_time}
+    for case, (vectorized, loop) in cases.items():
+        vectorized_result, vectorized_time = timed(vectorized, 3)
+        loop_result, loop_time = timed(loop, 3)
+        if case == 'best_per_collection':
+            loop_result = dict(sorted(loop_result.items(), key=lambda item: columns.collections.index(item[0])))
+        # Allow for float rounding between the matrix product and the loop
+        assert [name for name, _ in _flatten(vectorized_result)] == [name for name, _ in _flatten(loop_result)], \
+            f'{case}: vectorized and loop results disagree'
+        report[case] = {
+            'numpy_ms': vectorized_time * 1e3,
+            'python_ms': loop_time * 1e3,
+            'speedup': loop_time / vectorized_time if vectorized_time else None,
+        }
+    return report
+
+def _flatten(result) -> List[tuple]:
+    if isinstance(result, dict):
+        return list(result.values())
+    if result and isinstance(result[0], list):
+        return [item for items in result for item in items]
+    return result
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rank and group recipes by value.')
+    parser.add_argument('recipes_csv', nargs='?', help='CSV written by recipe-table-parser.py')
+    parser.add_argument('--ingredients', metavar='PATH',
+                        help='ingredients.json, needed for --best-per category and for a CSV written with --generic')
+    parser.add_argument('--top', type=int, default=10, help='how many recipes to list')
+    parser.add_argument('--feature', default='sell_price_per_ingredient', choices=FEATURES)
+    parser.add_argument('--best-per', choices=['collection', 'type', 'category'],
+                        help='list the best recipe by --feature in each group instead')
+    parser.add_argument('--weights', metavar='JSON',
+                        help='rank by a weighted sum of features instead, e.g. \'{"sell_price": 1, "energy": 0.2}\'')
+    parser.add_argument('--benchmark', type=int, nargs='+', metavar='RECIPES',
+                        help='compare against plain-Python loops on synthetic catalogs of these sizes')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        print(json.dumps([benchmark(synthetic_recipes(size), args.top) for size in args.benchmark], indent=2))
+    else:
+        if not args.recipes_csv:
+            parser.error('recipes_csv is required unless --benchmark is given')
+        categories = load_ingredient_categories(args.ingredients) if args.ingredients else None
+        try:
+            columns = RecipeColumns(load_recipes_csv(args.recipes_csv), categories)
+        except ValueError as e:
+            sys.exit(f"Cannot rank {args.recipes_csv}: {e}")
+        if args.best_per:
+            if args.best_per == 'category' and not categories:
+                parser.error('--best-per category requires --ingredients')
+            for group, (name, value) in columns.best_per(args.best_per, args.feature).items():
+                print(f"{group}: {name} ({value:g})")
+        else:
+            if args.weights:
+                try:
+                    ranked, = columns.top_k_batch([json.loads(args.weights)], args.top)
+                except ValueError as e:
+                    parser.error(f"--weights: {e}")
+            else:
+                ranked = columns.top_k(args.feature, args.top)
+            for name, value in ranked:
+                print(f"{name} ({value:g})")
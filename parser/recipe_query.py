@@ -0,0 +1,171 @@
+"""Answer "what can I cook with this inventory" from the parsed recipes."""
+import argparse
+import csv
+import json
+import sys
+from typing import Dict, Iterable, List, Optional
+
+from entity_resolution import is_generic
+from normalize import load_ingredient_categories
+
+def load_recipes_csv(path: str) -> List[dict]:
+    """Load the CSV written by recipe-table-parser.py back into parsed rows."""
+    rows = []
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            row['type'] = json.loads(row['type'])
+            row['ingredients'] = json.loads(row['ingredients'])
+            for field in ('stars', 'energy', 'sell_price'):
+                row[field] = int(row[field]) if row[field] else None
+            rows.append(row)
+    return rows
+
+def resolved_ingredients(recipes: List[dict], categories: Optional[Dict[str, dict]] = None) -> List[list]:
+    """Each recipe's ingredient list, with generic "Any ..." slots as option lists of the ingredients filling them.
+
+    Only recipes parsed with --generic have such slots; resolving them takes the
+    categories of ingredients.json. Raises ValueError when they are missing or
+    a slot names no category in them, rather than treating "Any Fruit" as an
+    ingredient nobody holds.
+    """
+    ingredient_lists = [recipe['ingredients'] for recipe in recipes]
+    generic = sorted({
+        option['name'] for ingredients in ingredient_lists for entry in ingredients
+        for option in (entry if isinstance(entry, list) else [entry]) if is_generic(option['name'])
+    })
+    if not generic:
+        return ingredient_lists
+    if categories is None:
+        raise ValueError(f"the recipes have generic slots ({', '.join(generic)}); "
+                         f"pass the ingredients.json they are resolved against")
+    # category_index reads recipe CSVs with this module, so it is imported only when needed
+    from category_index import CategoryIndex
+    index = CategoryIndex(categories)
+    expanded = [index.expand_slots(ingredients) for ingredients in ingredient_lists]
+    if index.category_names.unresolved:
+        raise ValueError(f"generic slots name no category of the ingredients: "
+                         f"{', '.join(sorted(index.category_names.unresolved))}")
+    return expanded
+
+def _bits(mask: int) -> Iterable[int]:
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+class RecipeIndex:
+    """Bitset index over a recipe catalog.
+
+    Every recipe is a bit position. For each ingredient the index keeps the
+    set of recipes that need it outright and the set of recipes it can fill an
+    optional group for, so a query is a handful of integer ORs over the
+    ingredients rather than a scan of every recipe's ingredient list.
+    """
+
+    def __init__(self, recipes: List[dict], categories: Optional[Dict[str, dict]] = None):
+        """categories, from ingredients.json, resolve generic slots; see resolved_ingredients."""
+        self.recipes = recipes
+        self.ingredient_ids: Dict[str, int] = {}
+        self._mandatory_users: List[int] = []  # ingredient -> recipes needing it
+        self._option_users: List[int] = []  # ingredient -> recipes it fills the optional group of
+        self._users: List[int] = []  # ingredient -> recipes using it in any way
+        self._with_group = 0  # recipes with one optional group
+        # parse_ingredients produces at most one optional group per recipe; any
+        # recipe with more keeps the option names of each group for a direct check
+        self._multi_group: Dict[int, List[set]] = {}
+        self._all = (1 << len(recipes)) - 1
+
+        for position, ingredients in enumerate(resolved_ingredients(recipes, categories)):
+            bit = 1 << position
+            groups = [entry for entry in ingredients if isinstance(entry, list)]
+            if len(groups) == 1:
+                self._with_group |= bit
+            elif len(groups) > 1:
+                self._multi_group[position] = [{option['name'] for option in group} for group in groups]
+            for entry in ingredients:
+                if isinstance(entry, list):
+                    for option in entry:
+                        id = self._ingredient_id(option['name'])
+                        if len(groups) == 1:
+                            self._option_users[id] |= bit
+                        self._users[id] |= bit
+                else:
+                    id = self._ingredient_id(entry['name'])
+                    self._mandatory_users[id] |= bit
+                    self._users[id] |= bit
+
+    def _ingredient_id(self, name: str) -> int:
+        id = self.ingredient_ids.get(name)
+        if id is None:
+            id = self.ingredient_ids[name] = len(self._users)
+            self._mandatory_users.append(0)
+            self._option_users.append(0)
+            self._users.append(0)
+        return id
+
+    def recipes_using(self, ingredient: str) -> List[dict]:
+        """Recipes that use an ingredient, either outright or as one of the options."""
+        id = self.ingredient_ids.get(ingredient)
+        if id is None:
+            return []
+        return [self.recipes[position] for position in _bits(self._users[id])]
+
+    def cookable_mask(self, inventory: Iterable[str]) -> int:
+        """Bitset of the recipes that can be made from the inventory."""
+        inventory = set(inventory)
+        have = {self.ingredient_ids[name] for name in inventory if name in self.ingredient_ids}
+
+        blocked = 0
+        for id, users in enumerate(self._mandatory_users):
+            if id not in have:
+                blocked |= users
+        group_filled = 0
+        for id in have:
+            group_filled |= self._option_users[id]
+
+        mask = self._all & ~blocked & ~(self._with_group & ~group_filled)
+        for position, groups in self._multi_group.items():
+            if not all(group & inventory for group in groups):
+                mask &= ~(1 << position)
+        return mask
+
+    def cookable(self, inventory: Iterable[str], min_stars: Optional[int] = None, max_stars: Optional[int] = None,
+                 min_energy: Optional[int] = None, min_sell_price: Optional[int] = None) -> List[dict]:
+        """Recipes that can be made from the inventory, optionally filtered."""
+        results = []
+        for position in _bits(self.cookable_mask(inventory)):
+            recipe = self.recipes[position]
+            if min_stars is not None and (recipe['stars'] is None or recipe['stars'] < min_stars):
+                continue
+            if max_stars is not None and (recipe['stars'] is None or recipe['stars'] > max_stars):
+                continue
+            if min_energy is not None and (recipe['energy'] is None or recipe['energy'] < min_energy):
+                continue
+            if min_sell_price is not None and (recipe['sell_price'] is None or recipe['sell_price'] < min_sell_price):
+                continue
+            results.append(recipe)
+        return results
+
+    def cookable_batch(self, inventories: Iterable[Iterable[str]], **filters) -> List[List[dict]]:
+        """Run cookable() for many inventories at once."""
+        return [self.cookable(inventory, **filters) for inventory in inventories]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='List the recipes that can be cooked from an inventory.')
+    parser.add_argument('recipes_csv', help='CSV written by recipe-table-parser.py')
+    parser.add_argument('ingredients', nargs='+', help='ingredient names in the inventory')
+    parser.add_argument('--min-stars', type=int)
+    parser.add_argument('--max-stars', type=int)
+    parser.add_argument('--min-energy', type=int)
+    parser.add_argument('--min-sell-price', type=int)
+    parser.add_argument('--ingredients', metavar='PATH', dest='ingredients_file',
+                        help='ingredients.json, to resolve the "Any ..." slots of a CSV written with --generic')
+    args = parser.parse_args()
+
+    categories = load_ingredient_categories(args.ingredients_file) if args.ingredients_file else None
+    try:
+        index = RecipeIndex(load_recipes_csv(args.recipes_csv), categories)
+    except ValueError as e:
+        sys.exit(f"Cannot index {args.recipes_csv}: {e}")
+    for recipe in index.cookable(args.ingredients, args.min_stars, args.max_stars, args.min_energy, args.min_sell_price):
+        print(f"{recipe['name']} ({recipe['stars']} stars, {recipe['energy']} energy, {recipe['sell_price']} sell price)")
@@ -0,0 +1,133 @@
+"""Compact records for parsed rows, with repeated values stored once.
+
+A recipe row used to be a dict, with a new dict and new copies of the name
+and URL strings for every ingredient and type it mentions, although a
+catalog only has a few hundred of those. Rows are now slotted records, and
+the small name/image pairs are shared: image_ref returns the same ImageRef
+for the same name and URL, with both strings interned.
+
+Records are read-only Mappings, so code reading rows by key works on them
+and on the plain dicts a row cache file hands back alike. They become dicts
+only where they are serialized:
+
+    json.dumps(row, default=to_json)
+"""
+from collections.abc import Mapping
+import sys
+from typing import Dict, Optional, Tuple
+
+def intern_text(value: Optional[str]) -> Optional[str]:
+    """The one shared copy of a repeated string; str() first, since subclasses like bs4's can't be interned."""
+    return None if value is None else sys.intern(str(value))
+
+class Record(Mapping):
+    """A row with fixed fields, read like the dict it replaces.
+
+    Subclasses list their fields in __slots__, in the key order of the dict.
+    Records may be shared between rows, so they are never changed once built.
+    """
+
+    __slots__ = ()
+    _fields = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._fields = frozenset(cls.__slots__)
+
+    def __init__(self, *values):
+        for field, value in zip(self.__slots__, values):
+            setattr(self, field, value)
+
+    def __getitem__(self, key):
+        if key not in self._fields:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self.__slots__)
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def to_dict(self) -> dict:
+        """The dict this record stands for; nested records are left as they are."""
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.to_dict()!r})'
+
+def to_json(value):
+    """json.dumps default= hook that writes records as the dicts they stand for."""
+    if isinstance(value, Record):
+        return value.to_dict()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+class ImageRef(Record):
+    """A name with its image: a recipe ingredient or type, or a location. Build them with image_ref."""
+
+    __slots__ = ('name', 'image_url')
+
+    def __reduce__(self):
+        # Unpickled in another process (pool workers), refs are shared again there
+        return image_ref, (self.name, self.image_url)
+
+class Named(Record):
+    """Just a name, as critter favorite and liked foods are listed. Build them with named."""
+
+    __slots__ = ('name',)
+
+    def __reduce__(self):
+        return named, (self.name,)
+
+class Reward(Record):
+    """A quantity of an item a critter gives. Build them with reward."""
+
+    __slots__ = ('quantity', 'item')
+
+    def __reduce__(self):
+        return reward, (self.quantity, self.item)
+
+class Recipe(Record):
+    __slots__ = ('image_url', 'name', 'type', 'stars', 'energy', 'sell_price', 'ingredients', 'collection')
+
+class CritterType(Record):
+    __slots__ = ('name', 'location', 'fav_food', 'liked_food', 'fav_food_reward', 'liked_food_reward')
+
+class Critter(Record):
+    __slots__ = ('image_url', 'name', 'type', 'location', 'schedule')
+
+# Shared records by their values. They only grow with the distinct ingredients, types, locations
+# and rewards of a catalog, not with its rows
+_image_refs: Dict[Tuple, ImageRef] = {}
+_names: Dict[str, Named] = {}
+_rewards: Dict[Tuple, Reward] = {}
+
+def image_ref(name: str, image_url: Optional[str]) -> ImageRef:
+    key = (name, image_url)
+    ref = _image_refs.get(key)
+    if ref is None:
+        ref = _image_refs[key] = ImageRef(intern_text(name), intern_text(image_url))
+    return ref
+
+def named(name: str) -> Named:
+    ref = _names.get(name)
+    if ref is None:
+        ref = _names[name] = Named(intern_text(name))
+    return ref
+
+def reward(quantity: Optional[str], item: Optional[str]) -> Reward:
+    key = (quantity, item)
+    ref = _rewards.get(key)
+    if ref is None:
+        ref = _rewards[key] = Reward(intern_text(quantity), intern_text(item))
+    return ref
+
+# Shared records are rebuilt through the function that shares them
+_FACTORIES = {ImageRef: image_ref, Named: named, Reward: reward}
+
+def replaced(row: Mapping, **changes) -> Mapping:
+    """A copy of a row with some fields changed; records stay records, cached dicts stay dicts."""
+    if isinstance(row, Record):
+        values = [changes.get(field, getattr(row, field)) for field in row.__slots__]
+        return _FACTORIES.get(type(row), type(row))(*values)
+    return {**row, **changes}
@@ -0,0 +1,128 @@
+"""Persistent cache of parsed table rows, keyed by a hash of each row's raw HTML."""
+from collections import OrderedDict
+import hashlib
+import json
+import os
+from typing import Optional
+
+from records import to_json
+
+# Bump whenever the shape of a parsed row changes so stale entries are dropped
+CACHE_VERSION = 3
+DEFAULT_MAX_ENTRIES = 50000
+
+class RowCache:
+    """LRU cache of parsed rows that survives between runs.
+
+    Besides the rows themselves, the cache remembers which row (by name) had
+    which hash in the previous run of each table so a delta can be written.
+    A name listed more than once is told apart by its order among the rows
+    of that name, so each copy is compared with its own earlier version.
+    With no path the cache is kept in memory only, for long-running processes.
+    """
+
+    def __init__(self, path: Optional[str], max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()  # least recently used first
+        self._previous_index: dict = {}
+        self._index: dict = {}
+        self._name_counts: dict = {}
+        self._load()
+
+    def _load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != CACHE_VERSION:
+            return
+        self._entries = OrderedDict(data['entries'])
+        self._previous_index = data.get('index', {})
+
+    @staticmethod
+    def key(table: str, raw_html: str) -> str:
+        """Hash a row's raw HTML, namespaced by the table it came from."""
+        return hashlib.sha256(f'{table}\0{raw_html}'.encode('utf-8')).hexdigest()
+
+    def lookup(self, table: str, raw_html: str, parse):
+        """Return (key, parsed row), calling parse() only when the row is not cached."""
+        key = self.key(table, raw_html)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return key, self._entries[key]
+
+        self.misses += 1
+        value = parse()
+        self._entries[key] = value
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return key, value
+
+    def lookup_many(self, table: str, raw_htmls, parse_many):
+        """Return (keys, parsed rows) for a batch, calling parse_many(uncached rows) once."""
+        keys = [self.key(table, raw_html) for raw_html in raw_htmls]
+        missing = {}
+        for key, raw_html in zip(keys, raw_htmls):
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            elif key in missing:
+                # A repeat of a row earlier in the batch counts as a hit, as it would one at a time
+                self.hits += 1
+            else:
+                missing[key] = raw_html
+                self.misses += 1
+
+        parsed = dict(zip(missing, parse_many(list(missing.values())))) if missing else {}
+        values = [parsed[key] if key in parsed else self._entries[key] for key in keys]
+        for key, value in parsed.items():
+            self._entries[key] = value
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return keys, values
+
+    def begin_run(self, table: str):
+        """Forget the rows recorded for a table, before recording another pass over it in the same process."""
+        self._index.pop(table, None)
+        self._name_counts.pop(table, None)
+
+    def record(self, table: str, name: str, key: str):
+        """Remember that the row called name hashed to key in this run."""
+        counts = self._name_counts.setdefault(table, {})
+        count = counts[name] = counts.get(name, 0) + 1
+        self._index.setdefault(table, {})[name if count == 1 else f'{name}\0{count}'] = key
+
+    def delta(self, table: str) -> dict:
+        """Compare this run's rows of a table against the previous run.
+
+        Rows already evicted again (a table larger than the cache) are left out of added and changed.
+        """
+        previous = self._previous_index.get(table, {})
+        current = self._index.get(table, {})
+        added = [current[name] for name in current if name not in previous]
+        changed = [current[name] for name in current if name in previous and previous[name] != current[name]]
+        removed = [name.split('\0')[0] for name in previous if name not in current]
+        return {
+            'added': [self._entries[key] for key in added if key in self._entries],
+            'changed': [self._entries[key] for key in changed if key in self._entries],
+            'removed': removed,
+        }
+
+    def write_delta(self, path: str, tables):
+        """Write the delta of each table to a JSON file."""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({table: self.delta(table) for table in tables}, f, indent=2, ensure_ascii=False, default=to_json)
+
+    def save(self):
+        """Write the cache back to disk, replacing the old file atomically."""
+        index = dict(self._previous_index)
+        index.update(self._index)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': CACHE_VERSION, 'entries': self._entries, 'index': index}, f, ensure_ascii=False,
+                      default=to_json)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,149 @@
+"""Declarative column specs compiled into a single traversal per table row.
+
+A table is described as a list of columns, each naming the elements it needs
+from its cell. RowSpec.extract walks the row once and hands back one Found per
+cell, so the parsers read their fields from it instead of calling find and
+find_all on the same cell over and over:
+
+    ROW = RowSpec([
+        Column(Select('image', 'img', first=True)),
+        Column(text=True),
+    ])
+    cells = ROW.extract(tr)
+    img = cells[0].first('image').tag
+    name = cells[1].stripped_text()
+
+Matching follows find/find_all: descendants at any depth, in document order,
+and text is gathered the way get_text gathers it.
+"""
+from typing import Dict, List, Optional, Sequence, Union
+
+from bs4.element import CData, NavigableString, Tag
+
+# The string types get_text counts; comments, doctypes and script text are skipped. Plain str is
+# the text of the light trees fast_extract builds, which are walked like bs4 trees
+_TEXT_TYPES = (NavigableString, CData, str)
+
+class Found:
+    """An element gathered during a row walk, with the elements found inside it."""
+
+    __slots__ = ('tag', 'strings', 'found')
+
+    def __init__(self, tag: Tag, keep_text: bool):
+        self.tag = tag
+        self.strings: Optional[List[str]] = [] if keep_text else None
+        self.found: Dict[str, List['Found']] = {}
+
+    def first(self, key: str) -> Optional['Found']:
+        """Like find: the first element gathered under key, or None."""
+        matches = self.found.get(key)
+        return matches[0] if matches else None
+
+    def all(self, key: str) -> List['Found']:
+        """Like find_all: every element gathered under key."""
+        return self.found.get(key, [])
+
+    def text(self) -> str:
+        """Same as tag.get_text(); needs text=True in the spec."""
+        return ''.join(self.strings)
+
+    def stripped_text(self) -> str:
+        """Same as tag.get_text(strip=True); needs text=True in the spec."""
+        return ''.join([text for text in (string.strip() for string in self.strings) if text])
+
+class Select:
+    """Descendants to gather by tag name and optionally id or class, stored under key.
+
+    first keeps only the first match, text gathers each match's strings and
+    nested selects are gathered inside each match.
+    """
+
+    def __init__(self, key: str, name: str, id: Optional[str] = None, class_: Optional[str] = None,
+                 first: bool = False, text: bool = False, nested: Sequence['Select'] = ()):
+        self.key = key
+        self.name = name
+        self.id = id
+        self.class_ = class_
+        self.first = first
+        self.text = text
+        self.nested = tuple(nested)
+
+    def matches(self, tag: Tag) -> bool:
+        if tag.name != self.name:
+            return False
+        if self.id is not None and tag.get('id') != self.id:
+            return False
+        if self.class_ is not None and self.class_ not in tag.get('class', ()):
+            return False
+        return True
+
+class Column:
+    """What to gather from one cell: the listed selects, plus its text if text is set."""
+
+    def __init__(self, *selects: Select, text: bool = False):
+        self.selects = selects
+        self.text = text
+
+_EMPTY_COLUMN = Column()
+
+class RowSpec:
+    """Columns of a table, by position, compiled into one walk per row.
+
+    Cells are gathered like row.find_all(cell), so nested cells are counted
+    too. Cells past the listed columns use rest, or gather nothing.
+    """
+
+    def __init__(self, columns: Sequence[Column], rest: Optional[Column] = None,
+                 cell: Union[str, Sequence[str]] = 'td'):
+        self.columns = list(columns)
+        self.rest = rest or _EMPTY_COLUMN
+        self.cell_names = frozenset([cell] if isinstance(cell, str) else cell)
+        # Per-column watcher lists are built once here rather than on every row
+        self._column_selects = [column.selects for column in self.columns]
+        self._rest_selects = self.rest.selects
+
+    def extract(self, row: Tag) -> List[Found]:
+        """Walk row once and return a Found for each cell."""
+        cells: List[Found] = []
+        self._walk(row, cells, (), ())
+        return cells
+
+    def _walk(self, node: Tag, cells: List[Found], watchers: tuple, collectors: tuple):
+        for child in node.contents:
+            if isinstance(child, str):
+                if collectors and type(child) in _TEXT_TYPES:
+                    for strings in collectors:
+                        strings.append(child)
+                continue
+
+            child_watchers = watchers
+            child_collectors = collectors
+            if child.name in self.cell_names:
+                index = len(cells)
+                if index < len(self.columns):
+                    column, selects = self.columns[index], self._column_selects[index]
+                else:
+                    column, selects = self.rest, self._rest_selects
+                cell = Found(child, column.text)
+                cells.append(cell)
+                child_watchers = child_watchers + tuple((select, cell) for select in selects)
+                if column.text:
+                    child_collectors = child_collectors + (cell.strings,)
+
+            for select, owner in watchers:
+                if not select.matches(child):
+                    continue
+                matches = owner.found.get(select.key)
+                if matches is None:
+                    matches = owner.found[select.key] = []
+                elif select.first:
+                    continue
+                found = Found(child, select.text)
+                matches.append(found)
+                if select.nested:
+                    child_watchers = child_watchers + tuple((nested, found) for nested in select.nested)
+                if select.text:
+                    child_collectors = child_collectors + (found.strings,)
+
+            if child.contents:
+                self._walk(child, cells, child_watchers, child_collectors)
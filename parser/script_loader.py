@@ -0,0 +1,23 @@
+"""Import the hyphen-named parser scripts as modules."""
+import importlib.util
+import os
+import sys
+
+PARSER_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def load_script(file_name: str):
+    """Import a script in this directory by file name, e.g. 'recipe-table-parser.py'."""
+    module_name = os.path.splitext(file_name)[0].replace('-', '_')
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(PARSER_DIR, file_name))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def recipe_parser():
+    return load_script('recipe-table-parser.py')
+
+def ingredients_parser():
+    return load_script('ingredients-table-parser.py')
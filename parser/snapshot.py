@@ -0,0 +1,396 @@
+"""Compact binary snapshot of the parsed data, read through a memory map.
+
+The snapshot holds the same records as recipes.csv, critters.json,
+critter-types.json, locations.json and ingredients.json:
+
+    header       magic, version, section count
+    directory    name, offset and length of every section
+    strings      one UTF-8 blob plus an offset array; every name and URL is stored once
+    tables       fixed-width records of string ids and numbers, one section per table
+    lists        shared arrays that records point into with [start, end) offsets:
+                 recipe ingredients, name lists, (quantity, item) and (start, end) pairs
+    name index   per table, record numbers sorted by name
+
+Opening a snapshot reads the header and directory only, so it takes the same
+time however large the catalog is. Records are decoded when they are accessed:
+
+    with Snapshot('catalog.snap') as snapshot:
+        snapshot.recipes.get('Apple Pie')
+        snapshot.critters[3]
+"""
+import argparse
+import bisect
+import json
+import mmap
+import os
+import struct
+from typing import Dict, List, Optional
+
+from critter_schedule import DAYS, schedule_intervals
+
+MAGIC = b'DLVSNAP\0'
+VERSION = 1
+
+HEADER = struct.Struct('<8sHH4x')
+DIRECTORY_ENTRY = struct.Struct('<8sQQ')
+U32 = struct.Struct('<I')
+PAIR = struct.Struct('<II')
+
+# String id and number sentinels
+NULL = 0xFFFFFFFF
+FALSE = 0xFFFFFFFE
+TRUE = 0xFFFFFFFD
+NULL_INT = -2 ** 31
+
+# Table records: all fields are string ids unless noted
+RECIPE = struct.Struct('<IIIIIiiiII')  # name, image, type name, type image, collection, stars, energy, sell price, ingredients [start, end)
+INGREDIENT = struct.Struct('<III')  # name, image, optional group (0 = required)
+CRITTER = struct.Struct('<IIII7III')  # name, image, type, location, one value per day, intervals [start, end)
+CRITTER_TYPE = struct.Struct('<II8I')  # name, location, then [start, end) of fav food, liked food, fav rewards, liked rewards
+LOCATION = struct.Struct('<II')  # name, image
+CATEGORY = struct.Struct('<III')  # name, ingredient names [start, end)
+
+def _align(data: bytearray, boundary: int = 8):
+    data.extend(b'\0' * (-len(data) % boundary))
+
+def _nullable_int(value: Optional[int]) -> int:
+    return NULL_INT if value is None else value
+
+def _int_or_none(value: int) -> Optional[int]:
+    return None if value == NULL_INT else value
+
+class SnapshotWriter:
+    """Builds the sections of a snapshot in memory and writes them in one go."""
+
+    def __init__(self):
+        self._string_ids: Dict[str, int] = {}
+        self._string_data = bytearray()
+        self._string_offsets = [0]
+        self._sections: Dict[bytes, bytearray] = {}
+        self._names: Dict[bytes, List[Optional[str]]] = {}
+
+    def string(self, value: Optional[str]) -> int:
+        if value is None:
+            return NULL
+        string_id = self._string_ids.get(value)
+        if string_id is None:
+            string_id = self._string_ids[value] = len(self._string_offsets) - 1
+            self._string_data.extend(value.encode('utf-8'))
+            self._string_offsets.append(len(self._string_data))
+        return string_id
+
+    def _section(self, name: bytes) -> bytearray:
+        return self._sections.setdefault(name, bytearray())
+
+    def _append(self, section: bytes, record: struct.Struct, *values) -> int:
+        data = self._section(section)
+        data.extend(record.pack(*values))
+        return len(data) // record.size
+
+    def _string_list(self, values: List[Optional[str]]):
+        start = len(self._section(b'sids')) // U32.size
+        for value in values:
+            self._append(b'sids', U32, self.string(value))
+        return start, start + len(values)
+
+    def _pair_list(self, pairs: List[tuple]):
+        start = len(self._section(b'pairs')) // PAIR.size
+        for first, second in pairs:
+            self._append(b'pairs', PAIR, first, second)
+        return start, start + len(pairs)
+
+    def _record(self, table: bytes, record: struct.Struct, name: Optional[str], *values):
+        self._append(table, record, *values)
+        self._names.setdefault(table, []).append(name)
+
+    def add_recipe(self, recipe: dict):
+        start = len(self._section(b'ingreds')) // INGREDIENT.size
+        group = 0
+        for item in recipe['ingredients']:
+            if isinstance(item, list):
+                group += 1
+                for ingredient in item:
+                    self._append(b'ingreds', INGREDIENT, self.string(ingredient['name']),
+                                 self.string(ingredient['image_url']), group)
+            else:
+                self._append(b'ingreds', INGREDIENT, self.string(item['name']), self.string(item['image_url']), 0)
+        end = len(self._section(b'ingreds')) // INGREDIENT.size
+        self._record(b'recipes', RECIPE, recipe['name'],
+                     self.string(recipe['name']), self.string(recipe['image_url']),
+                     self.string(recipe['type']['name']), self.string(recipe['type']['image_url']),
+                     self.string(recipe['collection']), _nullable_int(recipe['stars']),
+                     _nullable_int(recipe['energy']), _nullable_int(recipe['sell_price']), start, end)
+
+    def add_critter(self, critter: dict):
+        days = []
+        for day in DAYS:
+            value = critter['schedule'].get(day)
+            days.append(TRUE if value is True else FALSE if value is False else self.string(value))
+        intervals = self._pair_list(schedule_intervals(critter['schedule']))
+        self._record(b'critters', CRITTER, critter['name'],
+                     self.string(critter['name']), self.string(critter['image_url']), self.string(critter['type']),
+                     self.string(critter['location']), *days, *intervals)
+
+    def add_critter_type(self, critter_type: dict):
+        rewards = [
+            self._pair_list([(self.string(reward['quantity']), self.string(reward['item'])) for reward in critter_type[key]])
+            for key in ('fav_food_reward', 'liked_food_reward')
+        ]
+        self._record(b'ctypes', CRITTER_TYPE, critter_type['name'],
+                     self.string(critter_type['name']), self.string(critter_type['location']),
+                     *self._string_list([food['name'] for food in critter_type['fav_food']]),
+                     *self._string_list([food['name'] for food in critter_type['liked_food']]),
+                     *rewards[0], *rewards[1])
+
+    def add_location(self, location: dict):
+        self._record(b'locs', LOCATION, location['name'], self.string(location['name']), self.string(location['image_url']))
+
+    def add_category(self, name: str, ingredients: List[str]):
+        self._record(b'cats', CATEGORY, name, self.string(name), *self._string_list(ingredients))
+
+    def _name_indexes(self):
+        for table, names in self._names.items():
+            order = sorted((i for i, name in enumerate(names) if name is not None), key=lambda i: names[i])
+            data = self._section(b'ix_' + table[:5])
+            for i in order:
+                data.extend(U32.pack(i))
+
+    def write(self, path: str):
+        """Write the snapshot to path, replacing any old one atomically."""
+        self._name_indexes()
+        string_offsets = bytearray()
+        for offset in self._string_offsets:
+            string_offsets.extend(U32.pack(offset))
+        sections = {b'strofs': string_offsets, b'strdat': self._string_data, **self._sections}
+
+        body = bytearray()
+        directory = []
+        base = HEADER.size + DIRECTORY_ENTRY.size * len(sections)
+        for name, data in sections.items():
+            _align(body)
+            directory.append(DIRECTORY_ENTRY.pack(name, base + len(body), len(data)))
+            body.extend(data)
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(sections)))
+            f.write(b''.join(directory))
+            f.write(body)
+        os.replace(tmp_path, path)
+
+def write_snapshot(path: str, recipes=None, critters=None, critter_types=None, locations=None, ingredients=None):
+    """Write the given parsed tables to a snapshot; tables left out are simply absent."""
+    writer = SnapshotWriter()
+    for recipe in recipes or []:
+        writer.add_recipe(recipe)
+    for critter in critters or []:
+        writer.add_critter(critter)
+    for critter_type in critter_types or []:
+        writer.add_critter_type(critter_type)
+    for location in locations or []:
+        writer.add_location(location)
+    for name, names in (ingredients or {}).items():
+        writer.add_category(name, names)
+    writer.write(path)
+
+class Table:
+    """Lazily decoded records of one snapshot table."""
+
+    def __init__(self, snapshot: 'Snapshot', section: bytes, record: struct.Struct, decode):
+        self._snapshot = snapshot
+        self._view = snapshot.section(section)
+        self._index = snapshot.section(b'ix_' + section[:5])
+        self._record = record
+        self._decode = decode
+
+    def __len__(self) -> int:
+        return len(self._view) // self._record.size
+
+    def __getitem__(self, i: int) -> dict:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._decode(self._snapshot, self._record.unpack_from(self._view, i * self._record.size))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def _name(self, i: int) -> str:
+        # Every record starts with the string id of its name
+        return self._snapshot.string(U32.unpack_from(self._view, i * self._record.size)[0])
+
+    def find(self, name: str) -> Optional[int]:
+        """Record number of the record called name, by binary search over the name index."""
+        count = len(self._index) // U32.size
+        record_at = lambda position: U32.unpack_from(self._index, position * U32.size)[0]
+        position = bisect.bisect_left(range(count), name, key=lambda position: self._name(record_at(position)))
+        if position < count and self._name(record_at(position)) == name:
+            return record_at(position)
+        return None
+
+    def get(self, name: str) -> Optional[dict]:
+        i = self.find(name)
+        return None if i is None else self[i]
+
+def _decode_recipe(snapshot: 'Snapshot', fields) -> dict:
+    name, image, type_name, type_image, collection, stars, energy, sell_price, start, end = fields
+    ingredients = []
+    groups = {}
+    for ingredient_name, ingredient_image, group in snapshot.records(b'ingreds', INGREDIENT, start, end):
+        ingredient = {'name': snapshot.string(ingredient_name), 'image_url': snapshot.string(ingredient_image)}
+        if not group:
+            ingredients.append(ingredient)
+        elif group in groups:
+            groups[group].append(ingredient)
+        else:
+            groups[group] = [ingredient]
+            ingredients.append(groups[group])
+    return {
+        'image_url': snapshot.string(image),
+        'name': snapshot.string(name),
+        'type': {'name': snapshot.string(type_name), 'image_url': snapshot.string(type_image)},
+        'stars': _int_or_none(stars),
+        'energy': _int_or_none(energy),
+        'sell_price': _int_or_none(sell_price),
+        'ingredients': ingredients,
+        'collection': snapshot.string(collection),
+    }
+
+def _decode_day(snapshot: 'Snapshot', value: int):
+    if value == TRUE:
+        return True
+    if value == FALSE:
+        return False
+    return snapshot.string(value)
+
+def _decode_critter(snapshot: 'Snapshot', fields) -> dict:
+    name, image, critter_type, location = fields[:4]
+    return {
+        'image_url': snapshot.string(image),
+        'name': snapshot.string(name),
+        'type': snapshot.string(critter_type),
+        'location': snapshot.string(location),
+        'schedule': {day: _decode_day(snapshot, value) for day, value in zip(DAYS, fields[4:11])},
+    }
+
+def _decode_critter_type(snapshot: 'Snapshot', fields) -> dict:
+    name, location, fav_start, fav_end, liked_start, liked_end, fav_reward_start, fav_reward_end, \
+        liked_reward_start, liked_reward_end = fields
+    rewards = lambda start, end: [
+        {'quantity': snapshot.string(quantity), 'item': snapshot.string(item)}
+        for quantity, item in snapshot.records(b'pairs', PAIR, start, end)
+    ]
+    return {
+        'name': snapshot.string(name),
+        'location': snapshot.string(location),
+        'fav_food': [{'name': food} for food in snapshot.string_list(fav_start, fav_end)],
+        'liked_food': [{'name': food} for food in snapshot.string_list(liked_start, liked_end)],
+        'fav_food_reward': rewards(fav_reward_start, fav_reward_end),
+        'liked_food_reward': rewards(liked_reward_start, liked_reward_end),
+    }
+
+def _decode_location(snapshot: 'Snapshot', fields) -> dict:
+    name, image = fields
+    return {'name': snapshot.string(name), 'image_url': snapshot.string(image)}
+
+def _decode_category(snapshot: 'Snapshot', fields) -> dict:
+    name, start, end = fields
+    return {'name': snapshot.string(name), 'ingredients': snapshot.string_list(start, end)}
+
+class Snapshot:
+    """A memory-mapped snapshot; tables missing from the file read as empty."""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        self._views: List[memoryview] = []
+        magic, version, count = HEADER.unpack_from(self._view, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f'{path} is not a version {VERSION} snapshot')
+        self._sections = {}
+        for i in range(count):
+            name, offset, length = DIRECTORY_ENTRY.unpack_from(self._view, HEADER.size + i * DIRECTORY_ENTRY.size)
+            self._sections[name.rstrip(b'\0')] = (offset, length)
+        self._list_views: Dict[bytes, memoryview] = {}
+        self._string_offsets = self.section(b'strofs')
+        self._strings = self.section(b'strdat')
+
+        self.recipes = Table(self, b'recipes', RECIPE, _decode_recipe)
+        self.critters = Table(self, b'critters', CRITTER, _decode_critter)
+        self.critter_types = Table(self, b'ctypes', CRITTER_TYPE, _decode_critter_type)
+        self.locations = Table(self, b'locs', LOCATION, _decode_location)
+        self.categories = Table(self, b'cats', CATEGORY, _decode_category)
+
+    def section(self, name: bytes) -> memoryview:
+        offset, length = self._sections.get(name, (0, 0))
+        view = self._view[offset:offset + length]
+        self._views.append(view)
+        return view
+
+    def string(self, string_id: int) -> Optional[str]:
+        if string_id == NULL:
+            return None
+        start, end = PAIR.unpack_from(self._string_offsets, string_id * U32.size)
+        return str(self._strings[start:end], 'utf-8')
+
+    def records(self, section: bytes, record: struct.Struct, start: int, end: int):
+        view = self._list_views.get(section)
+        if view is None:
+            view = self._list_views[section] = self.section(section)
+        return [record.unpack_from(view, i * record.size) for i in range(start, end)]
+
+    def string_list(self, start: int, end: int) -> List[Optional[str]]:
+        return [self.string(string_id) for string_id, in self.records(b'sids', U32, start, end)]
+
+    def schedule_intervals(self, i: int) -> List[tuple]:
+        """Minute-of-week intervals of critter i, as written by critter_schedule.schedule_intervals."""
+        fields = CRITTER.unpack_from(self.critters._view, i * CRITTER.size)
+        return self.records(b'pairs', PAIR, fields[11], fields[12])
+
+    def close(self):
+        # Views into the map have to be released before it can be closed
+        for view in self._views:
+            view.release()
+        self._view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build a binary snapshot from the parser output, or read one.')
+    parser.add_argument('snapshot', help='snapshot file to write, or to read with --get')
+    parser.add_argument('--recipes', metavar='CSV', help='recipes.csv written by recipe-table-parser.py')
+    parser.add_argument('--data-dir', help='directory with critters.json, critter-types.json and locations.json')
+    parser.add_argument('--ingredients', metavar='JSON', help='ingredients.json')
+    parser.add_argument('--get', nargs=2, metavar=('TABLE', 'NAME'),
+                        help='print one record, e.g. --get recipes "Apple Pie"; TABLE is recipes, critters, '
+                             'critter_types, locations or categories')
+    args = parser.parse_args()
+
+    if args.get:
+        table, name = args.get
+        with Snapshot(args.snapshot) as snapshot:
+            print(json.dumps(getattr(snapshot, table).get(name), indent=2, ensure_ascii=False))
+    else:
+        tables = {}
+        if args.recipes:
+            from recipe_query import load_recipes_csv
+            tables['recipes'] = load_recipes_csv(args.recipes)
+        if args.data_dir:
+            for key, file_name in (('critters', 'critters.json'), ('critter_types', 'critter-types.json'),
+                                   ('locations', 'locations.json')):
+                with open(os.path.join(args.data_dir, file_name), 'r', encoding='utf-8') as f:
+                    tables[key] = json.load(f)
+        if args.ingredients:
+            with open(args.ingredients, 'r', encoding='utf-8') as f:
+                tables['ingredients'] = json.load(f)
+        write_snapshot(args.snapshot, **tables)
+        print(f"Wrote {args.snapshot} ({os.path.getsize(args.snapshot)} bytes)")
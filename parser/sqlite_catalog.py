@@ -0,0 +1,284 @@
+"""SQLite catalog of the parsed tables, indexed for offline lookups.
+
+The tables and columns are the ones the seed scripts create in Postgres, fed
+from the same rows as the COPY export (see pg_copy.py), so a catalog can be
+compared with production without touching it. Their NOT NULL constraints are
+the seed schema's too, and rows breaking them are refused before the catalog
+is touched. JSONB columns are stored as JSON text. Recipe ingredients are also spread into recipe_ingredients, one row
+per ingredient, so "recipes using X" is an index lookup:
+
+    python recipe-table-parser.py recipes.html recipes.csv --ingredients ingredients.json --sqlite catalog.db
+    python parse_critter_data.py --sqlite catalog.db
+    python sqlite_catalog.py catalog.db --using Tomato
+
+Like the COPY export, each parser replaces only its own tables, so both can
+write into one catalog.
+"""
+import argparse
+import json
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+from pg_copy import LOAD_ORDER, Table, check_not_null
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS collections (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS recipe_types (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    image_url TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ingredient_types (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    image_url TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ingredients (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    image_url TEXT NOT NULL,
+    ingredient_type_id INTEGER REFERENCES ingredient_types(id),
+    is_generic BOOLEAN NOT NULL DEFAULT FALSE
+);
+CREATE TABLE IF NOT EXISTS recipes (
+    id INTEGER PRIMARY KEY,
+    image_url TEXT NOT NULL,
+    name TEXT NOT NULL,
+    type_id INTEGER REFERENCES recipe_types(id),
+    collection_id INTEGER REFERENCES collections(id),
+    ingredient_ids TEXT NOT NULL, -- JSON: ingredient ids, or arrays of ids for optional ingredients
+    stars INTEGER NOT NULL,
+    energy INTEGER NOT NULL,
+    sell_price INTEGER NOT NULL
+);
+-- Not in Postgres: recipes.ingredient_ids one id per row; option_group is 0 for required ingredients
+CREATE TABLE IF NOT EXISTS recipe_ingredients (
+    recipe_id INTEGER NOT NULL REFERENCES recipes(id),
+    ingredient_id INTEGER NOT NULL REFERENCES ingredients(id),
+    option_group INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS locations (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    image_url TEXT
+);
+CREATE TABLE IF NOT EXISTS critter_types (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    location_id INTEGER REFERENCES locations(id)
+);
+CREATE TABLE IF NOT EXISTS critters (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    critter_type_id INTEGER REFERENCES critter_types(id),
+    image_url TEXT,
+    schedule TEXT NOT NULL -- JSON
+);
+CREATE INDEX IF NOT EXISTS recipes_name ON recipes (name);
+CREATE INDEX IF NOT EXISTS recipes_type ON recipes (type_id);
+CREATE INDEX IF NOT EXISTS recipes_collection ON recipes (collection_id);
+CREATE INDEX IF NOT EXISTS recipe_ingredients_ingredient ON recipe_ingredients (ingredient_id, recipe_id);
+CREATE INDEX IF NOT EXISTS recipe_ingredients_recipe ON recipe_ingredients (recipe_id);
+CREATE INDEX IF NOT EXISTS ingredients_type ON ingredients (ingredient_type_id);
+CREATE INDEX IF NOT EXISTS locations_name ON locations (name);
+CREATE INDEX IF NOT EXISTS critter_types_name ON critter_types (name);
+CREATE INDEX IF NOT EXISTS critter_types_location ON critter_types (location_id);
+CREATE INDEX IF NOT EXISTS critters_name ON critters (name);
+CREATE INDEX IF NOT EXISTS critters_type ON critters (critter_type_id);
+"""
+
+def _sqlite_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+def recipe_ingredient_rows(recipes: Table) -> List[Tuple[int, int, int]]:
+    """(recipe id, ingredient id, option group) for every ingredient of the recipes table."""
+    columns, rows = recipes
+    id_index, ingredients_index = columns.index('id'), columns.index('ingredient_ids')
+    membership = []
+    for row in rows:
+        group = 0
+        for entry in row[ingredients_index]:
+            if isinstance(entry, list):
+                group += 1
+                membership.extend((row[id_index], id, group) for id in entry)
+            else:
+                membership.append((row[id_index], entry, 0))
+    return membership
+
+def write_tables(path: str, tables: Dict[str, Table]) -> Dict[str, int]:
+    """Replace the given tables of the catalog at path with these rows, in one transaction.
+
+    Takes the tables pg_copy.recipe_tables and critter_tables build. Tables
+    not given keep their rows. Returns the number of rows written per table.
+    Raises ValueError, before touching the catalog, for tables the seed schema
+    would reject, as pg_copy.write_tables does.
+    """
+    check_not_null(tables)
+    if 'recipes' in tables:
+        tables = {**tables, 'recipe_ingredients': (['recipe_id', 'ingredient_id', 'option_group'],
+                                                   recipe_ingredient_rows(tables['recipes']))}
+    # Tables are filled after the ones they reference and cleared before them; recipe_ingredients goes last
+    order = [table for table in LOAD_ORDER if table in tables] + [table for table in tables if table not in LOAD_ORDER]
+
+    counts = {}
+    connection = sqlite3.connect(path)
+    try:
+        connection.executescript(SCHEMA)
+        with connection:
+            for table in reversed(order):
+                connection.execute(f'DELETE FROM {table}')
+            for table in order:
+                columns, rows = tables[table]
+                placeholders = ', '.join('?' * len(columns))
+                connection.executemany(
+                    f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+                    ([_sqlite_value(value) for value in row] for row in rows))
+                counts[table] = len(rows)
+        # Planner statistics for the new rows
+        connection.execute('ANALYZE')
+    finally:
+        connection.close()
+    return counts
+
+class Catalog:
+    """Read-only lookups on a catalog, each a fixed statement sqlite keeps prepared between calls.
+
+    Rows come back as dicts; JSON columns are decoded.
+    """
+
+    RECIPE_COLUMNS = """
+        SELECT r.id, r.name, r.image_url, t.name AS type, c.name AS collection, r.ingredient_ids,
+               r.stars, r.energy, r.sell_price
+        FROM recipes r
+        LEFT JOIN recipe_types t ON t.id = r.type_id
+        LEFT JOIN collections c ON c.id = r.collection_id
+    """
+    RECIPE = RECIPE_COLUMNS + 'WHERE r.name = ? ORDER BY r.id LIMIT 1'
+    RECIPES_OF_TYPE = RECIPE_COLUMNS + 'WHERE r.type_id = (SELECT id FROM recipe_types WHERE name = ?) ORDER BY r.id'
+    RECIPES_IN_COLLECTION = (RECIPE_COLUMNS +
+                             'WHERE r.collection_id = (SELECT id FROM collections WHERE name = ?) ORDER BY r.id')
+    RECIPES_USING = RECIPE_COLUMNS + """
+        WHERE r.id IN (
+            SELECT recipe_id FROM recipe_ingredients
+            WHERE ingredient_id = (SELECT id FROM ingredients WHERE name = ?)
+        )
+        ORDER BY r.id
+    """
+    RECIPE_INGREDIENTS = """
+        SELECT i.name, ri.option_group
+        FROM recipe_ingredients ri JOIN ingredients i ON i.id = ri.ingredient_id
+        WHERE ri.recipe_id = ?
+        ORDER BY ri.rowid
+    """
+    CRITTER_COLUMNS = """
+        SELECT c.id, c.name, c.image_url, t.name AS type, l.name AS location, c.schedule
+        FROM critters c
+        LEFT JOIN critter_types t ON t.id = c.critter_type_id
+        LEFT JOIN locations l ON l.id = t.location_id
+    """
+    CRITTER = CRITTER_COLUMNS + 'WHERE c.name = ? ORDER BY c.id LIMIT 1'
+    CRITTERS_OF_TYPE = (CRITTER_COLUMNS +
+                        'WHERE c.critter_type_id IN (SELECT id FROM critter_types WHERE name = ?) ORDER BY c.id')
+    CRITTERS_AT = CRITTER_COLUMNS + """
+        WHERE t.location_id IN (SELECT id FROM locations WHERE name = ?)
+        ORDER BY c.id
+    """
+
+    def __init__(self, path: str):
+        # Opened read-only, so a lookup can't take a lock a parser writing the catalog would wait on
+        self.connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+        self.connection.row_factory = sqlite3.Row
+
+    def _rows(self, sql: str, *parameters) -> List[dict]:
+        rows = []
+        for row in self.connection.execute(sql, parameters):
+            row = dict(row)
+            for column in ('ingredient_ids', 'schedule'):
+                if column in row:
+                    row[column] = json.loads(row[column])
+            rows.append(row)
+        return rows
+
+    def recipe(self, name: str) -> Optional[dict]:
+        """The first recipe with this name."""
+        rows = self._rows(self.RECIPE, name)
+        return rows[0] if rows else None
+
+    def recipes_of_type(self, type_name: str) -> List[dict]:
+        return self._rows(self.RECIPES_OF_TYPE, type_name)
+
+    def recipes_in_collection(self, collection: str) -> List[dict]:
+        return self._rows(self.RECIPES_IN_COLLECTION, collection)
+
+    def recipes_using(self, ingredient: str) -> List[dict]:
+        """Recipes that list the ingredient, required or as one of their options."""
+        return self._rows(self.RECIPES_USING, ingredient)
+
+    def recipe_ingredients(self, recipe_id: int) -> List[Tuple[str, int]]:
+        """(ingredient name, option group) of a recipe, in recipe order; group 0 is required."""
+        return [tuple(row) for row in self.connection.execute(self.RECIPE_INGREDIENTS, (recipe_id,))]
+
+    def critter(self, name: str) -> Optional[dict]:
+        """The first critter with this name."""
+        rows = self._rows(self.CRITTER, name)
+        return rows[0] if rows else None
+
+    def critters_of_type(self, type_name: str) -> List[dict]:
+        return self._rows(self.CRITTERS_OF_TYPE, type_name)
+
+    def critters_at(self, location: str) -> List[dict]:
+        return self._rows(self.CRITTERS_AT, location)
+
+    def counts(self) -> Dict[str, int]:
+        """Rows per table, for a quick comparison with the Postgres tables."""
+        tables = [row[0] for row in self.connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+        return {table: self.connection.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for table in tables}
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Look things up in a SQLite catalog written by the parsers.')
+    parser.add_argument('catalog', help='catalog file written with --sqlite')
+    queries = parser.add_mutually_exclusive_group()
+    queries.add_argument('--recipe', metavar='NAME', help='one recipe, with its ingredients')
+    queries.add_argument('--type', metavar='NAME', help='recipes of a recipe type')
+    queries.add_argument('--collection', metavar='NAME', help='recipes of a collection')
+    queries.add_argument('--using', metavar='INGREDIENT', help='recipes using an ingredient, required or optional')
+    queries.add_argument('--critter', metavar='NAME', help='one critter')
+    queries.add_argument('--critter-type', metavar='NAME', help='critters of a critter type')
+    queries.add_argument('--location', metavar='NAME', help='critters found at a location')
+    args = parser.parse_args()
+
+    with Catalog(args.catalog) as catalog:
+        if args.recipe:
+            result = catalog.recipe(args.recipe)
+            if result:
+                result['ingredients'] = catalog.recipe_ingredients(result['id'])
+        elif args.critter:
+            result = catalog.critter(args.critter)
+        elif args.type:
+            result = catalog.recipes_of_type(args.type)
+        elif args.collection:
+            result = catalog.recipes_in_collection(args.collection)
+        elif args.using:
+            result = catalog.recipes_using(args.using)
+        elif args.critter_type:
+            result = catalog.critters_of_type(args.critter_type)
+        elif args.location:
+            result = catalog.critters_at(args.location)
+        else:
+            result = catalog.counts()
+        print(json.dumps(result, indent=2, ensure_ascii=False))
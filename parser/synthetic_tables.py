@@ -0,0 +1,163 @@
+"""Generate synthetic wiki tables in the markup the parsers expect."""
+import argparse
+import os
+import random
+from typing import List
+
+from parse_critter_data import CRITTER_TYPE_MAP
+
+RECIPE_TABLE = 'recipe-table.html'
+INGREDIENTS_TABLE = 'ingredients-table.html'
+CRITTER_TYPE_TABLE = 'critter-type-table.html'
+CRITTER_SCHEDULE_TABLE = 'critter-schedule-table.html'
+
+CATEGORIES = ['Fruit', 'Vegetables', 'Grain', 'Dairy and Oil', 'Fish', 'Seafood', 'Meat', 'Spices', 'Sweets', 'Ice']
+RECIPE_TYPES = ['Appetizers', 'Entrées', 'Desserts']
+COLLECTIONS = ['Base Game', 'A Rift in Time', 'The Storybook Vale', 'Eternity Isle']
+LOCATIONS = ['Dazzle Beach', 'Glade of Trust', 'Forest of Valor', 'Peaceful Meadow', 'Sunlit Plateau', 'Frosted Heights']
+SCHEDULE_VALUES = ['All day', 'n/a', '6 AM - 10 AM', '8 PM - 2 AM', '12 PM - 6 PM', '6 AM - 12 PM']
+
+def _file_name(name: str) -> str:
+    return name.replace(' ', '_').replace('&', 'and')
+
+def image(name: str, width: int = 20) -> str:
+    # Thumbnails carry a srcset with 1.5x and 2x variants, as on the wiki
+    file = _file_name(name)
+    return (
+        f'<img alt="" src="/images/thumb/a/a0/{file}.png/{width}px-{file}.png" decoding="async" loading="lazy" '
+        f'width="{width}" height="{width}" srcset="/images/thumb/a/a0/{file}.png/{width * 3 // 2}px-{file}.png 1.5x, '
+        f'/images/thumb/a/a0/{file}.png/{width * 2}px-{file}.png 2x">'
+    )
+
+def name_template(name: str, suffix: str = '') -> str:
+    return (
+        f'<span id="nametemplate"><span id="name-space" style="width:;">{image(name)}</span> '
+        f'<a href="/{_file_name(name)}" title="{name}">{name}</a>{suffix}</span>'
+    )
+
+def category_template(category: str) -> str:
+    # Generic "Any ..." slots link to the category page and have an image-only first link
+    return (
+        f'<span id="nametemplate"><a href="/Category:{_file_name(category)}" title="Category:{category}">'
+        f'{image(category)}</a> <a href="/Category:{_file_name(category)}" title="Category:{category}">'
+        f'Any {category}</a></span>'
+    )
+
+def ingredient_names(count: int) -> List[str]:
+    return [f'{CATEGORIES[i % len(CATEGORIES)]} Ingredient {i}' for i in range(count)]
+
+def recipe_ingredients_cell(rng: random.Random, ingredients: List[str]) -> str:
+    mandatory = rng.sample(ingredients, rng.randint(1, min(4, len(ingredients))))
+    if rng.random() < 0.3:
+        category = rng.choice(CATEGORIES)
+        options = rng.sample(ingredients, min(3, len(ingredients)))
+        items = ''.join(f'<li>{name_template(name)}</li>\n' for name in options)
+        spans = '<br>\n'.join(name_template(name) for name in mandatory)
+        return f'\n<p>{category_template(category)}<br>\n</p>\n<ul>{items}</ul>\n<p>{spans}\n</p>\n'
+    return '<br>'.join(name_template(name) for name in mandatory)
+
+def recipe_table(rows: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    ingredients = ingredient_names(max(20, rows // 5))
+    lines = [
+        '<table class="wikitable sortable">',
+        '<tbody><tr>\n<th>Image</th>\n<th>Name</th>\n<th>Type</th>\n<th>Rating</th>\n<th>Energy</th>\n'
+        '<th>Sell Price</th>\n<th>Ingredients</th>\n<th>Collection</th></tr>',
+    ]
+    for i in range(rows):
+        name = f'Recipe {i}'
+        recipe_type = rng.choice(RECIPE_TYPES)
+        stars = rng.randint(1, 5)
+        lines.append(
+            f'<tr>\n<td><a href="/{_file_name(name)}" class="image">{image(name, 60)}</a>\n</td>\n'
+            f'<td><a href="/{_file_name(name)}" title="{name}">{name}</a>\n</td>\n'
+            f'<td><span id="nametemplate">{image(recipe_type)} {recipe_type}</span>\n</td>\n'
+            f'<td><span id="star-color">{"★" * stars}</span>\n</td>\n'
+            f'<td>{rng.randint(100, 9000):,}\n</td>\n'
+            f'<td>{rng.randint(10, 2000):,}\n</td>\n'
+            f'<td>{recipe_ingredients_cell(rng, ingredients)}</td>\n'
+            f'<td>{rng.choice(COLLECTIONS)}\n</td></tr>'
+        )
+    lines.append('</tbody></table>')
+    return '\n'.join(lines)
+
+def ingredients_table(rows: int) -> str:
+    by_category = {category: [] for category in CATEGORIES}
+    for name in ingredient_names(rows):
+        by_category[name.split(' Ingredient ')[0]].append(name)
+
+    headers = ''.join(
+        f'<th class="headerSort" tabindex="0" role="columnheader button">'
+        f'<a href="/Category:{_file_name(category)}">{image(category)}</a><br>'
+        f'<a href="/Category:{_file_name(category)}" title="Category:{category}">{category}</a></th>\n'
+        for category in CATEGORIES
+    )
+    cells = ''.join(
+        '<td>' + '<br>\n'.join(f'<a href="/{_file_name(name)}" title="{name}">{name}</a>' for name in names) + '\n</td>\n'
+        for names in by_category.values()
+    )
+    return f'<table class="wikitable sortable">\n<thead><tr>\n{headers}</tr></thead><tbody><tr>\n{cells}</tr>\n</tbody></table>'
+
+def critter_type_table(rows: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    type_names = [details['plural'] for details in CRITTER_TYPE_MAP.values()]
+    foods = ingredient_names(40)
+    lines = ['<table class="wikitable">', '<thead><tr><th>Image</th><th>Critter</th><th>Favorite Food</th>'
+             '<th>Liked Food</th><th>Location</th><th>Notes</th><th>Favorite Rewards</th><th>Liked Rewards</th></tr></thead>',
+             '<tbody>']
+    for i in range(rows):
+        name = type_names[i % len(type_names)]
+        location = rng.choice(LOCATIONS)
+        lines.append(
+            f'<tr><td>{image(name, 60)}</td>'
+            f'<td><a href="/{_file_name(name)}" title="{name}">{name}</a><sup id="cite_ref-{i}"><a href="#cite_note-{i}">[1]</a></sup></td>'
+            f'<td>{"<br>".join(name_template(food) for food in rng.sample(foods, 2))}</td>'
+            f'<td>{"<br>".join(name_template(food) for food in rng.sample(foods, 3))}</td>'
+            f'<td>{image(location)} <a href="/{_file_name(location)}" title="{location}">{location}</a></td>'
+            f'<td>Befriend with {rng.choice(foods)}</td>'
+            f'<td>{name_template("Critter Gem", f" ({rng.randint(1, 3)})")}{name_template("Gold Coin")}</td>'
+            f'<td>{name_template("Flower", f" ({rng.randint(1, 2)}-{rng.randint(3, 5)})")}</td></tr>'
+        )
+    lines.append('</tbody></table>')
+    return '\n'.join(lines)
+
+def critter_schedule_table(rows: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    critter_names = [name for details in CRITTER_TYPE_MAP.values() for name in details['types']]
+    lines = ['<table class="wikitable">', '<thead><tr><th>Image</th><th>Critter</th><th>Location</th>'
+             + ''.join(f'<th>{day}</th>' for day in ('Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat')) + '</tr></thead>',
+             '<tbody>']
+    for i in range(rows):
+        name = critter_names[i % len(critter_names)]
+        location = rng.choice(LOCATIONS)
+        days = ''.join(f'<td>{rng.choice(SCHEDULE_VALUES)}\n</td>' for _ in range(7))
+        lines.append(
+            f'<tr><td>{image(name, 60)}</td>'
+            f'<td><a href="/{_file_name(name)}" title="{name}">{name}</a></td>'
+            f'<td>{image(location)} <a href="/{_file_name(location)}" title="{location}">{location}</a></td>'
+            f'{days}</tr>'
+        )
+    lines.append('</tbody></table>')
+    return '\n'.join(lines)
+
+def write_tables(out_dir: str, rows: int, seed: int = 0):
+    """Write all four synthetic tables with the given number of rows to out_dir."""
+    os.makedirs(out_dir, exist_ok=True)
+    tables = {
+        RECIPE_TABLE: recipe_table(rows, seed),
+        INGREDIENTS_TABLE: ingredients_table(rows),
+        CRITTER_TYPE_TABLE: critter_type_table(rows, seed),
+        CRITTER_SCHEDULE_TABLE: critter_schedule_table(rows, seed),
+    }
+    for file_name, html in tables.items():
+        with open(os.path.join(out_dir, file_name), 'w', encoding='utf-8') as f:
+            f.write(f'<!DOCTYPE html>\n<html><head><title>Synthetic</title></head><body>\n{html}\n</body></html>\n')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate synthetic wiki tables for benchmarking the parsers.')
+    parser.add_argument('out_dir')
+    parser.add_argument('--rows', type=int, default=1000, help='rows per table')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    write_tables(args.out_dir, args.rows, args.seed)
@@ -0,0 +1,108 @@
+"""fetch_pages.py against a local stand-in that serves whole wiki pages, navboxes and all."""
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import threading
+
+import pytest
+
+import fetch_pages
+import synthetic_tables
+
+ROWS = 20
+
+# Page path -> the data table it carries, as fetch_pages.PAGES saves it
+TABLES = {
+    '/Ingredients': synthetic_tables.ingredients_table(ROWS),
+    '/Recipes': synthetic_tables.recipe_table(ROWS),
+    '/Critters': synthetic_tables.critter_type_table(ROWS),
+    '/Critter_Schedule': synthetic_tables.critter_schedule_table(ROWS),
+}
+
+NAVBOX = ('<table class="navbox"><tbody><tr><th class="headerSort"><a href="/Category:Navigation">Navigation</a></th></tr>'
+          '<tr><td><a href="/Recipes">Recipes</a> <a href="/Critters">Critters</a></td></tr></tbody></table>')
+
+def wiki_page(title: str, table: str) -> str:
+    # The table among the page chrome the parsers must not read as data
+    return (f'<!DOCTYPE html>\n<html><head><title>{title}</title></head><body>\n{NAVBOX}\n'
+            f'<p>Intro with a <a href="/Elsewhere">link</a>.</p>\n{table}\n{NAVBOX}\n'
+            f'<table class="infobox"><tr><td>Footer</td></tr></table>\n</body></html>\n')
+
+class StandInHandler(BaseHTTPRequestHandler):
+    pages = {path: wiki_page(path[1:], table).encode('utf-8') for path, table in TABLES.items()}
+    requests = []
+
+    def do_GET(self):
+        body = self.pages.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        self.requests.append((self.path, self.headers.get('If-None-Match')))
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def stand_in():
+    """Origin URL of a server answering the wiki's page paths with whole pages."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    StandInHandler.requests = []
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+def test_cut_table_keeps_only_the_data_table():
+    page = wiki_page('Recipes', TABLES['/Recipes']).encode('utf-8')
+    assert fetch_pages.cut_table(page, 'wikitable') == TABLES['/Recipes'].encode('utf-8')
+    assert fetch_pages.cut_table(b'<p>no tables</p>', 'wikitable') is None
+
+def test_cut_table_skips_nested_tables():
+    table = '<table class="wikitable"><tr><td><table><tr><td>a</td></tr></table></td></tr></table>'
+    page = f'<table class="navbox"><tr><td>x</td></tr></table>\n{table}\n<table class="wikitable"></table>'
+    assert fetch_pages.cut_table(page.encode('utf-8'), 'wikitable') == table.encode('utf-8')
+
+def test_fetch_saves_tables_and_parsers_read_them(stand_in, tmp_path):
+    out_dir, cache_dir = str(tmp_path / 'pages'), str(tmp_path / 'cache')
+    fetcher = fetch_pages.PageFetcher(fetch_pages.PageCache(cache_dir), origin=stand_in)
+    statuses = fetch_pages.fetch_pages(out_dir, fetch_pages.PAGES, fetcher)
+    assert set(statuses.values()) == {fetch_pages.CHANGED}
+
+    for file_name, url in fetch_pages.PAGES.items():
+        with open(os.path.join(out_dir, file_name), 'r', encoding='utf-8') as f:
+            assert f.read() == TABLES['/' + url.rsplit('/', 1)[1]]
+
+    fetch_pages.parse_changed(out_dir, statuses)
+    with open(os.path.join(out_dir, 'ingredients.json'), 'r', encoding='utf-8') as f:
+        ingredients = json.load(f)
+    assert 'Navigation' not in ingredients
+    assert sum(len(names) for names in ingredients.values()) == ROWS
+    with open(os.path.join(out_dir, 'recipes.csv'), 'r', encoding='utf-8') as f:
+        assert len(f.read().splitlines()) == ROWS + 1
+    with open(os.path.join(out_dir, 'critters.json'), 'r', encoding='utf-8') as f:
+        assert len(json.load(f)) == ROWS
+
+def test_unchanged_pages_are_revalidated_not_reparsed(stand_in, tmp_path):
+    out_dir, cache_dir = str(tmp_path / 'pages'), str(tmp_path / 'cache')
+    fetch_pages.fetch_pages(out_dir, fetch_pages.PAGES,
+                            fetch_pages.PageFetcher(fetch_pages.PageCache(cache_dir), origin=stand_in))
+
+    statuses = fetch_pages.fetch_pages(out_dir, fetch_pages.PAGES,
+                                       fetch_pages.PageFetcher(fetch_pages.PageCache(cache_dir), origin=stand_in))
+    assert set(statuses.values()) == {fetch_pages.NOT_MODIFIED}
+    assert all(etag for _, etag in StandInHandler.requests[len(TABLES):])
+    assert fetch_pages.parse_changed(out_dir, statuses) == []
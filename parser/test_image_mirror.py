@@ -0,0 +1,99 @@
+"""image_mirror.py against a local stand-in for the wiki's image server."""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import threading
+
+import pytest
+
+import image_mirror
+from records import Recipe, image_ref
+
+WIKI = 'https://dreamlightvalleywiki.com/images'
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # Path -> statuses to answer before the image, and the image's bytes
+    images = {
+        '/images/apple.png': ([], b'apple bytes'),
+        '/images/apple-copy.png': ([], b'apple bytes'),
+        '/images/busy.png': ([503], b'busy bytes'),
+        '/images/kiwi.png': ([], b'kiwi bytes'),
+    }
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(self.path)
+        if self.path not in self.images:
+            self.send_error(404)
+            return
+        statuses, body = self.images[self.path]
+        answered = self.requests.count(self.path)
+        if answered <= len(statuses):
+            self.send_error(statuses[answered - 1])
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def stand_in():
+    """Origin URL of a server answering the wiki's image paths."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    StandInHandler.requests = []
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+def make_mirror(mirror_dir, origin: str) -> image_mirror.ImageMirror:
+    return image_mirror.ImageMirror(str(mirror_dir), workers=2, retries=2, requests_per_second=0, origin=origin)
+
+def test_busy_server_is_retried(stand_in, tmp_path):
+    mirror = make_mirror(tmp_path, stand_in)
+    mapping = mirror.mirror([f'{WIKI}/busy.png'])
+    assert StandInHandler.requests == ['/images/busy.png', '/images/busy.png']
+    assert not mirror.failed
+    with open(tmp_path / mapping[f'{WIKI}/busy.png'][len(mirror.url_prefix) + 1:], 'rb') as f:
+        assert f.read() == b'busy bytes'
+
+def test_missing_image_is_reported_not_retried(stand_in, tmp_path):
+    mirror = make_mirror(tmp_path, stand_in)
+    assert mirror.mirror([f'{WIKI}/gone.png']) == {}
+    assert mirror.failed == {f'{WIKI}/gone.png': 'HTTP 404'}
+    assert StandInHandler.requests == ['/images/gone.png']
+
+def test_identical_images_are_stored_once(stand_in, tmp_path):
+    mirror = make_mirror(tmp_path, stand_in)
+    mapping = mirror.mirror([f'{WIKI}/apple.png', f'{WIKI}/apple-copy.png', f'{WIKI}/kiwi.png'])
+    assert mapping[f'{WIKI}/apple.png'] == mapping[f'{WIKI}/apple-copy.png'] != mapping[f'{WIKI}/kiwi.png']
+    assert (mirror.fetched, mirror.stored) == (3, 2)
+    stored = [name for _, _, files in os.walk(tmp_path) for name in files if name != image_mirror.INDEX_FILE]
+    assert len(stored) == 2
+
+def test_second_run_reuses_the_index(stand_in, tmp_path):
+    urls = [f'{WIKI}/apple.png', f'{WIKI}/kiwi.png']
+    first = make_mirror(tmp_path, stand_in).mirror(urls)
+    requests = len(StandInHandler.requests)
+
+    mirror = make_mirror(tmp_path, stand_in)
+    assert mirror.mirror(urls) == first
+    assert len(StandInHandler.requests) == requests
+    assert mirror.fetched == 0
+
+def test_rewritten_rows_stay_records(stand_in, tmp_path):
+    kiwi = image_ref('Kiwi', f'{WIKI}/kiwi.png')
+    recipe = Recipe(f'{WIKI}/apple.png', 'Fruit Salad', image_ref('Dessert', None), 1, 100, 50,
+                    [kiwi, [kiwi, image_ref('Apple', f'{WIKI}/apple.png')]], 'Base Game')
+    rows, = image_mirror.mirror_rows(make_mirror(tmp_path, stand_in), [recipe])
+    row = rows[0]
+    assert isinstance(row, Recipe) and row['name'] == 'Fruit Salad'
+    assert row['image_url'].startswith(image_mirror.DEFAULT_URL_PREFIX)
+    # Shared ingredient records come back shared
+    local_kiwi = row['ingredients'][0]
+    assert local_kiwi is row['ingredients'][1][0] is image_ref('Kiwi', local_kiwi['image_url'])
+    assert row['type'] is image_ref('Dessert', None)
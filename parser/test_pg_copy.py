@@ -0,0 +1,101 @@
+"""Round trip of the COPY export: every table written by write_tables and read back as COPY reads it."""
+import json
+import os
+
+import pytest
+
+import pg_copy
+
+# Text COPY has to escape: tab, newline, carriage return and backslash, next to ordinary non-ASCII text
+AWKWARD = 'Tab\there, line\nbreak, cr\rreturn, back\\slash \\N and Entrées'
+
+NORMALIZED = {
+    'ingredient_types': [
+        {'id': 1, 'name': 'Fruit', 'image_url': 'https://example.com/Fruit.png'},
+        {'id': 2, 'name': AWKWARD, 'image_url': 'https://example.com/Odd\tType.png'},
+    ],
+    'ingredients': [
+        {'id': 1, 'name': 'Apple', 'image_url': 'https://example.com/Apple.png', 'ingredient_type_id': 1},
+        {'id': 2, 'name': 'Any Fruit', 'image_url': 'https://example.com/Fruit.png', 'ingredient_type_id': 1},
+        {'id': 3, 'name': AWKWARD, 'image_url': 'https://example.com/\\odd.png', 'ingredient_type_id': 2},
+        {'id': 4, 'name': 'Loose', 'image_url': 'https://example.com/Loose.png', 'ingredient_type_id': None},
+    ],
+    'recipe_types': [{'id': 1, 'name': 'Entrées', 'image_url': 'https://example.com/Entrees.png'}],
+    'collections': [{'id': 1, 'name': 'Base\tGame'}, {'id': 2, 'name': 'Line\nBreak'}],
+    'recipes': [
+        {'id': 1, 'image_url': 'https://example.com/Pie.png', 'name': AWKWARD, 'type_id': 1, 'stars': 3,
+         'energy': 1200, 'sell_price': 250, 'ingredient_ids': [[1, 2], 3, 4], 'collection_id': 1},
+        {'id': 2, 'image_url': 'https://example.com/Soup.png', 'name': 'Soup', 'type_id': None, 'stars': 1,
+         'energy': 90, 'sell_price': 30, 'ingredient_ids': [1], 'collection_id': 2},
+    ],
+}
+
+CRITTER_TYPES = [{'name': 'Crocodile', 'location': 'Peaceful\tMeadow'}, {'name': 'Sunbird', 'location': None}]
+CRITTERS = [
+    {'name': 'Blue Crocodile', 'type': 'Crocodile', 'image_url': None,
+     'schedule': {'monday': '6 AM - 12 PM', 'tuesday': False}},
+    {'name': AWKWARD, 'type': 'Sunbird', 'image_url': 'https://example.com/Sunbird.png', 'schedule': {'sunday': True}},
+]
+LOCATIONS = [{'name': 'Peaceful\tMeadow', 'image_url': None}, {'name': 'Back\\slash Beach', 'image_url': 'x.png'}]
+
+def copy_text(value):
+    # What Postgres hands back for a value once COPY has read it, as text; None stays NULL
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+@pytest.fixture
+def tables():
+    return {**pg_copy.recipe_tables(NORMALIZED), **pg_copy.critter_tables(CRITTER_TYPES, CRITTERS, LOCATIONS)}
+
+def test_every_table_reads_back_as_written(tables, tmp_path):
+    pg_copy.write_tables(str(tmp_path), tables)
+    with open(tmp_path / pg_copy.MANIFEST_FILE, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    assert [entry['table'] for entry in manifest['tables']] == pg_copy.LOAD_ORDER
+
+    for entry in manifest['tables']:
+        columns, rows = tables[entry['table']]
+        assert entry['columns'] == columns
+        assert entry['rows'] == len(rows)
+        read_back = pg_copy.read_copy_file(os.path.join(tmp_path, entry['file']))
+        assert read_back == [[copy_text(value) for value in row] for row in rows], entry['table']
+
+def test_awkward_values_survive_and_nulls_stay_null(tables, tmp_path):
+    pg_copy.write_tables(str(tmp_path), tables)
+    ingredients = pg_copy.read_copy_file(os.path.join(tmp_path, 'ingredients.tsv'))
+    assert [row[1] for row in ingredients] == ['Apple', 'Any Fruit', AWKWARD, 'Loose']
+    assert [row[4] for row in ingredients] == ['f', 't', 'f', 'f']
+    assert ingredients[3][3] is None
+    # A literal backslash-N is text, not NULL
+    assert pg_copy.read_copy_file(os.path.join(tmp_path, 'recipes.tsv'))[0][2].endswith('\\N and Entrées')
+    locations = pg_copy.read_copy_file(os.path.join(tmp_path, 'locations.tsv'))
+    assert locations == [['1', 'Peaceful\tMeadow', None], ['2', 'Back\\slash Beach', 'x.png']]
+    # One line per row: escaped newlines never split a record
+    with open(tmp_path / 'critters.tsv', 'r', encoding='utf-8', newline='') as f:
+        assert f.read().count('\n') == len(CRITTERS)
+
+@pytest.mark.parametrize('field, value', [
+    ('\\b\\f\\v', '\b\f\v'),
+    ('\\101\\x42', 'AB'),
+    ('\\\\N', '\\N'),
+    ('\\N', None),
+    ('', ''),
+])
+def test_reader_decodes_copy_escapes(field, value):
+    assert pg_copy.unescape_copy_value(field) == value
+
+def test_null_in_a_not_null_column_is_refused(tmp_path):
+    normalized = {**NORMALIZED, 'ingredient_types': [dict(t, image_url=None) for t in NORMALIZED['ingredient_types']]}
+    with pytest.raises(ValueError, match=r'(?s)ingredient_types\.image_url .*\{category: \[names\]\}'):
+        pg_copy.write_tables(str(tmp_path), pg_copy.recipe_tables(normalized))
+    assert not os.listdir(tmp_path)
+
+def test_rows_missing_their_name_are_named_by_id(tmp_path):
+    tables = pg_copy.critter_tables([{'name': None, 'location': None}, *CRITTER_TYPES], CRITTERS, LOCATIONS)
+    with pytest.raises(ValueError, match=r'critter_types\.name is NOT NULL but is missing for id 1$'):
+        pg_copy.write_tables(str(tmp_path), tables)
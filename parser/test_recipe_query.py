@@ -0,0 +1,39 @@
+"""Generic "Any ..." slots, as recipe-table-parser.py --generic writes them, in the recipe consumers."""
+import pytest
+
+from recipe_analytics import RecipeColumns
+from recipe_query import RecipeIndex
+
+CATEGORIES = {
+    'Fruit': {'ingredients': ['Apple', 'Kiwi']},
+    'Vegetables': {'ingredients': ['Carrot', 'Tomato']},
+}
+
+def recipe(name, ingredients):
+    return {'name': name, 'image_url': '', 'type': {'name': 'Entrées'}, 'stars': 2, 'energy': 100,
+            'sell_price': 50, 'ingredients': ingredients, 'collection': 'Base Game'}
+
+RECIPES = [
+    recipe('Fruit Salad', [{'name': 'Any Fruit'}, {'name': 'Any Fruit'}]),
+    recipe('Veggie Kiwi', [{'name': 'Kiwi'}, {'name': 'Any Vegetable'}]),
+    recipe('Carrot Choice', [[{'name': 'Carrot'}, {'name': 'Any Fruit'}], {'name': 'Any Vegetable'}]),
+]
+
+def test_generic_slots_are_filled_by_their_category():
+    index = RecipeIndex(RECIPES, CATEGORIES)
+    assert [r['name'] for r in index.cookable(['Apple', 'Tomato'])] == ['Fruit Salad', 'Carrot Choice']
+    assert [r['name'] for r in index.cookable(['Kiwi', 'Carrot'])] == ['Fruit Salad', 'Veggie Kiwi', 'Carrot Choice']
+    assert index.cookable(['Tomato']) == []
+    assert [r['name'] for r in index.recipes_using('Apple')] == ['Fruit Salad', 'Carrot Choice']
+
+def test_generic_slots_count_their_members_as_used():
+    columns = RecipeColumns(RECIPES, CATEGORIES)
+    assert columns.using_mask('Tomato').tolist() == [False, True, True]
+    assert columns.columns['ingredient_slots'].tolist() == [2, 2, 2]
+
+@pytest.mark.parametrize('build', [RecipeIndex, RecipeColumns])
+def test_generic_slots_need_the_categories(build):
+    with pytest.raises(ValueError, match='Any Fruit, Any Vegetable'):
+        build(RECIPES)
+    with pytest.raises(ValueError, match='no category of the ingredients: Any Vegetable'):
+        build(RECIPES, {'Fruit': CATEGORIES['Fruit']})
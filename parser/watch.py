@@ -0,0 +1,235 @@
+"""Keep the parsers loaded and re-run only the ones whose saved tables change.
+
+The data directory is polled for changes to the saved HTML tables. Once a
+file has stopped changing for the debounce period, only the parser reading it
+runs again, from state kept in memory since the last run:
+
+    python watch.py ../data
+    python watch.py ../data --only critters --interval 0.05 --debounce 0.1
+
+Rows whose HTML is unchanged are served from an in-memory row cache, the
+critter parser only re-reads the one of its two tables that changed, and an
+output file is only replaced, atomically, when its content actually changed.
+"""
+import argparse
+from collections import Counter
+import json
+import os
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from entity_resolution import print_unresolved
+import html_backend
+import parse_critter_data
+from row_cache import RowCache
+from script_loader import ingredients_parser, recipe_parser
+
+DEFAULT_INTERVAL = 0.1
+DEFAULT_DEBOUNCE = 0.2
+
+def _atomic_write(path: str, text: str, newline: Optional[str] = None):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8', newline=newline) as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def _read_text(path: str, newline: Optional[str] = None) -> Optional[str]:
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8', newline=newline) as f:
+        return f.read()
+
+class Target:
+    """One parser: the saved tables it reads and the output files it writes."""
+    name = ''
+    inputs: List[str] = []
+
+    def __init__(self, data_dir: str):
+        self.data_dir = data_dir
+        # Text last written to (or found in) each output file, so unchanged outputs aren't rewritten
+        self._written: Dict[str, Optional[str]] = {}
+
+    def path(self, file_name: str) -> str:
+        return os.path.join(self.data_dir, file_name)
+
+    def write(self, file_name: str, text: str, newline: Optional[str] = None) -> bool:
+        """Replace an output file if text differs from what it holds; return whether it did."""
+        if file_name not in self._written:
+            self._written[file_name] = _read_text(self.path(file_name), newline)
+        if self._written[file_name] == text:
+            return False
+        _atomic_write(self.path(file_name), text, newline)
+        self._written[file_name] = text
+        return True
+
+    def update(self, changed: Set[str]) -> List[str]:
+        """Re-parse after the given inputs changed and return the output files rewritten."""
+        raise NotImplementedError
+
+class IngredientsTarget(Target):
+    name = 'ingredients'
+    inputs = ['ingredients-table.html']
+
+    def update(self, changed: Set[str]) -> List[str]:
+        with open(self.path('ingredients-table.html'), 'r', encoding='utf-8') as f:
+            ingredients = ingredients_parser().parse_ingredients_table(f.read())
+        text = json.dumps(ingredients, indent=2, ensure_ascii=False)
+        return ['ingredients.json'] if self.write('ingredients.json', text) else []
+
+class RecipesTarget(Target):
+    name = 'recipes'
+    inputs = ['recipe-table.html']
+
+    def __init__(self, data_dir: str):
+        super().__init__(data_dir)
+        self.cache = RowCache(None)
+        self.rows: Optional[List[dict]] = None
+
+    def update(self, changed: Set[str]) -> List[str]:
+        parser = recipe_parser()
+        self.cache.begin_run('recipes')
+        # Scanning rows out of the file instead of building its tree means unchanged rows cost no soup at all
+        rows = list(parser.iter_parsed_rows(self.path('recipe-table.html'), cache=self.cache))
+        if rows == self.rows or not rows:
+            return []
+        self.rows = rows
+        # save_to_csv opens its own file, so it writes the temporary one that is swapped in
+        path = self.path('recipes.csv')
+        parser.save_to_csv(rows, path + '.tmp')
+        os.replace(path + '.tmp', path)
+        return ['recipes.csv']
+
+class CrittersTarget(Target):
+    name = 'critters'
+    inputs = [file_name for file_name, _ in parse_critter_data.TABLES.values()]
+
+    def __init__(self, data_dir: str):
+        super().__init__(data_dir)
+        self.cache = RowCache(None)
+        # Parsed rows of each table, kept so a change to one table doesn't re-read the other
+        self.results: Dict[str, List[dict]] = {}
+        # Names each table's last parse couldn't resolve, one Counter per parse_critter_data.UNRESOLVED_INDEXES
+        self.unresolved: Dict[str, List[Counter]] = {}
+
+    def parse_table(self, table: str) -> List[dict]:
+        # With a cache, rows are split out of the file rather than read from its tree, so unchanged rows cost no soup
+        self.cache.begin_run(table)
+        for index in parse_critter_data.UNRESOLVED_INDEXES:
+            index.unresolved.clear()
+        results = parse_critter_data.parse_table_file(self.data_dir, table, self.cache)
+        self.unresolved[table] = [Counter(index.unresolved) for index in parse_critter_data.UNRESOLVED_INDEXES]
+        return results
+
+    def update(self, changed: Set[str]) -> List[str]:
+        tables = {table for table, (file_name, _) in parse_critter_data.TABLES.items()
+                  if file_name in changed or table not in self.results}
+        for table in tables:
+            self.results[table] = self.parse_table(table)
+        # Reported afresh for every update, for both tables whichever of them was parsed again
+        for i, index in enumerate(parse_critter_data.UNRESOLVED_INDEXES):
+            index.unresolved = sum((counts[i] for counts in self.unresolved.values()), Counter())
+        print_unresolved(*parse_critter_data.UNRESOLVED_INDEXES)
+
+        critter_types, critters, locations_list = parse_critter_data.combine_tables(
+            self.results['critter_types'], self.results['critters'])
+        unparsed = []
+        outputs = parse_critter_data.output_files(critter_types, critters, locations_list, unparsed)
+        written = []
+        for file_name, data in outputs.items():
+            # e.g. a schedule change can't change critter-types.json, so it isn't even serialized
+            if not parse_critter_data.OUTPUT_TABLES[file_name] & tables:
+                continue
+            if self.write(file_name, parse_critter_data.dump_json(file_name, data)):
+                written.append(file_name)
+        return written
+
+TARGETS = [IngredientsTarget, RecipesTarget, CrittersTarget]
+
+def stat_files(data_dir: str, file_names) -> Dict[str, Optional[Tuple[int, int]]]:
+    """Modification time and size of each file, or None for a missing one."""
+    stats = {}
+    for file_name in file_names:
+        try:
+            stat = os.stat(os.path.join(data_dir, file_name))
+        except FileNotFoundError:
+            stats[file_name] = None
+        else:
+            stats[file_name] = (stat.st_mtime_ns, stat.st_size)
+    return stats
+
+class Watcher:
+    """Polls the inputs of some targets and updates the targets whose inputs settle after a change."""
+
+    def __init__(self, data_dir: str, targets: List[Target], interval: float = DEFAULT_INTERVAL,
+                 debounce: float = DEFAULT_DEBOUNCE):
+        self.data_dir = data_dir
+        self.targets = targets
+        self.interval = interval
+        self.debounce = debounce
+        self.file_names = [file_name for target in targets for file_name in target.inputs]
+        self._stats = stat_files(data_dir, self.file_names)
+        self._pending: Set[str] = set()
+        self._last_change = 0.0
+
+    def run_target(self, target: Target, changed: Set[str]):
+        missing = [file_name for file_name in target.inputs if self._stats[file_name] is None]
+        if missing:
+            print(f"{target.name}: waiting for {', '.join(missing)}")
+            return
+        started = time.perf_counter()
+        try:
+            written = target.update(changed)
+        except Exception as e:
+            # A half-saved or malformed table shouldn't stop the watcher; the next save retries
+            print(f"{target.name}: failed: {type(e).__name__}: {e}")
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        print(f"{target.name}: wrote {', '.join(written) or 'nothing (output unchanged)'} in {elapsed_ms:.0f} ms")
+
+    def poll(self) -> bool:
+        """Check the inputs once, updating targets whose changes have settled; return whether any ran."""
+        stats = stat_files(self.data_dir, self.file_names)
+        changed = {file_name for file_name in self.file_names if stats[file_name] != self._stats[file_name]}
+        now = time.monotonic()
+        self._stats = stats
+        if changed:
+            self._pending |= changed
+            self._last_change = now
+            return False
+        if not self._pending or now - self._last_change < self.debounce:
+            return False
+
+        pending, self._pending = self._pending, set()
+        for target in self.targets:
+            target_changed = pending.intersection(target.inputs)
+            if target_changed:
+                self.run_target(target, target_changed)
+        return True
+
+    def run(self):
+        for target in self.targets:
+            self.run_target(target, set(target.inputs))
+        print(f"Watching {len(self.file_names)} files in {self.data_dir}")
+        while True:
+            time.sleep(self.interval)
+            self.poll()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Re-run the parsers whenever their saved tables change.')
+    parser.add_argument('data_dir', nargs='?', default=parse_critter_data.DEFAULT_DATA_DIR,
+                        help='directory holding the saved tables and the output')
+    parser.add_argument('--only', nargs='+', choices=[target.name for target in TARGETS],
+                        help='watch only these parsers')
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL,
+                        help='seconds between checks for changed files')
+    parser.add_argument('--debounce', type=float, default=DEFAULT_DEBOUNCE,
+                        help='seconds a changed file must stay unchanged before it is parsed')
+    html_backend.add_arguments(parser)
+    args = parser.parse_args()
+    html_backend.from_arguments(args)
+
+    targets = [target(args.data_dir) for target in TARGETS if not args.only or target.name in args.only]
+    try:
+        Watcher(args.data_dir, targets, args.interval, args.debounce).run()
+    except KeyboardInterrupt:
+        pass